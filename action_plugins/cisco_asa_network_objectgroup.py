@@ -0,0 +1,172 @@
+# Copyright 2015 Patrick Ogenstad <patrick@ogenstad.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Coalesces looped cisco_asa_network_objectgroup entry tasks.
+
+When the module is looped with entry_state/category/value the first item
+renders every item of the loop whose when condition holds, runs the module
+once with the combined 'entries' list and hands out the per-entry results
+to the remaining items.
+All items of a loop are executed by the same worker process, so the results
+are kept in a module level dict until the loop is done.
+"""
+
+from ansible.parsing.mod_args import ModuleArgsParser
+from ansible.plugins.action import ActionBase
+
+MODULE_NAME = 'cisco_asa_network_objectgroup'
+ENTRY_ARGS = ['category', 'entry_state', 'value']
+
+pending_results = {}
+
+
+class ActionModule(ActionBase):
+
+    def run(self, tmp=None, task_vars=None):
+        if task_vars is None:
+            task_vars = dict()
+
+        result = super(ActionModule, self).run(tmp, task_vars)
+
+        key = (task_vars.get('inventory_hostname'), self._task._uuid)
+        if pending_results.get(key):
+            result.update(pending_results[key].pop(0))
+            if not pending_results[key]:
+                del pending_results[key]
+            return result
+
+        batch = None
+        if self._task.loop and self._task.args.get('entry_state'):
+            batch = self._render_loop(task_vars)
+
+        if batch is None:
+            result.update(self._execute_module(module_name=MODULE_NAME,
+                module_args=self._task.args, task_vars=task_vars))
+            return result
+
+        module_args, items = batch
+        module_result = self._execute_module(module_name=MODULE_NAME,
+            module_args=module_args, task_vars=task_vars)
+
+        item_results = []
+        if module_result.get('failed'):
+            for item in items:
+                item_results.append(dict(module_result))
+            # The metrics of the single module run are reported once
+            for item_result in item_results[1:]:
+                item_result.pop('asa_metrics', None)
+        else:
+            for index, entry in enumerate(module_result.get('entries', [])):
+                item_result = {
+                    'changed': entry['changed'],
+                    'coalesced': len(items),
+                    'entry': entry,
+                }
+                if index == 0 and module_result['changed'] and not any(
+                        e['changed'] for e in module_result['entries']):
+                    # Only the description was changed
+                    item_result['changed'] = True
+                if index == 0 and 'asa_metrics' in module_result:
+                    item_result['asa_metrics'] = module_result['asa_metrics']
+                item_results.append(item_result)
+
+        if not item_results:
+            # i.e. skipped in check mode, nothing to hand out per entry
+            result.update(module_result)
+            return result
+
+        result.update(item_results.pop(0))
+        if item_results:
+            pending_results[key] = item_results
+
+        return result
+
+    def _loop_items(self, task_vars):
+        loop_with = getattr(self._task, 'loop_with', None)
+        terms = self._templar.template(self._task.loop)
+
+        if not loop_with:
+            items = terms
+        elif loop_with in ('items', 'list'):
+            lookup = self._shared_loader_obj.lookup_loader.get(loop_with,
+                loader=self._loader, templar=self._templar)
+            if not isinstance(terms, list):
+                terms = [terms]
+            items = lookup.run(terms=terms, variables=task_vars)
+        else:
+            return None
+
+        if not isinstance(items, list):
+            return None
+
+        return items
+
+    def _render_loop(self, task_vars):
+        """Returns the combined module arguments and the loop items, or None
+        if the loop can't be coalesced safely.
+        """
+        items = self._loop_items(task_vars)
+        if not items:
+            return None
+
+        action, raw_args, delegate_to = ModuleArgsParser(task_ds=self._task._ds).parse()
+
+        loop_var = 'item'
+        index_var = None
+        loop_control = self._task.loop_control
+        if loop_control:
+            if getattr(loop_control, 'extended', False):
+                return None
+            if loop_control.loop_var:
+                loop_var = loop_control.loop_var
+            index_var = getattr(loop_control, 'index_var', None)
+
+        module_args = None
+        entries = []
+        included = []
+        for index, item in enumerate(items):
+            item_vars = dict(task_vars)
+            item_vars[loop_var] = item
+            if index_var:
+                item_vars[index_var] = index
+            self._templar.set_available_variables(item_vars)
+
+            # Items skipped by when never reach the action plugin, so they
+            # must not be part of the combined run either
+            try:
+                if self._task.when and not self._task.evaluate_conditional(self._templar, item_vars):
+                    continue
+            except Exception:
+                self._templar.set_available_variables(task_vars)
+                return None
+
+            args = self._templar.template(raw_args)
+
+            common_args = dict((k, v) for k, v in args.items() if k not in ENTRY_ARGS)
+            if module_args is None:
+                module_args = common_args
+            elif common_args != module_args:
+                # Items target different groups or devices
+                self._templar.set_available_variables(task_vars)
+                return None
+
+            entries.append(dict((k, args.get(k)) for k in ENTRY_ARGS))
+            included.append(item)
+
+        self._templar.set_available_variables(task_vars)
+        if not entries:
+            return None
+        module_args['entries'] = entries
+
+        return module_args, included
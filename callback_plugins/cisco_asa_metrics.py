@@ -0,0 +1,184 @@
+# Copyright 2015 Patrick Ogenstad <patrick@ogenstad.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Reports the ASA API latency of a play.
+
+The cisco_asa modules return asa_metrics with the duration of every request
+they sent, grouped by endpoint. This plugin collects them from the results
+of all hosts and prints, at the end of the play, latency percentiles per
+endpoint, the slowest devices, the calls each module needed per changed
+object and the time spent saving the configuration with write_mem.
+"""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+DOCUMENTATION = '''
+    callback: cisco_asa_metrics
+    type: aggregate
+    short_description: Reports ASA API latency at the end of the play
+    description:
+        - Aggregates the asa_metrics returned by the cisco_asa modules across all hosts.
+    requirements:
+        - enable in ansible.cfg with callbacks_enabled (callback_whitelist before Ansible 2.11)
+    options:
+        top:
+            description: Number of endpoints, devices and modules listed
+            default: 10
+            type: int
+            env:
+                - name: CISCO_ASA_METRICS_TOP
+            ini:
+                - section: callback_cisco_asa_metrics
+                  key: top
+'''
+
+import math
+from collections import defaultdict
+
+from ansible.plugins.callback import CallbackBase
+
+MODULE_PREFIX = 'cisco_asa_'
+WRITE_MEM_MODULE = 'cisco_asa_write_mem'
+
+
+def percentile(ordered, fraction):
+    """Nearest rank percentile of a sorted list"""
+    index = max(int(math.ceil(fraction * len(ordered))) - 1, 0)
+    return ordered[index]
+
+
+def changed_objects(result):
+    """Returns the number of objects a module result changed"""
+    if not result.get('changed'):
+        return 0
+    if result.get('entries'):
+        return len([entry for entry in result['entries'] if entry.get('changed')])
+    if 'deleted' in result:
+        return len(result['deleted'])
+    if 'applied' in result:
+        return result['applied']
+    return 1
+
+
+class CallbackModule(CallbackBase):
+
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = 'aggregate'
+    CALLBACK_NAME = 'cisco_asa_metrics'
+    CALLBACK_NEEDS_WHITELIST = True
+    CALLBACK_NEEDS_ENABLED = True
+
+    def __init__(self):
+        super(CallbackModule, self).__init__()
+        self.endpoints = defaultdict(list)
+        self.devices = defaultdict(lambda: { 'calls': 0, 'time': 0.0, 'tasks': 0 })
+        self.modules = defaultdict(lambda: { 'calls': 0, 'time': 0.0, 'changed': 0, 'tasks': 0 })
+        self.connections = 0
+        self.handshake_time = 0.0
+        self.write_mem_time = 0.0
+        self.write_mem_tasks = 0
+        self.queue_wait = 0.0
+        self.merged = 0
+
+    def _top(self):
+        try:
+            return int(self.get_option('top'))
+        except Exception:
+            return 10
+
+    def _collect(self, result):
+        module = result._task.action.split('.')[-1]
+        if not module.startswith(MODULE_PREFIX):
+            return
+
+        results = result._result.get('results')
+        if results is None:
+            results = [result._result]
+
+        # A looped task the action plugin coalesced into one module run
+        # carries the metrics on a single item, but every item reports
+        # whether its object changed.
+        stats = self.modules[module]
+        for item in results:
+            stats['changed'] += changed_objects(item)
+
+            metrics = item.get('asa_metrics')
+            if not metrics:
+                continue
+
+            for endpoint, durations in metrics['endpoints'].items():
+                self.endpoints[endpoint].extend(durations)
+
+            device = self.devices[metrics.get('device') or result._host.get_name()]
+            device['calls'] += metrics['calls']
+            device['time'] += metrics['time']
+            device['tasks'] += 1
+
+            stats['calls'] += metrics['calls']
+            stats['time'] += metrics['time']
+            stats['tasks'] += 1
+
+            self.connections += metrics.get('connections', 0)
+            self.handshake_time += metrics.get('handshake_time', 0)
+            self.queue_wait += metrics.get('queue_wait', 0)
+            self.merged += metrics.get('merged', 0)
+            if module == WRITE_MEM_MODULE:
+                self.write_mem_time += metrics['time']
+                self.write_mem_tasks += 1
+
+    def v2_runner_on_ok(self, result):
+        self._collect(result)
+
+    def v2_runner_on_failed(self, result, ignore_errors=False):
+        self._collect(result)
+
+    def v2_playbook_on_stats(self, stats):
+        if not self.endpoints:
+            return
+
+        top = self._top()
+        display = self._display
+        display.banner('CISCO ASA API METRICS')
+
+        display.display('Endpoints by total time')
+        display.display('  %-50s %7s %9s %9s %9s %9s' % ('endpoint', 'calls', 'p50', 'p90', 'p99', 'max'))
+        totals = sorted(self.endpoints.items(), key=lambda item: sum(item[1]), reverse=True)
+        for endpoint, durations in totals[:top]:
+            ordered = sorted(durations)
+            display.display('  %-50s %7d %8.3fs %8.3fs %8.3fs %8.3fs' % (
+                endpoint, len(ordered), percentile(ordered, 0.5), percentile(ordered, 0.9),
+                percentile(ordered, 0.99), ordered[-1]))
+
+        display.display('')
+        display.display('Slowest devices')
+        display.display('  %-40s %7s %7s %10s' % ('device', 'tasks', 'calls', 'time'))
+        slowest = sorted(self.devices.items(), key=lambda item: item[1]['time'], reverse=True)
+        for device, data in slowest[:top]:
+            display.display('  %-40s %7d %7d %9.2fs' % (device, data['tasks'], data['calls'], data['time']))
+
+        display.display('')
+        display.display('Calls per changed object')
+        display.display('  %-40s %7s %7s %9s %10s' % ('module', 'calls', 'changed', 'per obj', 'time'))
+        for module, data in sorted(self.modules.items(), key=lambda item: item[1]['calls'], reverse=True)[:top]:
+            if data['changed']:
+                per_object = '%9.1f' % (float(data['calls']) / data['changed'])
+            else:
+                per_object = '%9s' % '-'
+            display.display('  %-40s %7d %7d %s %9.2fs' % (module, data['calls'], data['changed'], per_object, data['time']))
+
+        display.display('')
+        display.display('write_mem: %.2fs in %d tasks' % (self.write_mem_time, self.write_mem_tasks))
+        display.display('TLS: %d connections, %.2fs in handshakes' % (self.connections, self.handshake_time))
+        display.display('Write queue: %.2fs waiting, %d changes merged into other requests' % (self.queue_wait, self.merged))
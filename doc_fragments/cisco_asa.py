@@ -0,0 +1,55 @@
+# Copyright 2015 Patrick Ogenstad <patrick@ogenstad.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Options shared by the cisco_asa modules, see connection_argument_spec in
+# module_utils/cisco_asa.py
+
+
+class ModuleDocFragment(object):
+
+    # Connection options of every module that talks to a device
+    DOCUMENTATION = '''
+options:
+    breaker_reset:
+        description:
+            - Seconds the circuit breaker stays open before a single connection probe is allowed through
+        default: 60
+        required: false
+    breaker_threshold:
+        description:
+            - Consecutive connection failures after which later tasks against the device fail at once without connecting. Set to 0 to disable the circuit breaker.
+        default: 3
+        required: false
+    connect_timeout:
+        description:
+            - Seconds to wait for the connection to the device
+        default: 5
+        required: false
+    read_timeout:
+        description:
+            - Seconds to wait for the device to answer a request
+        default: 30
+        required: false
+'''
+
+    # Modules that change the configuration
+    FAILOVER = '''
+options:
+    failover:
+        description:
+            - What to do when the device is the standby unit of a failover pair. With redirect the changes are sent to the active unit, with skip the task changes nothing and returns skipped. The role is read once with show failover and cached for five minutes.
+        choices: [ 'ignore', 'redirect', 'skip' ]
+        default: 'redirect'
+        required: false
+'''
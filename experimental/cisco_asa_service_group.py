@@ -0,0 +1,215 @@
+#!/usr/bin/python
+
+# Copyright 2015 Patrick Ogenstad <patrick@ogenstad.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+DOCUMENTATION = '''
+---
+
+module: cisco_asa_service_group
+author: Patrick Ogenstad (@networklore)
+short_description: Creates deletes or edits service object-groups.
+version: 0.x
+description:
+    - Configures the tcp and udp ports of service object-groups. Overlapping and adjacent ports are merged per protocol into the fewest ranges before they are compared with the group, so 80, www and 81-90 end up as the single member tcp/80-90.
+requirements:
+    - rasa
+extends_documentation_fragment:
+    - cisco_asa
+    - cisco_asa.failover
+options:
+    description:
+        description:
+            - Description of the object-group
+        required: false
+    host:
+        description:
+            - Typically set to {{ inventory_hostname }}
+        required: true
+    name:
+        description:
+            - Name of the service object-group
+        required: true
+    password:
+        description:
+            - Password for the device
+        required: true
+    ports:
+        description:
+            - List of protocol/port entries, i.e. tcp/443, tcp/https, udp/1000-2000 or tcp/range 1000 2000. The tcp and udp members of the group are made to match the merged list, members of other kinds are kept.
+        required: false
+    state:
+        description:
+            - State of the object-group
+        choices: [ 'present', 'absent' ]
+        required: true
+    username:
+        description:
+            - Username for device
+        required: true
+    validate_certs:
+        description:
+            - If no, SSL certificates will not be validated. This should only be used on personally controlled sites using self-signed certificates.
+        choices: [ 'no', 'yes']
+        default: 'yes'
+        required: false
+
+'''
+
+EXAMPLES = '''
+
+# Web ports, sent to the device as tcp/80-90 and tcp/443
+- cisco_asa_service_group:
+    host: "{{ inventory_hostname }}"
+    username: api_user
+    password: APIpass123
+    name: web-ports
+    state: present
+    ports:
+      - tcp/www
+      - tcp/81-90
+      - tcp/85
+      - tcp/https
+    validate_certs: no
+'''
+
+import sys
+from ansible.module_utils.basic import *
+from ansible.module_utils.cisco_asa import coalesce_services, connect_device, connection_argument_spec, member_key, service_value
+
+try:
+    from rasa import ASA
+    has_rasa = True
+except:
+    has_rasa = False
+
+SERVICE_MEMBER_KINDS = ['tcpudpservice']
+
+def desired_members(module, ports):
+    try:
+        intervals = coalesce_services(ports)
+    except ValueError:
+        module.fail_json(msg='Invalid ports - %s' % sys.exc_info()[1])
+
+    members = []
+    for protocol in sorted(intervals):
+        for start, end in intervals[protocol]:
+            members.append({ 'kind': 'TcpUdpService', 'value': service_value(protocol, start, end) })
+
+    return members
+
+def member_changes(current_data, members, description):
+    """Returns the PATCH data replacing the tcp and udp members of the group
+    with members
+    """
+    current = {}
+    for member in current_data.get('members', []):
+        if member.get('kind', '').lower() in SERVICE_MEMBER_KINDS:
+            current[member_key(member)] = member
+
+    desired = dict((member_key(member), member) for member in members)
+
+    data = {}
+    members_add = [desired[key] for key in sorted(desired) if key not in current]
+    members_remove = [current[key] for key in sorted(current) if key not in desired]
+    if members_add:
+        data['members.add'] = members_add
+    if members_remove:
+        data['members.remove'] = members_remove
+    if description and description != current_data.get('description'):
+        data['description'] = description
+
+    return data
+
+def send(dev, module, method, request, data, expected, action):
+    try:
+        result = dev._send(method, request, data)
+    except:
+        err = sys.exc_info()[1]
+        module.fail_json(msg='Unable to connect to device: %s' % err)
+
+    if result.status_code != expected:
+        module.fail_json(msg='Unable to %s object-group - %s' % (action, result.status_code))
+
+    return True
+
+def main():
+    module = AnsibleModule(
+        argument_spec=connection_argument_spec(dict(
+            host=dict(required=True),
+            username=dict(required=True),
+            password=dict(required=True),
+            name=dict(required=True),
+            description=dict(required=False),
+            ports=dict(required=False, type='list'),
+            state=dict(required=True, choices=['absent', 'present']),
+            validate_certs=dict(required=False, choices=['no', 'yes'], default='yes')), failover=True),
+        supports_check_mode=False)
+
+    m_args = module.params
+
+    if not has_rasa:
+        module.fail_json(msg='Missing required rasa module (check docs)')
+
+    if m_args['state'] == 'present' and not m_args['ports']:
+        module.fail_json(msg='Ports not defined')
+
+    dev = connect_device(module)
+
+    request = 'objects/networkservicegroups/%s' % m_args['name']
+    members = []
+    if m_args['state'] == 'present':
+        members = desired_members(module, m_args['ports'])
+
+    try:
+        data = dev._get(request)
+    except:
+        err = sys.exc_info()[1]
+        module.fail_json(msg='Unable to connect to device: %s' % err)
+
+    if data.status_code == 200:
+        if m_args['state'] == 'absent':
+            changed_status = send(dev, module, 'DELETE', request, False, 204, 'delete')
+        else:
+            patch = member_changes(data.json(), members, m_args['description'])
+            changed_status = False
+            if patch:
+                changed_status = send(dev, module, 'PATCH', request, patch, 204, 'update')
+
+    elif data.status_code == 401:
+        module.fail_json(msg='Authentication error')
+
+    elif data.status_code == 404:
+        if m_args['state'] == 'absent':
+            changed_status = False
+        else:
+            desired_data = {
+                'kind': 'object#NetworkServiceGroup',
+                'name': m_args['name'],
+                'members': members
+            }
+            if m_args['description']:
+                desired_data['description'] = m_args['description']
+            changed_status = send(dev, module, 'POST', 'objects/networkservicegroups', desired_data, 201, 'create')
+    else:
+        module.fail_json(msg="Unsupported return code %s" % data.status_code)
+
+    return_msg = {}
+    return_msg['changed'] = changed_status
+    if m_args['state'] == 'present':
+        return_msg['ports'] = { 'entries': len(m_args['ports']), 'members': len(members) }
+
+    module.exit_json(**return_msg)
+
+main()
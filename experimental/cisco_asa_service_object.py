@@ -25,19 +25,28 @@ description:
     - Configures network objects
 requirements:
     - rasa
+extends_documentation_fragment:
+    - cisco_asa
+    - cisco_asa.failover
 options:
     category:
         description:
             - The type of object you are creating. Use slash notation for subnets, i.e. 192.168.0.0/24. Use - for ranges, i.e. 192.168.0.1-192.168.0.10. 
         choices: [ 'ipv4_address', 'ipv6_address', 'ipv4_subnet', 'ipv6_subnet', 'ipv4_range', 'ipv6_range', 'ipv4_fqdn', 'ipv6_fqdn' ]
         required: false
+    check_duplicates:
+        description:
+            - Look for other tcp and udp service objects with the same ports. They are returned as duplicates and the ones whose ports overlap as overlaps. A missing object isn't created when a duplicate exists.
+        choices: [ 'no', 'yes']
+        default: 'no'
+        required: false
     description:
         description:
             - Description of the object
         required: false
     dst_port:
         description:
-            - Destination port. Usable when protocol is set to tcp, udp or icmp
+            - Destination port. Usable when protocol is set to tcp, udp or icmp. Given as a number or name, i.e. 443 or https, or as a range, i.e. 1000-2000, range 1000 2000, lt 1024 or gt 1023.
         required: false
     host:
         description:
@@ -51,10 +60,18 @@ options:
         description:
             - Password for the device
         required: true
+    plan_file:
+        description:
+            - Path to a plan file. The current configuration is read from the device, including the changes earlier tasks added to the plan, but the changes are added to the plan instead of being sent. They replace the ones this task added before. Use cisco_asa_apply_plan to execute the plan later.
+        required: false
     protocol:
         description:
             - Protocol
         required: False
+    running_config:
+        description:
+            - Path to a saved 'show running-config'. The device isn't contacted, the current configuration is read from the file and the changes the module would make are returned as plan.
+        required: false
     src_port:
         description:
             - Source port. Usable when protocol is set to tcp or udp.
@@ -107,11 +124,12 @@ EXAMPLES = '''
 
 import sys
 from ansible.module_utils.basic import *
+from ansible.module_utils.cisco_asa import connect_device, connection_argument_spec, iter_collection, load_plan, match_objects, OfflineASA, plan_task, PlanningDevice, port_interval, save_plan, service_object_data, split_service
 from collections import defaultdict
 
 try:
     from rasa import ASA
-    from rasa.constants import ip_protocol_name, tcp_services, udp_services
+    from rasa.constants import ip_protocol_name
     has_rasa = True
 except:
     has_rasa = False
@@ -122,7 +140,7 @@ def create_object(dev, module, desired_data):
     try:
         result = dev.create_serviceobject(desired_data)
     except:
-        err = sys.exc_info()[0]
+        err = sys.exc_info()[1]
         module.fail_json(msg='Unable to connect to device: %s' % err)
 
     if result.status_code == 201:
@@ -136,7 +154,7 @@ def delete_object(dev, module, name):
     try:
         result = dev.delete_serviceobject(name)
     except:
-        err = sys.exc_info()[0]
+        err = sys.exc_info()[1]
         module.fail_json(msg='Unable to connect to device: %s' % err)
 
     if result.status_code == 204:
@@ -146,13 +164,37 @@ def delete_object(dev, module, name):
 
     return return_status
 
+def find_duplicates(dev, module, name, protocol, start, end):
+    """Returns the names of the other tcp and udp service objects covering
+    exactly the same ports and of the ones whose ports overlap
+    """
+    duplicates = []
+    overlaps = []
+    for item in iter_collection(dev, module, 'objects/networkservices', optional=True):
+        if item.get('name') == name or item.get('kind', '').lower() != 'object#tcpudpserviceobj':
+            continue
+        try:
+            item_protocol, port = split_service(item.get('value', ''))
+            item_start, item_end = port_interval(item_protocol, port)
+        except ValueError:
+            continue
+        if item_protocol != protocol and 'tcp-udp' not in (item_protocol, protocol):
+            continue
+        if (item_protocol, item_start, item_end) == (protocol, start, end):
+            duplicates.append(item['name'])
+        elif item_start <= end and start <= item_end:
+            overlaps.append(item['name'])
+
+    return sorted(duplicates), sorted(overlaps)
+
 def main():
     module = AnsibleModule(
-        argument_spec=dict(
+        argument_spec=connection_argument_spec(dict(
             host=dict(required=True),
             username=dict(required=True),
             password=dict(required=True),
             name=dict(required=True),
+            check_duplicates=dict(required=False, choices=['no', 'yes'], default='no'),
             description=dict(required=False),
             dst_port=dict(required=False),
             src_port=dict(required=False),
@@ -191,30 +233,32 @@ def main():
                 '237', '238', '239', '240', '241', '242', '243', '244', '245',
                 '246', '247', '248', '249', '250', '251', '252', '253', '254',
                 '255',]),
+            running_config=dict(required=False),
+            plan_file=dict(required=False),
             validate_certs=dict(required=False, choices=['no', 'yes'], default='yes'),
-            value=dict(required=False)),
+            value=dict(required=False)), failover=True),
             required_together = ( ['category','value'],),
+        mutually_exclusive=(['plan_file', 'running_config'],),
         supports_check_mode=False)
 
     m_args = module.params
 
-    if not has_rasa:
+    if not has_rasa and not m_args['running_config']:
         module.fail_json(msg='Missing required rasa module (check docs)')
 
     if m_args['state'] == "present":
         if m_args['protocol'] == False:
             module.fail_json(msg='Protocol not defined')
-    if m_args['validate_certs'] == 'yes':
-        validate_certs = True
+
+    if m_args['running_config']:
+        dev = OfflineASA(m_args['host'], m_args['running_config'])
+    elif m_args['plan_file']:
+        dev = connect_device(module, PlanningDevice)
     else:
-        validate_certs = False
+        dev = connect_device(module)
 
-    dev = ASA(
-        device=m_args['host'],
-        username=m_args['username'],
-        password=m_args['password'],
-        verify_cert=validate_certs
-    )
+    if m_args['plan_file']:
+        load_plan(dev, module, m_args['plan_file'], plan_task('service_object', m_args, ['name']))
 
     if m_args['src_port'] and m_args['protocol'] not in protocols_using_ports:
         module.fail_json(msg="Can't use source port with %s" % m_args['protocol'])
@@ -222,15 +266,17 @@ def main():
     if m_args['dst_port'] and m_args['protocol'] not in protocols_using_ports:
         module.fail_json(msg="Can't use destination port with %s" % m_args['protocol'])
 
+    if m_args['src_port'] and not m_args['dst_port']:
+        module.fail_json(msg='Destination port not defined, src_port requires dst_port')
 
     # icmp -> ICMPServiceObj
     # icmp6 -> object#ICMP6ServiceObj
+    protocol = m_args['protocol']
     if m_args['dst_port'] or m_args['src_port']:
         kind = 'object#TcpUdpServiceObj'
     elif m_args['protocol']:
         kind = 'object#NetworkProtocolObj'
 
-        protocol = m_args['protocol']
         try:
             protocol = int(m_args['protocol'])
         except:
@@ -240,39 +286,26 @@ def main():
     else:
         kind = 'object#NetworkProtocolObj'
 
-    # Change to function to target source dest udp and tcp
-    if m_args['dst_port'] and m_args['protocol'] == 'tcp':
+    # Ports are compared as ranges, so https, eq 443 and 443 are the same
+    if m_args['dst_port']:
         try:
-            int(m_args['dst_port'])
-        except:
-            if m_args['dst_port'] not in tcp_services.itervalues():
-                module.fail_json(msg='%s is not valid using tcp' % m_args['dst_port'])
+            dst_start, dst_end = port_interval(m_args['protocol'], str(m_args['dst_port']))
+        except ValueError:
+            module.fail_json(msg='%s is not valid using %s - %s' % (m_args['dst_port'], m_args['protocol'], sys.exc_info()[1]))
 
-        if isinstance(m_args['dst_port'], int):
-            if 1 <= m_args['dst_port'] <= 65535:
-                m_args['dst_port'] = str(m_args['dst_port'])
-            else:
-                module.fail_json(msg='%s is not a valid tcp port' % m_args['dst_port'])
 
+    # Fix for source ports too
+    desired_data = service_object_data(m_args['name'], protocol, m_args['dst_port'], m_args['description'])
 
-    desired_data = {}
-    desired_data['name'] = m_args['name']
-    desired_data['objectId'] = m_args['name']
-    desired_data['kind'] = kind
-
-    if kind == 'object#NetworkProtocolObj':
-        desired_data['value'] = protocol
-    elif kind == 'object#TcpUdpServiceObj':
-        # Fix for source ports too
-        desired_data['value'] = '%s/%s' % (m_args['protocol'], m_args['dst_port'])
-
-    if m_args['description']:
-        desired_data['description'] = m_args['description']
+    duplicates = []
+    overlaps = []
+    if m_args['check_duplicates'] == 'yes' and m_args['state'] == 'present' and kind == 'object#TcpUdpServiceObj':
+        duplicates, overlaps = find_duplicates(dev, module, m_args['name'], m_args['protocol'], dst_start, dst_end)
 
     try:
         data = dev.get_serviceobject(m_args['name'])
     except:
-        err = sys.exc_info()[0]
+        err = sys.exc_info()[1]
         module.fail_json(msg='Unable to connect to device: %s' % err)
 
     if data.status_code == 200:
@@ -280,7 +313,7 @@ def main():
             changed_status = delete_object(dev, module, m_args['name'])
         elif m_args['state'] == 'present':
 
-            matched = match_objects(data.json(), desired_data, module)
+            matched = match_objects(data.json(), desired_data, ['kind', 'value', 'description'])
             if matched:
                 changed_status = False
             else:
@@ -293,46 +326,30 @@ def main():
         if m_args['state'] == 'absent':
             changed_status = False
         elif m_args['state'] == 'present':
-            changed_status = create_object(dev, module, desired_data)
+            if duplicates:
+                changed_status = False
+            else:
+                changed_status = create_object(dev, module, desired_data)
     else:
         module.fail_json(msg="Unsupported return code %s" % data.status_code)
 
     return_msg = {}
     return_msg['changed'] = changed_status
-
+    if m_args['check_duplicates'] == 'yes':
+        return_msg['duplicates'] = duplicates
+        return_msg['overlaps'] = overlaps
+
+    if m_args['plan_file']:
+        save_plan(dev, module, m_args['plan_file'])
+    if m_args['running_config'] or m_args['plan_file']:
+        return_msg['plan'] = dev.plan
     module.exit_json(**return_msg)
     
-def match_objects(current_data, desired_data, module):
-    has_current_desc = False
-    has_desired_desc = False
-
-    if 'description' in current_data.keys():
-        has_current_desc = True
-        
-    if 'description' in desired_data.keys():
-        has_desired_desc = True
-
-    if has_current_desc == has_desired_desc:
-        if has_desired_desc == True:
-            if current_data['description'] != desired_data['description']:
-                return False
-    else:
-        return False
-
-    if current_data['kind'] != desired_data['kind']:
-        return False
-
-    if current_data['value'] != desired_data['value']:
-        return False
-
-    return True
-
-
 def update_object(dev, module, desired_data):
     try:
         result = dev.update_serviceobject(desired_data['name'], desired_data)
     except:
-        err = sys.exc_info()[0]
+        err = sys.exc_info()[1]
         module.fail_json(msg='Unable to connect to device: %s' % err)
 
     if result.status_code == 204:
@@ -0,0 +1,245 @@
+#!/usr/bin/python
+
+# Copyright 2015 Patrick Ogenstad <patrick@ogenstad.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+DOCUMENTATION = '''
+---
+
+module: cisco_asa_access_list
+author: Patrick Ogenstad (@networklore)
+version: 0.x
+short_description: Creates deletes or edits extended access-lists.
+description:
+    - Makes the entries of an extended access-list match an ordered list of ACEs. Only the entries that differ are deleted or inserted, unchanged entries are left alone even if their line numbers change.
+requirements:
+    - rasa
+extends_documentation_fragment:
+    - cisco_asa
+    - cisco_asa.failover
+options:
+    aces:
+        description:
+            - The complete ordered list of ACEs. Each ACE is a dict with action (permit or deny, default permit), source_category and source, destination_category and destination, service and active (default yes). Categories are any, ipv4_address, ipv6_address, ipv4_subnet, ipv6_subnet, object and object_group. Service is a protocol such as ip or icmp, a port such as tcp/443, or the name of a service object with service_category=object.
+        required: false
+    batch_size:
+        description:
+            - Number of changes sent in each bulk request
+        default: 50
+        required: false
+    host:
+        description:
+            - Typically set to {{ inventory_hostname }}
+        required: true
+    name:
+        description:
+            - Name of the access-list
+        required: true
+    password:
+        description:
+            - Password for the device
+        required: true
+    state:
+        description:
+            - State of the access-list
+        choices: [ 'present', 'absent' ]
+        required: true
+    username:
+        description:
+            - Username for device
+        required: true
+    validate_certs:
+        description:
+            - If no, SSL certificates will not be validated. This should only be used on personally controlled sites using self-signed certificates.
+        choices: [ 'no', 'yes']
+        default: 'yes'
+        required: false
+'''
+
+EXAMPLES = '''
+
+# Define the outside access-list
+- cisco_asa_access_list:
+    host: "{{ inventory_hostname }}"
+    username: api_user
+    password: APIpass123
+    name: outside_access_in
+    state: present
+    validate_certs: no
+    aces:
+      - source_category: any
+        destination_category: object
+        destination: tsrv-web-1
+        service: tcp/443
+      - source_category: ipv4_subnet
+        source: 10.12.30.0/24
+        destination_category: object_group
+        destination: OG-MONITORED-SERVERS
+        service: icmp
+      - action: deny
+        service: ip
+
+# Remove an access-list
+- cisco_asa_access_list:
+    host={{ inventory_hostname }}
+    username=api_user
+    password=APIpass123
+    name=old_acl
+    state=absent
+    validate_certs=no
+'''
+
+import sys
+from ansible.module_utils.basic import *
+from ansible.module_utils.cisco_asa import bulk_request, connect_device, connection_argument_spec, edit_script, iter_collection, normalize
+
+try:
+    from rasa import ASA
+    has_rasa = True
+except:
+    has_rasa = False
+
+address_kind = {
+    'any': 'AnyIPAddress',
+    'ipv4_address': 'IPv4Address',
+    'ipv6_address': 'IPv6Address',
+    'ipv4_subnet': 'IPv4Network',
+    'ipv6_subnet': 'IPv6Network',
+    'object': 'objectRef#NetworkObj',
+    'object_group': 'objectRef#NetworkObjGroup'
+}
+
+def ace_key(ace):
+    """The fields an ACE is compared on"""
+    key = [ace.get('permit'), ace.get('active', True)]
+    for field in ['sourceAddress', 'destinationAddress', 'sourceService', 'destinationService']:
+        value = normalize(ace.get(field) or {})
+        key.append(value.get('kind'))
+        key.append(value.get('objectId', value.get('value')))
+    return tuple(key)
+
+def build_address(module, ace, direction):
+    category = ace.get('%s_category' % direction, 'any')
+    if category not in address_kind:
+        module.fail_json(msg='Invalid %s_category in ace: %s' % (direction, ace))
+
+    address = {}
+    address['kind'] = address_kind[category]
+    if category == 'any':
+        address['value'] = 'any'
+    elif not ace.get(direction):
+        module.fail_json(msg='Missing %s in ace: %s' % (direction, ace))
+    elif category in ['object', 'object_group']:
+        address['objectId'] = ace[direction]
+    else:
+        address['value'] = ace[direction]
+
+    return address
+
+def build_ace(module, ace):
+    if not isinstance(ace, dict):
+        module.fail_json(msg='ACEs must be dicts: %s' % ace)
+
+    action = ace.get('action', 'permit')
+    if action not in ['permit', 'deny']:
+        module.fail_json(msg='Invalid action in ace: %s' % ace)
+
+    data = {}
+    data['permit'] = action == 'permit'
+    data['active'] = module.boolean(ace.get('active', True))
+    data['sourceAddress'] = build_address(module, ace, 'source')
+    data['destinationAddress'] = build_address(module, ace, 'destination')
+
+    service = ace.get('service', 'ip')
+    if ace.get('service_category') == 'object':
+        data['sourceService'] = { 'kind': 'NetworkProtocol', 'value': 'ip' }
+        data['destinationService'] = { 'kind': 'objectRef#TcpUdpServiceObj', 'objectId': service }
+    elif '/' in service:
+        protocol = service.split('/')[0]
+        data['sourceService'] = { 'kind': 'NetworkProtocol', 'value': protocol }
+        data['destinationService'] = { 'kind': 'TcpUdpService', 'value': service }
+    else:
+        data['sourceService'] = { 'kind': 'NetworkProtocol', 'value': service }
+        data['destinationService'] = { 'kind': 'NetworkProtocol', 'value': service }
+
+    return data
+
+def delete_object(dev, module, name):
+    try:
+        result = dev._delete('objects/extendedacls/%s' % name)
+    except:
+        err = sys.exc_info()[1]
+        module.fail_json(msg='Unable to connect to device: %s' % err)
+
+    if result.status_code == 204:
+        return_status = True
+    elif result.status_code == 404:
+        return_status = False
+    else:
+        module.fail_json(msg='Unable to delete access-list - %s' % result.status_code)
+
+    return return_status
+
+def main():
+    module = AnsibleModule(
+        argument_spec=connection_argument_spec(dict(
+            host=dict(required=True),
+            username=dict(required=True),
+            password=dict(required=True),
+            name=dict(required=True),
+            aces=dict(required=False, type='list'),
+            batch_size=dict(required=False, type='int', default=50),
+            state=dict(required=True, choices=['absent', 'present']),
+            validate_certs=dict(required=False, choices=['no', 'yes'], default='yes')), failover=True),
+        required_if=([('state', 'present', ['aces'])]),
+        supports_check_mode=False)
+
+    m_args = module.params
+
+    if not has_rasa:
+        module.fail_json(msg='Missing required rasa module (check docs)')
+
+    dev = connect_device(module)
+
+    if m_args['state'] == 'absent':
+        changed_status = delete_object(dev, module, m_args['name'])
+        module.exit_json(changed=changed_status)
+
+    desired_aces = [build_ace(module, ace) for ace in m_args['aces']]
+
+    request = 'objects/extendedacls/%s/aces' % m_args['name']
+    current_aces = list(iter_collection(dev, module, request, optional=True))
+
+    deletes, inserts = edit_script(current_aces, desired_aces, ace_key)
+
+    operations = []
+    for ace in deletes:
+        operations.append(('Delete', '%s/%s' % (request, ace['objectId']), None))
+    for position, ace in inserts:
+        data = dict(ace)
+        data['position'] = position
+        operations.append(('Post', request, data))
+
+    if operations:
+        bulk_request(dev, module, operations, m_args['batch_size'])
+
+    return_msg = {}
+    return_msg['changed'] = len(operations) > 0
+    return_msg['deleted'] = len(deletes)
+    return_msg['inserted'] = len(inserts)
+    return_msg['unchanged'] = len(current_aces) - len(deletes)
+
+    module.exit_json(**return_msg)
+
+main()
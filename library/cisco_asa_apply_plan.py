@@ -0,0 +1,167 @@
+#!/usr/bin/python
+
+# Copyright 2015 Patrick Ogenstad <patrick@ogenstad.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+DOCUMENTATION = '''
+---
+
+module: cisco_asa_apply_plan
+author: Patrick Ogenstad (@networklore)
+version: 0.x
+short_description: Executes a stored change plan.
+description:
+    - Sends the changes stored in a plan file by running the network object, object-group, service object and ikev1 policy modules with plan_file. Before sending, the configuration checksum and the objects the plan changes are read from the device. If the checksum differs from the one the plan was made against, or an object differs from the one planned against, the plan is refused as it may no longer be correct. The objects are compared as well because the checksum isn't certain to change when the configuration is edited without saving it.
+requirements:
+    - rasa
+extends_documentation_fragment:
+    - cisco_asa
+    - cisco_asa.failover
+options:
+    batch_size:
+        description:
+            - Number of changes sent in each bulk request. Set to 0 to send each change in its own request, which is also done when the device has no bulk API.
+        default: 50
+        required: false
+    force:
+        description:
+            - Apply the plan even if the configuration or the objects changed since it was made
+        choices: [ 'no', 'yes']
+        default: 'no'
+        required: false
+    host:
+        description:
+            - Typically set to {{ inventory_hostname }}
+        required: true
+    password:
+        description:
+            - Password for the device
+        required: true
+    plan_file:
+        description:
+            - Path to the plan file
+        required: true
+    username:
+        description:
+            - Username for device
+        required: true
+    validate_certs:
+        description:
+            - If no, SSL certificates will not be validated. This should only be used on personally controlled sites using self-signed certificates.
+        choices: [ 'no', 'yes']
+        default: 'yes'
+        required: false
+'''
+
+EXAMPLES = '''
+
+# Plan ahead of the change window
+- cisco_asa_network_object:
+    host: "{{ inventory_hostname }}"
+    username: api_user
+    password: APIpass123
+    name: tsrv-web-1
+    state: present
+    category: ipv4_address
+    value: 10.12.30.10
+    plan_file: "plans/{{ inventory_hostname }}.json"
+    validate_certs: no
+
+# In the change window
+- cisco_asa_apply_plan:
+    host: "{{ inventory_hostname }}"
+    username: api_user
+    password: APIpass123
+    plan_file: "plans/{{ inventory_hostname }}.json"
+    validate_certs: no
+'''
+
+import json
+import sys
+import time
+from ansible.module_utils.basic import *
+from ansible.module_utils.cisco_asa import bulk_request, connect_device, connection_argument_spec, get_checksum, get_stream, read_plan, response_hash, send_operations
+
+try:
+    from rasa import ASA
+    has_rasa = True
+except:
+    has_rasa = False
+
+def mark_applied(module, path, plan):
+    plan['applied'] = time.time()
+    try:
+        with open(path, 'w') as f:
+            json.dump(plan, f, indent=2, sort_keys=True)
+    except IOError:
+        module.fail_json(msg='Plan applied but unable to update %s - %s' % (path, sys.exc_info()[1]))
+
+def main():
+    module = AnsibleModule(
+        argument_spec=connection_argument_spec(dict(
+            host=dict(required=True),
+            username=dict(required=True),
+            password=dict(required=True),
+            plan_file=dict(required=True),
+            force=dict(required=False, choices=['no', 'yes'], default='no'),
+            batch_size=dict(required=False, type='int', default=50),
+            validate_certs=dict(required=False, choices=['no', 'yes'], default='yes')), failover=True),
+        supports_check_mode=False)
+
+    m_args = module.params
+
+    if not has_rasa:
+        module.fail_json(msg='Missing required rasa module (check docs)')
+
+    plan = read_plan(m_args['plan_file'])
+    if plan is None:
+        module.fail_json(msg='Unable to read plan %s' % m_args['plan_file'])
+    if plan['device'] != m_args['host']:
+        module.fail_json(msg='The plan was made for %s' % plan['device'])
+
+    operations = plan['operations']
+    if plan.get('applied') or not operations:
+        module.exit_json(changed=False, applied=0, operations=len(operations))
+
+    dev = connect_device(module)
+
+    checksum = get_checksum(dev, module)
+    if checksum != plan['checksum'] and m_args['force'] == 'no':
+        module.fail_json(msg='The configuration changed since the plan was made, plan again or use force',
+                         plan_checksum=plan['checksum'], checksum=checksum)
+
+    if m_args['force'] == 'no':
+        changed_objects = []
+        for request in sorted(plan.get('objects', {})):
+            try:
+                response = get_stream(dev, request)
+            except:
+                err = sys.exc_info()[1]
+                module.fail_json(msg='Unable to connect to device: %s' % err)
+            if response_hash(module, request, response) != plan['objects'][request]:
+                changed_objects.append(request)
+        if changed_objects:
+            module.fail_json(msg='Objects changed since the plan was made, plan again or use force', objects=changed_objects)
+
+    changes = [(operation['method'], operation['request'], operation.get('data')) for operation in operations]
+    if m_args['batch_size'] > 0:
+        bulk_request(dev, module, changes, m_args['batch_size'])
+    else:
+        send_operations(dev, module, changes)
+
+    mark_applied(module, m_args['plan_file'], plan)
+
+    module.exit_json(changed=True, applied=len(operations), operations=len(operations))
+
+main()
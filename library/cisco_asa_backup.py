@@ -0,0 +1,259 @@
+#!/usr/bin/python
+
+# Copyright 2015 Patrick Ogenstad <patrick@ogenstad.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+DOCUMENTATION = '''
+---
+
+module: cisco_asa_backup
+author: Patrick Ogenstad (@networklore)
+version: 0.x
+short_description: Exports or restores the object tables.
+description:
+    - Exports the network objects, service objects, ikev1 policies and network object-groups of a device to a file, or restores them from a file. Objects are streamed one at a time in both directions, so memory use doesn't depend on the number of objects. A restore creates the objects in dependency order using the bulk API and is meant for devices that don't have the objects yet.
+requirements:
+    - rasa
+    - msgpack (for format=msgpack)
+extends_documentation_fragment:
+    - cisco_asa
+    - cisco_asa.failover
+options:
+    batch_size:
+        description:
+            - Number of objects created in each bulk request during a restore
+        default: 50
+        required: false
+    format:
+        description:
+            - File format, one JSON document per line or a stream of msgpack records
+        choices: [ 'jsonl', 'msgpack' ]
+        default: 'jsonl'
+        required: false
+    host:
+        description:
+            - Typically set to {{ inventory_hostname }}
+        required: true
+    mode:
+        description:
+            - Export the objects to path or restore them from path
+        choices: [ 'export', 'restore' ]
+        required: true
+    password:
+        description:
+            - Password for the device
+        required: true
+    path:
+        description:
+            - The file to write to or read from
+        required: true
+    username:
+        description:
+            - Username for device
+        required: true
+    validate_certs:
+        description:
+            - If no, SSL certificates will not be validated. This should only be used on personally controlled sites using self-signed certificates.
+        choices: [ 'no', 'yes']
+        default: 'yes'
+        required: false
+'''
+
+EXAMPLES = '''
+
+# Export the objects of a firewall
+- cisco_asa_backup:
+    host={{ inventory_hostname }}
+    username=api_user
+    password=APIpass123
+    mode=export
+    path=/var/backups/asa/{{ inventory_hostname }}.jsonl
+    validate_certs=no
+
+# Rebuild a lab firewall from the export
+- cisco_asa_backup:
+    host=lab-asa-1
+    username=api_user
+    password=APIpass123
+    mode=restore
+    path=/var/backups/asa/asa-1.jsonl
+    validate_certs=no
+'''
+
+import json
+import sys
+from ansible.module_utils.basic import *
+from ansible.module_utils.cisco_asa import bulk_request, connect_device, connection_argument_spec, iter_collection
+
+try:
+    from rasa import ASA
+    has_rasa = True
+except:
+    has_rasa = False
+
+try:
+    import msgpack
+    has_msgpack = True
+except:
+    has_msgpack = False
+
+# Objects are exported and restored in this order so that everything an
+# object-group can reference already exists when the group is created.
+COLLECTIONS = [
+    'objects/networkobjects',
+    'objects/networkservices',
+    'vpn/ikev1policy',
+    'objects/networkobjectgroups'
+]
+
+GROUP_COLLECTION = 'objects/networkobjectgroups'
+
+def export_objects(dev, module, path, file_format):
+    counts = dict((collection, 0) for collection in COLLECTIONS)
+    with open(path, 'wb') as f:
+        for collection in COLLECTIONS:
+            for obj in iter_collection(dev, module, collection):
+                write_record(f, file_format, { 'collection': collection, 'object': obj })
+                counts[collection] += 1
+
+    return counts
+
+def group_levels(module, path, file_format):
+    """Reads the group names and the groups they contain and returns a dict
+    with the level of each group, groups on level 0 only contain other
+    objects and groups on level n contain groups from level n - 1 or lower.
+    """
+    children = {}
+    for record in read_records(module, path, file_format):
+        if record['collection'] == GROUP_COLLECTION:
+            group = record['object']
+            children[group['name']] = [member['objectId'] for member in group.get('members', [])
+                                       if member.get('kind') == 'objectRef#NetworkObjGroup']
+
+    levels = {}
+    def level(name, seen):
+        if name not in levels:
+            if name in seen:
+                module.fail_json(msg='Circular group reference in %s' % name)
+            seen.add(name)
+            levels[name] = 1 + max([level(child, seen) for child in children.get(name, []) if child in children] + [-1])
+        return levels[name]
+
+    for name in children:
+        level(name, set())
+
+    return levels
+
+def read_records(module, path, file_format):
+    try:
+        f = open(path, 'rb')
+    except IOError:
+        err = sys.exc_info()[1]
+        module.fail_json(msg='Unable to open %s: %s' % (path, err))
+
+    with f:
+        if file_format == 'msgpack':
+            for record in msgpack.Unpacker(f, raw=False):
+                yield record
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line.decode('utf-8'))
+
+def restore_data(host, obj):
+    data = dict(obj)
+    data.pop('selfLink', None)
+    if 'members' in data:
+        members = []
+        for member in data['members']:
+            member = dict(member)
+            if 'refLink' in member:
+                collection = 'networkobjectgroups' if member['kind'] == 'objectRef#NetworkObjGroup' else 'networkobjects'
+                member['refLink'] = 'https://%s/api/objects/%s/%s' % (host, collection, member['objectId'])
+            members.append(member)
+        data['members'] = members
+
+    return data
+
+def restore_objects(dev, module, path, file_format, batch_size):
+    counts = dict((collection, 0) for collection in COLLECTIONS)
+    levels = group_levels(module, path, file_format)
+
+    # One pass for everything but the groups, then one pass per group level
+    passes = [None] + sorted(set(levels.values()))
+    for group_level in passes:
+        operations = []
+        for record in read_records(module, path, file_format):
+            collection = record['collection']
+            if group_level is None and collection == GROUP_COLLECTION:
+                continue
+            if group_level is not None:
+                if collection != GROUP_COLLECTION or levels[record['object']['name']] != group_level:
+                    continue
+
+            operations.append(('Post', collection, restore_data(dev.device, record['object'])))
+            counts[collection] += 1
+            if len(operations) >= batch_size:
+                bulk_request(dev, module, operations, batch_size)
+                operations = []
+
+        if operations:
+            bulk_request(dev, module, operations, batch_size)
+
+    return counts
+
+def write_record(f, file_format, record):
+    if file_format == 'msgpack':
+        f.write(msgpack.packb(record, use_bin_type=True))
+    else:
+        f.write(json.dumps(record).encode('utf-8'))
+        f.write(b'\n')
+
+def main():
+    module = AnsibleModule(
+        argument_spec=connection_argument_spec(dict(
+            host=dict(required=True),
+            username=dict(required=True),
+            password=dict(required=True),
+            mode=dict(required=True, choices=['export', 'restore']),
+            path=dict(required=True),
+            format=dict(required=False, choices=['jsonl', 'msgpack'], default='jsonl'),
+            batch_size=dict(required=False, type='int', default=50),
+            validate_certs=dict(required=False, choices=['no', 'yes'], default='yes')), failover=True),
+        supports_check_mode=False)
+
+    m_args = module.params
+
+    if not has_rasa:
+        module.fail_json(msg='Missing required rasa module (check docs)')
+
+    if m_args['format'] == 'msgpack' and not has_msgpack:
+        module.fail_json(msg='Missing required msgpack module for format=msgpack')
+
+    dev = connect_device(module)
+
+    if m_args['mode'] == 'export':
+        counts = export_objects(dev, module, m_args['path'], m_args['format'])
+        changed_status = True
+    else:
+        counts = restore_objects(dev, module, m_args['path'], m_args['format'], m_args['batch_size'])
+        changed_status = sum(counts.values()) > 0
+
+    return_msg = {}
+    return_msg['changed'] = changed_status
+    return_msg['objects'] = counts
+
+    module.exit_json(**return_msg)
+
+main()
@@ -0,0 +1,262 @@
+#!/usr/bin/python
+
+# Copyright 2015 Patrick Ogenstad <patrick@ogenstad.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+DOCUMENTATION = '''
+---
+
+module: cisco_asa_compare
+author: Patrick Ogenstad (@networklore)
+version: 0.x
+short_description: Compares the object tables of two firewalls or of a firewall and a desired state.
+description:
+    - Compares network objects, object-groups, service objects and ikev1 policies by a hash of every object. The ASA can't hash objects itself, so every object of the compared collections is read from the device. The hashes are stored per device with the configuration checksum. With use_cache they are reused while the checksum is unchanged and nothing else is read from the device. The reference is either a second firewall or a desired state file written by cisco_asa_backup or cisco_asa_compile.
+requirements:
+    - rasa
+extends_documentation_fragment:
+    - cisco_asa
+options:
+    collections:
+        description:
+            - Collections to compare. By default all of them with peer, and the ones found in the file with desired, as a desired state doesn't have to describe every collection.
+        choices: [ 'ikev1_policies', 'network_objects', 'object_groups', 'service_objects' ]
+        required: false
+    desired:
+        description:
+            - JSON lines file with the desired state, as written by cisco_asa_backup or cisco_asa_compile. Mutually exclusive with peer.
+        required: false
+    host:
+        description:
+            - Typically set to {{ inventory_hostname }}
+        required: true
+    password:
+        description:
+            - Password for the device
+        required: true
+    peer:
+        description:
+            - Firewall to compare against. Mutually exclusive with desired.
+        required: false
+    peer_password:
+        description:
+            - Password for the peer, by default the same as password
+        required: false
+    peer_username:
+        description:
+            - Username for the peer, by default the same as username
+        required: false
+    show_objects:
+        description:
+            - Return the objects that differ from both sides. They are read again from the devices.
+        choices: [ 'no', 'yes']
+        default: 'no'
+        required: false
+    use_cache:
+        description:
+            - Reuse the hashes stored by an earlier comparison while the configuration checksum of the device is unchanged. The checksum may stay the same when the running configuration is changed but not saved, in which case the comparison is made against stale hashes.
+        choices: [ 'no', 'yes']
+        default: 'no'
+        required: false
+    username:
+        description:
+            - Username for device
+        required: true
+    validate_certs:
+        description:
+            - If no, SSL certificates will not be validated. This should only be used on personally controlled sites using self-signed certificates.
+        choices: [ 'no', 'yes']
+        default: 'yes'
+        required: false
+'''
+
+EXAMPLES = '''
+
+# Check that both firewalls of a site have the same objects
+- cisco_asa_compare:
+    host: "{{ inventory_hostname }}"
+    username: api_user
+    password: APIpass123
+    peer: asa-site1-b
+    show_objects: yes
+    validate_certs: no
+
+# Compare a firewall with its compiled desired state
+- cisco_asa_compare:
+    host: "{{ inventory_hostname }}"
+    username: api_user
+    password: APIpass123
+    desired: "compiled/{{ inventory_hostname }}.jsonl"
+    collections:
+      - network_objects
+      - object_groups
+    validate_certs: no
+'''
+
+import json
+import sys
+from ansible.module_utils.basic import *
+from ansible.module_utils.cisco_asa import connect_device, connection_argument_spec, connection_options, Device, device_hashes, hash_diff, object_hashes, object_name
+
+try:
+    from rasa import ASA
+    has_rasa = True
+except:
+    has_rasa = False
+
+COLLECTION_NAMES = {
+    'ikev1_policies': 'vpn/ikev1policy',
+    'network_objects': 'objects/networkobjects',
+    'object_groups': 'objects/networkobjectgroups',
+    'service_objects': 'objects/networkservices'
+}
+
+def read_desired(module, path):
+    """Returns the objects of the desired state file per collection"""
+    desired = {}
+    try:
+        with open(path, 'rb') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line.decode('utf-8'))
+                desired.setdefault(record['collection'], {})[object_name(record['object'])] = record['object']
+    except (IOError, ValueError, KeyError):
+        err = sys.exc_info()[1]
+        module.fail_json(msg='Unable to read %s: %s' % (path, err))
+
+    return desired
+
+def fetch_object(dev, module, collection, table, name):
+    request = '%s/%s' % (collection, table['ids'].get(name, name))
+    try:
+        response = dev._get(request)
+    except:
+        err = sys.exc_info()[1]
+        module.fail_json(msg='Unable to connect to device: %s' % err)
+
+    if response.status_code == 200:
+        return response.json()
+    elif response.status_code == 404:
+        return None
+    elif response.status_code == 401:
+        module.fail_json(msg='Authentication error')
+    else:
+        module.fail_json(msg='Unable to read %s - %s' % (request, response.status_code))
+
+def main():
+    module = AnsibleModule(
+        argument_spec=connection_argument_spec(dict(
+            host=dict(required=True),
+            username=dict(required=True),
+            password=dict(required=True),
+            peer=dict(required=False),
+            peer_username=dict(required=False),
+            peer_password=dict(required=False),
+            desired=dict(required=False),
+            collections=dict(required=False, type='list'),
+            show_objects=dict(required=False, choices=['no', 'yes'], default='no'),
+            use_cache=dict(required=False, choices=['no', 'yes'], default='no'),
+            validate_certs=dict(required=False, choices=['no', 'yes'], default='yes'))),
+        required_one_of=(['peer', 'desired'],),
+        mutually_exclusive=(['peer', 'desired'],),
+        supports_check_mode=True)
+
+    m_args = module.params
+
+    if not has_rasa:
+        module.fail_json(msg='Missing required rasa module (check docs)')
+
+    for name in m_args['collections'] or []:
+        if name not in COLLECTION_NAMES:
+            module.fail_json(msg='Unknown collection %s' % name)
+
+    dev = connect_device(module)
+
+    desired = None
+    if m_args['desired']:
+        desired = read_desired(module, m_args['desired'])
+
+    names = m_args['collections']
+    if not names:
+        names = sorted(COLLECTION_NAMES)
+        if desired is not None:
+            names = [name for name in names if COLLECTION_NAMES[name] in desired]
+        if not names:
+            module.fail_json(msg='No objects in %s' % m_args['desired'])
+
+    use_cache = m_args['use_cache'] == 'yes'
+    collections = [COLLECTION_NAMES[name] for name in names]
+    device = device_hashes(dev, module, collections, use_cache)
+
+    return_msg = {}
+    peer_dev = None
+    if m_args['peer']:
+        peer_dev = Device(
+            device=m_args['peer'],
+            username=m_args['peer_username'] or m_args['username'],
+            password=m_args['peer_password'] or m_args['password'],
+            **connection_options(module)
+        )
+        reference = device_hashes(peer_dev, module, collections, use_cache)
+        reference_tables = reference['tables']
+        return_msg['peer_checksum'] = reference['checksum']
+        return_msg['peer_cached'] = [name for name in names if COLLECTION_NAMES[name] in reference['cached']]
+    else:
+        reference_tables = dict((collection, object_hashes(desired.get(collection, {}).values())) for collection in collections)
+
+    results = {}
+    fetched = 0
+    for name in names:
+        collection = COLLECTION_NAMES[name]
+        table = device['tables'][collection]
+        reference_table = reference_tables[collection]
+        diff = hash_diff(table, reference_table)
+
+        result = {}
+        result['identical'] = not (diff['extra'] or diff['missing'] or diff['different'])
+        result['extra'] = diff['extra']
+        result['missing'] = diff['missing']
+        result['different'] = diff['different']
+
+        if m_args['show_objects'] == 'yes':
+            objects = {}
+            for object_key in diff['extra'] + diff['missing'] + diff['different']:
+                entry = {}
+                entry['device'] = None
+                if object_key not in diff['missing']:
+                    entry['device'] = fetch_object(dev, module, collection, table, object_key)
+                    fetched += 1
+                entry['reference'] = None
+                if object_key not in diff['extra']:
+                    if peer_dev is None:
+                        entry['reference'] = desired[collection][object_key]
+                    else:
+                        entry['reference'] = fetch_object(peer_dev, module, collection, reference_table, object_key)
+                        fetched += 1
+                objects[object_key] = entry
+            result['objects'] = objects
+
+        results[name] = result
+
+    return_msg['changed'] = False
+    return_msg['identical'] = not [name for name in results if not results[name]['identical']]
+    return_msg['collections'] = results
+    return_msg['checksum'] = device['checksum']
+    return_msg['cached'] = [name for name in names if COLLECTION_NAMES[name] in device['cached']]
+    return_msg['fetched'] = fetched
+
+    module.exit_json(**return_msg)
+
+main()
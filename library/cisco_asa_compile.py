@@ -0,0 +1,402 @@
+#!/usr/bin/python
+
+# Copyright 2015 Patrick Ogenstad <patrick@ogenstad.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+DOCUMENTATION = '''
+---
+
+module: cisco_asa_compile
+author: Patrick Ogenstad (@networklore)
+version: 0.x
+short_description: Compiles desired state files into REST payloads.
+description:
+    - Validates the desired state of many devices and turns it into the REST payloads the other modules send, without connecting to any device. Each device is compiled by a pool of worker processes and written to its own file in the format used by cisco_asa_backup. A device is only compiled again when its input file has changed.
+requirements:
+    - PyYAML (for YAML input)
+options:
+    dest:
+        description:
+            - Directory the compiled files are written to, one <device>.jsonl per input file
+        required: true
+    force:
+        description:
+            - If yes, devices are compiled even if their input hasn't changed
+        choices: [ 'no', 'yes']
+        default: 'no'
+        required: false
+    src:
+        description:
+            - A desired state file, or a directory of them. The device name is the file name without the .yml, .yaml or .json extension. A file can have the keys network_objects, service_objects, object_groups and ikev1_policies, which take the same options as the cisco_asa_network_object, cisco_asa_service_object, cisco_asa_network_objectgroup and cisco_asa_ikev1_policy modules. Object-groups list their members as entries. Service objects take protocol names, not numbers, and no source ports. Names, addresses, subnets, ranges, FQDNs and ports are validated.
+        required: true
+    workers:
+        description:
+            - Number of worker processes, defaults to the number of CPUs
+        required: false
+'''
+
+EXAMPLES = '''
+
+# Compile the desired state of all firewalls
+- cisco_asa_compile:
+    src=/srv/asa/desired
+    dest=/srv/asa/compiled
+  delegate_to: localhost
+  run_once: true
+
+# /srv/asa/desired/asa-1.yml
+network_objects:
+  - name: tsrv-web-1
+    category: ipv4_address
+    value: 10.12.30.10
+service_objects:
+  - name: svc-web-alt
+    protocol: tcp
+    dst_port: 8000-8080
+object_groups:
+  - name: OG-MONITORED-SERVERS
+    description: Servers monitored by NMS
+    entries:
+      - category: object
+        value: tsrv-web-1
+      - category: ipv4_subnet
+        value: 10.12.40.0/24
+ikev1_policies:
+  - priority: 10
+    authentication: pre-share
+    encryption: aes-256
+    hash: sha
+    group: 2
+    lifetime: 86400
+'''
+
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import sys
+from ansible.module_utils.basic import *
+from ansible.module_utils.cisco_asa import address_interval, address_to_int, basestring, group_member_data, GROUP_MEMBER_KIND, ikev1_policy_data, network_object_data, NETWORK_OBJECT_KIND, normalize_network, service_object_data
+
+try:
+    import yaml
+    try:
+        from yaml import CSafeLoader as YamlLoader
+    except ImportError:
+        from yaml import SafeLoader as YamlLoader
+    has_yaml = True
+except:
+    has_yaml = False
+
+# Changing how payloads are built has to invalidate the compiled files
+COMPILER_VERSION = '2'
+
+EXTENSIONS = ['.json', '.yaml', '.yml']
+
+IKEV1_CHOICES = {
+    'authentication': ['pre-share', 'rsa-sig'],
+    'encryption': ['des', '3des', 'aes-128', 'aes-192', 'aes-256'],
+    'hash': ['md5', 'sha'],
+    'group': ['1', '2', '5']
+}
+
+# cisco_asa_service_object translates protocol numbers to names with rasa,
+# which the compiler doesn't use, so only names are accepted
+SERVICE_PROTOCOLS = [
+    'ah', 'eigrp', 'esp', 'gre', 'icmp', 'icmp6', 'igmp', 'igrp', 'ip', 'ipinip', 'ipsec',
+    'nos', 'ospf', 'pcp', 'pim', 'pptp', 'snp', 'tcp', 'udp'
+]
+
+NAME_PATTERN = re.compile(r'^\S{1,64}$')
+FQDN_PATTERN = re.compile(r'^(?=.{1,253}$)[a-z0-9]([a-z0-9-]{0,61}[a-z0-9])?(\.[a-z0-9]([a-z0-9-]{0,61}[a-z0-9])?)*\.?$', re.I)
+
+
+def compile_device(job):
+    """Compiles one input file and writes the payloads to dest, runs in a
+    worker process. Returns the device, the number of objects and a list of
+    validation errors.
+    """
+    device, path, dest, digest = job
+    errors = []
+    try:
+        with open(path, 'rb') as f:
+            raw = f.read()
+        if path.endswith('.json'):
+            state = json.loads(raw.decode('utf-8'))
+        else:
+            state = yaml.load(raw, Loader=YamlLoader)
+    except Exception:
+        err = sys.exc_info()[1]
+        return device, 0, ['Unable to read %s: %s' % (path, err)]
+
+    if not isinstance(state, dict):
+        return device, 0, ['%s must contain a dict' % path]
+
+    records = []
+    for obj in state.get('network_objects') or []:
+        data = network_object_payload(obj, errors)
+        if data:
+            records.append(('objects/networkobjects', data))
+    for obj in state.get('service_objects') or []:
+        data = service_object_payload(obj, errors)
+        if data:
+            records.append(('objects/networkservices', data))
+    for policy in state.get('ikev1_policies') or []:
+        data = ikev1_policy_payload(device, policy, errors)
+        if data:
+            records.append(('vpn/ikev1policy', data))
+    for group in state.get('object_groups') or []:
+        data = object_group_payload(device, group, errors)
+        if data:
+            records.append(('objects/networkobjectgroups', data))
+
+    if errors:
+        return device, 0, errors
+
+    output = os.path.join(dest, '%s.jsonl' % device)
+    tmp_path = '%s.tmp' % output
+    with open(tmp_path, 'wb') as f:
+        for collection, data in records:
+            f.write(json.dumps({ 'collection': collection, 'object': data }, sort_keys=True).encode('utf-8'))
+            f.write(b'\n')
+    os.rename(tmp_path, output)
+
+    write_digest(dest, device, digest)
+
+    return device, len(records), []
+
+def file_digest(path):
+    sha1 = hashlib.sha1(COMPILER_VERSION.encode('utf-8'))
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+def find_inputs(module, src):
+    if os.path.isfile(src):
+        paths = [src]
+    elif os.path.isdir(src):
+        paths = [os.path.join(src, name) for name in sorted(os.listdir(src))]
+    else:
+        module.fail_json(msg='No such file or directory: %s' % src)
+
+    inputs = []
+    for path in paths:
+        device, extension = os.path.splitext(os.path.basename(path))
+        if extension in EXTENSIONS and os.path.isfile(path):
+            inputs.append((device, path))
+
+    return inputs
+
+def ikev1_policy_payload(device, policy, errors):
+    if not isinstance(policy, dict):
+        errors.append('ikev1 policies must be dicts: %s' % policy)
+        return None
+
+    try:
+        priority = int(policy.get('priority'))
+        lifetime = int(policy.get('lifetime'))
+    except (TypeError, ValueError):
+        errors.append('Priority and lifetime have to be numbers: %s' % policy)
+        return None
+
+    if not 1 <= priority <= 65535:
+        errors.append('Priority must be between 1 and 65535: %s' % policy)
+        return None
+    if not 120 <= lifetime <= 2147483647:
+        errors.append('Lifetime must be between 120 and 2147483647: %s' % policy)
+        return None
+    for option in sorted(IKEV1_CHOICES):
+        if str(policy.get(option)) not in IKEV1_CHOICES[option]:
+            errors.append('Invalid %s in ikev1 policy: %s' % (option, policy))
+            return None
+
+    return ikev1_policy_data(device, priority, policy['authentication'], policy['encryption'],
+                             policy['hash'], policy['group'], lifetime)
+
+def network_object_payload(obj, errors):
+    if not isinstance(obj, dict) or not valid_name(obj.get('name')):
+        errors.append('Network objects must be dicts with a name: %s' % obj)
+        return None
+
+    category = obj.get('category')
+    if category and category not in NETWORK_OBJECT_KIND:
+        errors.append('Invalid category in network object: %s' % obj)
+        return None
+    if category and not obj.get('value'):
+        errors.append('Missing value in network object: %s' % obj)
+        return None
+    if category:
+        try:
+            validate_value(category, obj['value'])
+        except ValueError:
+            errors.append('%s in network object %s' % (sys.exc_info()[1], obj['name']))
+            return None
+
+    return network_object_data(obj['name'], category, obj.get('value'), obj.get('description'))
+
+def object_group_payload(device, group, errors):
+    if not isinstance(group, dict) or not valid_name(group.get('name')):
+        errors.append('Object-groups must be dicts with a name: %s' % group)
+        return None
+
+    data = {}
+    data['kind'] = 'object#NetworkObjGroup'
+    data['name'] = group['name']
+    data['objectId'] = group['name']
+    data['members'] = []
+    if group.get('description'):
+        data['description'] = group['description']
+
+    for entry in group.get('entries') or []:
+        if not isinstance(entry, dict) or entry.get('category') not in GROUP_MEMBER_KIND or not entry.get('value'):
+            errors.append('Invalid entry in object-group %s: %s' % (group['name'], entry))
+            continue
+        try:
+            validate_value(entry['category'], entry['value'])
+        except ValueError:
+            errors.append('%s in object-group %s' % (sys.exc_info()[1], group['name']))
+            continue
+        data['members'].append(group_member_data(device, entry['category'], entry['value']))
+
+    return data
+
+def read_digest(dest, device):
+    try:
+        with open(os.path.join(dest, '%s.sha1' % device)) as f:
+            return f.read().strip()
+    except IOError:
+        return None
+
+def service_object_payload(obj, errors):
+    if not isinstance(obj, dict) or not valid_name(obj.get('name')):
+        errors.append('Service objects must be dicts with a name: %s' % obj)
+        return None
+
+    protocol = str(obj.get('protocol')).lower()
+    if protocol not in SERVICE_PROTOCOLS:
+        errors.append('Invalid protocol in service object, use one of %s: %s' % (', '.join(SERVICE_PROTOCOLS), obj))
+        return None
+    if obj.get('src_port'):
+        errors.append('Source ports are not supported in service objects: %s' % obj)
+        return None
+    if obj.get('dst_port') and protocol not in ['tcp', 'udp']:
+        errors.append("Can't use destination port with %s: %s" % (protocol, obj))
+        return None
+
+    try:
+        return service_object_data(obj['name'], protocol, obj.get('dst_port'), obj.get('description'))
+    except ValueError:
+        errors.append('%s in service object %s' % (sys.exc_info()[1], obj['name']))
+        return None
+
+def valid_name(name):
+    return isinstance(name, basestring) and NAME_PATTERN.match(name) is not None
+
+def validate_value(category, value):
+    """Raises ValueError if value isn't a valid name, address, subnet,
+    range or FQDN for category
+    """
+    value = str(value)
+    if category in ['object', 'object_group']:
+        if not valid_name(value):
+            raise ValueError('Invalid name %s' % value)
+    elif category.endswith('_fqdn'):
+        if not FQDN_PATTERN.match(value):
+            raise ValueError('Invalid %s: %s' % (category, value))
+    else:
+        if (':' in value) != category.startswith('ipv6'):
+            raise ValueError('Invalid %s: %s' % (category, value))
+        start, end = address_interval(category, value)
+        # The ASA rejects subnets with host bits set
+        if category.endswith('_subnet') and address_to_int(normalize_network(value).split('/')[0]) != start:
+            raise ValueError('Invalid %s, host bits are set: %s' % (category, value))
+
+def write_digest(dest, device, digest):
+    with open(os.path.join(dest, '%s.sha1' % device), 'w') as f:
+        f.write(digest)
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            src=dict(required=True),
+            dest=dict(required=True),
+            workers=dict(required=False, type='int'),
+            force=dict(required=False, choices=['no', 'yes'], default='no')),
+        supports_check_mode=False)
+
+    m_args = module.params
+
+    src = os.path.expanduser(m_args['src'])
+    dest = os.path.expanduser(m_args['dest'])
+
+    inputs = find_inputs(module, src)
+    if not has_yaml and [path for device, path in inputs if not path.endswith('.json')]:
+        module.fail_json(msg='Missing required PyYAML module for YAML input')
+
+    if not os.path.isdir(dest):
+        try:
+            os.makedirs(dest)
+        except OSError:
+            err = sys.exc_info()[1]
+            module.fail_json(msg='Unable to create %s: %s' % (dest, err))
+
+    jobs = []
+    cached = []
+    for device, path in inputs:
+        digest = file_digest(path)
+        if m_args['force'] == 'no' and digest == read_digest(dest, device) and \
+                os.path.isfile(os.path.join(dest, '%s.jsonl' % device)):
+            cached.append(device)
+        else:
+            jobs.append((device, path, dest, digest))
+
+    results = []
+    if len(jobs) == 1 or m_args['workers'] == 1:
+        results = [compile_device(job) for job in jobs]
+    elif jobs:
+        workers = min(m_args['workers'] or multiprocessing.cpu_count(), len(jobs))
+        # The module is run as a script that calls main() without a
+        # __main__ guard, so workers are forked rather than spawned, which
+        # would import the script and run main() again in every worker
+        if hasattr(multiprocessing, 'get_context'):
+            pool = multiprocessing.get_context('fork').Pool(workers)
+        else:
+            pool = multiprocessing.Pool(workers)
+        try:
+            results = list(pool.imap_unordered(compile_device, jobs))
+        finally:
+            pool.close()
+            pool.join()
+
+    compiled = {}
+    errors = {}
+    for device, count, device_errors in results:
+        if device_errors:
+            errors[device] = device_errors
+        else:
+            compiled[device] = count
+
+    return_msg = {}
+    return_msg['changed'] = len(compiled) > 0
+    return_msg['compiled'] = compiled
+    return_msg['cached'] = sorted(cached)
+
+    if errors:
+        module.fail_json(msg='Validation failed for %s device(s)' % len(errors), errors=errors, **return_msg)
+
+    module.exit_json(**return_msg)
+
+main()
@@ -0,0 +1,236 @@
+#!/usr/bin/python
+
+# Copyright 2015 Patrick Ogenstad <patrick@ogenstad.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+DOCUMENTATION = '''
+---
+
+module: cisco_asa_drift
+author: Patrick Ogenstad (@networklore)
+version: 0.x
+short_description: Detects changes made outside of Ansible.
+description:
+    - Watches the network objects and object-groups managed by Ansible for changes made by hand. The managed objects are read on every poll, as the configuration checksum isn't certain to change when the running configuration is edited without saving it. Each object is compared against a hash stored in a snapshot file and a drift event is returned for every object that was modified, created or deleted. The checksum at the last poll is returned and stored with the snapshot.
+requirements:
+    - rasa
+extends_documentation_fragment:
+    - cisco_asa
+options:
+    duration:
+        description:
+            - Seconds to keep watching the device. With 0 the device is checked once.
+        default: 0
+        required: false
+    groups:
+        description:
+            - Names of the managed network object-groups
+        required: false
+    host:
+        description:
+            - Typically set to {{ inventory_hostname }}
+        required: true
+    interval:
+        description:
+            - Seconds between two polls
+        default: 60
+        required: false
+    objects:
+        description:
+            - Names of the managed network objects
+        required: false
+    password:
+        description:
+            - Password for the device
+        required: true
+    snapshot:
+        description:
+            - File holding the checksum and the object hashes from the last check. It is created on the first run.
+        required: true
+    username:
+        description:
+            - Username for device
+        required: true
+    validate_certs:
+        description:
+            - If no, SSL certificates will not be validated. This should only be used on personally controlled sites using self-signed certificates.
+        choices: [ 'no', 'yes']
+        default: 'yes'
+        required: false
+'''
+
+EXAMPLES = '''
+
+# Check the managed objects once, i.e. from cron
+- cisco_asa_drift:
+    host: "{{ inventory_hostname }}"
+    username: api_user
+    password: APIpass123
+    snapshot: "/var/lib/asa-drift/{{ inventory_hostname }}.json"
+    validate_certs: no
+    objects:
+      - tsrv-web-1
+      - NET-SALES-4
+    groups:
+      - OG-MONITORED-SERVERS
+
+# Watch for ten minutes, polling every 30 seconds
+- cisco_asa_drift:
+    host={{ inventory_hostname }}
+    username=api_user
+    password=APIpass123
+    snapshot=/var/lib/asa-drift/{{ inventory_hostname }}.json
+    objects=tsrv-web-1,NET-SALES-4
+    duration=600
+    interval=30
+    validate_certs=no
+'''
+
+import json
+import os
+import sys
+import time
+from ansible.module_utils.basic import *
+from ansible.module_utils.cisco_asa import connect_device, connection_argument_spec, get_checksum, get_stream, response_hash
+
+try:
+    from rasa import ASA
+    has_rasa = True
+except:
+    has_rasa = False
+
+collections = {
+    'network_object': 'objects/networkobjects',
+    'object_group': 'objects/networkobjectgroups'
+}
+
+def compare_hashes(old_hashes, new_hashes, timestamp):
+    events = []
+    for key in sorted(new_hashes):
+        old = old_hashes.get(key)
+        new = new_hashes[key]
+        if old == new:
+            continue
+        if old is None:
+            change = 'created'
+        elif new is None:
+            change = 'deleted'
+        else:
+            change = 'modified'
+        object_type, name = key.split('/', 1)
+        events.append({ 'type': object_type, 'name': name, 'change': change, 'time': timestamp })
+
+    return events
+
+def hash_managed(dev, module, managed):
+    """Reads the managed objects and returns a dict with the hash of each
+    object, or None for objects that don't exist
+    """
+    hashes = {}
+    for object_type, name in managed:
+        request = '%s/%s' % (collections[object_type], name)
+        try:
+            response = get_stream(dev, request)
+        except:
+            err = sys.exc_info()[1]
+            module.fail_json(msg='Unable to connect to device: %s' % err)
+
+        hashes['%s/%s' % (object_type, name)] = response_hash(module, request, response)
+
+    return hashes
+
+def read_snapshot(module, path):
+    if not os.path.isfile(path):
+        return None
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        err = sys.exc_info()[1]
+        module.fail_json(msg='Unable to read snapshot %s: %s' % (path, err))
+
+def write_snapshot(path, snapshot):
+    tmp_path = '%s.tmp' % path
+    with open(tmp_path, 'w') as f:
+        json.dump(snapshot, f)
+    os.rename(tmp_path, path)
+
+def main():
+    module = AnsibleModule(
+        argument_spec=connection_argument_spec(dict(
+            host=dict(required=True),
+            username=dict(required=True),
+            password=dict(required=True),
+            objects=dict(required=False, type='list', default=[]),
+            groups=dict(required=False, type='list', default=[]),
+            snapshot=dict(required=True),
+            interval=dict(required=False, type='int', default=60),
+            duration=dict(required=False, type='int', default=0),
+            validate_certs=dict(required=False, choices=['no', 'yes'], default='yes'))),
+        required_one_of=(['objects', 'groups'],),
+        supports_check_mode=False)
+
+    m_args = module.params
+
+    if not has_rasa:
+        module.fail_json(msg='Missing required rasa module (check docs)')
+
+    dev = connect_device(module)
+
+    managed = [('network_object', name) for name in m_args['objects']]
+    managed += [('object_group', name) for name in m_args['groups']]
+    managed_keys = set('%s/%s' % key for key in managed)
+
+    snapshot = read_snapshot(module, m_args['snapshot'])
+    if snapshot is None:
+        snapshot = {}
+        snapshot['checksum'] = get_checksum(dev, module)
+        snapshot['objects'] = hash_managed(dev, module, managed)
+        write_snapshot(m_args['snapshot'], snapshot)
+        module.exit_json(changed=False, drift=False, events=[], baseline=True, checksum=snapshot['checksum'])
+
+    # Objects added to the managed list since the snapshot was taken
+    new_managed = [key for key in managed if '%s/%s' % key not in snapshot['objects']]
+    if new_managed:
+        snapshot['objects'].update(hash_managed(dev, module, new_managed))
+    for key in list(snapshot['objects']):
+        if key not in managed_keys:
+            del snapshot['objects'][key]
+
+    events = []
+    polls = 0
+    deadline = time.time() + m_args['duration']
+    while True:
+        polls += 1
+        hashes = hash_managed(dev, module, managed)
+        events.extend(compare_hashes(snapshot['objects'], hashes, time.time()))
+        snapshot['objects'] = hashes
+
+        if time.time() + m_args['interval'] > deadline:
+            break
+        time.sleep(m_args['interval'])
+
+    snapshot['checksum'] = get_checksum(dev, module)
+    write_snapshot(m_args['snapshot'], snapshot)
+
+    return_msg = {}
+    return_msg['changed'] = False
+    return_msg['drift'] = len(events) > 0
+    return_msg['events'] = events
+    return_msg['checksum'] = snapshot['checksum']
+    return_msg['polls'] = polls
+
+    module.exit_json(**return_msg)
+
+main()
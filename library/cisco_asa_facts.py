@@ -0,0 +1,242 @@
+#!/usr/bin/python
+
+# Copyright 2015 Patrick Ogenstad <patrick@ogenstad.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+DOCUMENTATION = '''
+---
+
+module: cisco_asa_facts
+author: Patrick Ogenstad (@networklore)
+version: 0.x
+short_description: Gathers facts about the device.
+description:
+    - Collects the objects, policies, version and API capabilities of a device as facts. The collections of the selected subsets are read in parallel. The facts are cached per device, a subset gathered less than cache_ttl seconds ago is returned from the cache without contacting the device. Cached facts are read again when one of the cisco_asa modules has changed the configuration of the device since.
+requirements:
+    - rasa
+extends_documentation_fragment:
+    - cisco_asa
+options:
+    cache_ttl:
+        description:
+            - Seconds the gathered facts are reused. Set to 0 to always read from the device. Changes made by the cisco_asa modules expire the cached facts at once, changes made in any other way are only seen once the facts have expired.
+        default: 300
+        required: false
+    gather_subset:
+        description:
+            - The facts to gather, any of network_objects, object_groups, service_objects, ikev1_policies, version, capabilities or all. A subset starting with ! is excluded.
+        default: all
+        required: false
+    host:
+        description:
+            - Typically set to {{ inventory_hostname }}
+        required: true
+    password:
+        description:
+            - Password for the device
+        required: true
+    username:
+        description:
+            - Username for device
+        required: true
+    validate_certs:
+        description:
+            - If no, SSL certificates will not be validated. This should only be used on personally controlled sites using self-signed certificates.
+        choices: [ 'no', 'yes']
+        default: 'yes'
+        required: false
+'''
+
+EXAMPLES = '''
+
+# Gather everything
+- cisco_asa_facts:
+    host={{ inventory_hostname }}
+    username=api_user
+    password=APIpass123
+    validate_certs=no
+
+# Only the network objects and object-groups, reused for ten minutes
+- cisco_asa_facts:
+    host: "{{ inventory_hostname }}"
+    username: api_user
+    password: APIpass123
+    gather_subset:
+      - network_objects
+      - object_groups
+    cache_ttl: 600
+    validate_certs: no
+
+- debug: msg="The web server object is missing"
+  when: "'tsrv-web-1' not in asa_network_objects"
+'''
+
+import json
+import os
+import sys
+import time
+from ansible.module_utils.basic import *
+from ansible.module_utils.cisco_asa import connect_device, connection_argument_spec, device_capabilities, facts_changed, facts_path, FACTS_DIR, iter_collection
+from multiprocessing.pool import ThreadPool
+
+try:
+    from rasa import ASA
+    has_rasa = True
+except:
+    has_rasa = False
+
+# Subsets read from a collection, keyed on the field naming each item
+COLLECTION_SUBSETS = {
+    'network_objects': ('objects/networkobjects', 'name'),
+    'object_groups': ('objects/networkobjectgroups', 'name'),
+    'service_objects': ('objects/networkservices', 'name'),
+    'ikev1_policies': ('vpn/ikev1policy', 'objectId')
+}
+
+SUBSETS = sorted(list(COLLECTION_SUBSETS.keys()) + ['version', 'capabilities'])
+
+
+class GatherError(Exception):
+    pass
+
+
+class ThreadModule(object):
+    """Passed to the shared helpers in the worker threads, failures are
+    raised and reported by the main thread
+    """
+
+    def fail_json(self, **kwargs):
+        raise GatherError(kwargs)
+
+
+def gather(job):
+    dev, subset = job
+    module = ThreadModule()
+    try:
+        if subset == 'capabilities':
+            return subset, device_capabilities(dev, module, refresh=True), None
+        if subset == 'version':
+            result = dev._get('monitoring/device/components/version')
+            if result.status_code == 401:
+                module.fail_json(msg='Authentication error')
+            elif result.status_code != 200:
+                module.fail_json(msg='Unable to read the version - %s' % result.status_code)
+            data = result.json()
+            data.pop('selfLink', None)
+            return subset, data, None
+
+        request, key = COLLECTION_SUBSETS[subset]
+        items = {}
+        for item in iter_collection(dev, module, request, optional=True):
+            item.pop('selfLink', None)
+            items[str(item[key])] = item
+        return subset, items, None
+    except GatherError:
+        return subset, None, sys.exc_info()[1].args[0]
+    except Exception:
+        err = sys.exc_info()[1]
+        return subset, None, { 'msg': 'Unable to connect to device: %s' % err }
+
+def read_cache(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return {}
+
+def select_subsets(module, gather_subset):
+    selected = set()
+    excluded = set()
+    for subset in gather_subset:
+        subset = subset.strip()
+        exclude = subset.startswith('!')
+        subset = subset.lstrip('!')
+        if subset == 'all':
+            names = SUBSETS
+        elif subset in SUBSETS:
+            names = [subset]
+        else:
+            module.fail_json(msg='Unknown subset %s, expected one of %s or all' % (subset, ', '.join(SUBSETS)))
+        if exclude:
+            excluded.update(names)
+        else:
+            selected.update(names)
+
+    if not selected:
+        selected = set(SUBSETS)
+
+    return sorted(selected - excluded)
+
+def write_cache(path, cache):
+    if not os.path.isdir(FACTS_DIR):
+        os.makedirs(FACTS_DIR)
+    tmp_path = '%s.%s.tmp' % (path, os.getpid())
+    with open(tmp_path, 'w') as f:
+        json.dump(cache, f)
+    os.rename(tmp_path, path)
+
+def main():
+    module = AnsibleModule(
+        argument_spec=connection_argument_spec(dict(
+            host=dict(required=True),
+            username=dict(required=True),
+            password=dict(required=True),
+            gather_subset=dict(required=False, type='list', default=['all']),
+            cache_ttl=dict(required=False, type='int', default=300),
+            validate_certs=dict(required=False, choices=['no', 'yes'], default='yes'))),
+        supports_check_mode=True)
+
+    m_args = module.params
+
+    if not has_rasa:
+        module.fail_json(msg='Missing required rasa module (check docs)')
+
+    subsets = select_subsets(module, m_args['gather_subset'])
+
+    cache_path = facts_path(m_args['host'])
+    cache = {}
+    if m_args['cache_ttl'] > 0:
+        cache = read_cache(cache_path)
+
+    now = time.time()
+    changed = facts_changed(m_args['host'])
+    cached = [subset for subset in subsets
+              if subset in cache and now - cache[subset]['time'] < m_args['cache_ttl'] and cache[subset]['time'] > changed]
+    missing = [subset for subset in subsets if subset not in cached]
+
+    if missing:
+        dev = connect_device(module)
+
+        pool = ThreadPool(len(missing))
+        try:
+            results = pool.map(gather, [(dev, subset) for subset in missing])
+        finally:
+            pool.close()
+            pool.join()
+
+        for subset, data, error in results:
+            if error:
+                module.fail_json(**error)
+            cache[subset] = { 'time': now, 'data': data }
+
+        if m_args['cache_ttl'] > 0:
+            write_cache(cache_path, cache)
+
+    facts = {}
+    for subset in subsets:
+        facts['asa_%s' % subset] = cache[subset]['data']
+
+    module.exit_json(changed=False, ansible_facts=facts, cached=cached)
+
+main()
@@ -25,6 +25,9 @@ description:
     - Creates deletes or edits ikev1 policies.
 requirements:
     - rasa
+extends_documentation_fragment:
+    - cisco_asa
+    - cisco_asa.failover
 options:
     authentication:
         description:
@@ -36,6 +39,11 @@ options:
             - Encryption Algorithm
         choices: [ 'des', '3des', 'aes-128', 'aes-192', 'aes-256' ]
         required: false
+    group:
+        description:
+            - Diffie-Hellman group
+        choices: [ '1', '2', '5' ]
+        required: false
     hash:
         description:
             - Hash Algorithm
@@ -45,11 +53,6 @@ options:
         description:
             - Typically set to {{ inventory_hostname }}
         required: true
-    group:
-        description:
-            - Diffie-Hellman group
-        choices: [ '1', '2', '5' ]
-        required: false
     lifetime:
         description:
             - SA Lifetime (seconds)
@@ -59,11 +62,19 @@ options:
         description:
             - Password for the device
         required: true
+    plan_file:
+        description:
+            - Path to a plan file. The current configuration is read from the device, including the changes earlier tasks added to the plan, but the changes are added to the plan instead of being sent. They replace the ones this task added before. Use cisco_asa_apply_plan to execute the plan later.
+        required: false
     priority:
         description:
             - The priority number of the ikev1 policy. 
         choices: [ '1-65535' ]
         required: true
+    running_config:
+        description:
+            - Path to a saved 'show running-config'. The device isn't contacted, the current configuration is read from the file and the changes the module would make are returned as plan.
+        required: false
     state:
         description:
             - State of the object
@@ -110,6 +121,7 @@ EXAMPLES = '''
 
 import sys
 from ansible.module_utils.basic import *
+from ansible.module_utils.cisco_asa import connect_device, connection_argument_spec, ikev1_policy_data, load_plan, match_objects, OfflineASA, plan_task, PlanningDevice, save_plan
 from collections import defaultdict
 
 try:
@@ -122,7 +134,7 @@ def create_object(dev, module, desired_data):
     try:
         result = dev.create_ikev1_policy(desired_data)
     except:
-        err = sys.exc_info()[0]
+        err = sys.exc_info()[1]
         module.fail_json(msg='Unable to connect to device: %s' % err)
 
     if result.status_code == 201:
@@ -136,7 +148,7 @@ def delete_object(dev, module, name):
     try:
         result = dev.delete_ikev1_policy(name)
     except:
-        err = sys.exc_info()[0]
+        err = sys.exc_info()[1]
         module.fail_json(msg='Unable to connect to device: %s' % err)
 
     if result.status_code == 204:
@@ -148,7 +160,7 @@ def delete_object(dev, module, name):
 
 def main():
     module = AnsibleModule(
-        argument_spec=dict(
+        argument_spec=connection_argument_spec(dict(
             host=dict(required=True),
             username=dict(required=True),
             password=dict(required=True),
@@ -158,31 +170,32 @@ def main():
             encryption=dict(required=False, choices=['des', '3des', 'aes-128', 'aes-192', 'aes-256']),
             hash=dict(required=False, choices=['md5', 'sha']),
             group=dict(required=False, choices=['1', '2', '5']),
+            running_config=dict(required=False),
+            plan_file=dict(required=False),
             validate_certs=dict(required=False, choices=['no', 'yes'], default='yes'),
             lifetime=dict(required=False),
-            ),
+            ), failover=True),
             required_together = ( ['authentication', 'encryption', 'hash', 'group', 'lifetime'],),
+        mutually_exclusive=(['plan_file', 'running_config'],),
         supports_check_mode=False)
 
     m_args = module.params
 
-    if not has_rasa:
+    if not has_rasa and not m_args['running_config']:
         module.fail_json(msg='Missing required rasa module (check docs)')
 
     if m_args['state'] == "present" and m_args['authentication'] == False:
         module.fail_json(msg='Authentication mode not defined')
 
-    if m_args['validate_certs'] == 'yes':
-        validate_certs = True
+    if m_args['running_config']:
+        dev = OfflineASA(m_args['host'], m_args['running_config'])
+    elif m_args['plan_file']:
+        dev = connect_device(module, PlanningDevice)
     else:
-        validate_certs = False
+        dev = connect_device(module)
 
-    dev = ASA(
-        device=m_args['host'],
-        username=m_args['username'],
-        password=m_args['password'],
-        verify_cert=validate_certs
-    )
+    if m_args['plan_file']:
+        load_plan(dev, module, m_args['plan_file'], plan_task('ikev1_policy', m_args, ['priority']))
 
     desired_data = {}
 
@@ -205,23 +218,16 @@ def main():
         except:
             module.fail_json(msg='Lifetime has to be a number')
 
-        if 120 <= lifetime <= 2147483647:
-            desired_data['lifetimeInSecs'] = lifetime
-        else:
+        if not 120 <= lifetime <= 2147483647:
             module.fail_json(msg='Lifetime must be between 120 and 2147483647')
 
-        desired_data['authentication'] = m_args['authentication']
-        desired_data['encryption'] = m_args['encryption']
-        desired_data['hash'] = m_args['hash']
-        desired_data['dhgroup'] = int(m_args['group'])
-        desired_data['kind'] = 'object#ikev1policy'
-        desired_data['objectId'] = m_args['priority']
-        desired_data['selfLink'] = 'https://%s/api/vpn/ikev1policy/%s' % (m_args['host'], m_args['priority'])
+        desired_data = ikev1_policy_data(m_args['host'], m_args['priority'], m_args['authentication'],
+            m_args['encryption'], m_args['hash'], m_args['group'], lifetime)
 
     try:
         data = dev.get_ikev1_policy(m_args['priority'])
     except:
-        err = sys.exc_info()[0]
+        err = sys.exc_info()[1]
         module.fail_json(msg='Unable to connect to device: %s' % err)
 
     if data.status_code == 200:
@@ -232,7 +238,7 @@ def main():
 
         elif m_args['state'] == 'present':
          
-            matched = match_objects(data.json(), desired_data, module)
+            matched = match_objects(data.json(), desired_data)
             if matched:
                 changed_status = False
             else:
@@ -252,24 +258,21 @@ def main():
     return_msg = {}
     return_msg['changed'] = changed_status
 
+    if m_args['plan_file']:
+        save_plan(dev, module, m_args['plan_file'])
+    if m_args['running_config'] or m_args['plan_file']:
+        return_msg['plan'] = dev.plan
     module.exit_json(**return_msg)
     
-def match_objects(current_data, desired_data, module):
-    for key in current_data:
-        if current_data[key] != desired_data[key]:
-            return False
-    return True
-
-
 def update_object(dev, module, desired_data):
     try:
         result = dev.update_ikev1_policy(desired_data['objectId'], desired_data)
     except:
-        err = sys.exc_info()[0]
+        err = sys.exc_info()[1]
         module.fail_json(msg='Unable to connect to device: %s' % err)
 
     if result.status_code == 204:
-        return_status = { 'changed': True }
+        return_status = True
     else:
         module.fail_json(msg='Unable to update object code: - %s' % result.status_code)
 
@@ -25,12 +25,21 @@ description:
     - Configures network objects
 requirements:
     - rasa
+extends_documentation_fragment:
+    - cisco_asa
+    - cisco_asa.failover
 options:
     category:
         description:
             - The type of object you are creating. Use slash notation for subnets, i.e. 192.168.0.0/24. Use - for ranges, i.e. 192.168.0.1-192.168.0.10. 
         choices: [ 'ipv4_address', 'ipv6_address', 'ipv4_subnet', 'ipv6_subnet', 'ipv4_range', 'ipv6_range', 'ipv4_fqdn', 'ipv6_fqdn' ]
         required: false
+    check_references:
+        description:
+            - Before deleting, look for object-groups and access-lists referencing the object and report them instead of sending the delete. Purges always check.
+        choices: [ 'no', 'yes']
+        default: 'no'
+        required: false
     description:
         description:
             - Description of the object
@@ -42,11 +51,23 @@ options:
     name:
         description:
             - Name of the network object
-        required: true
+        required: false
     password:
         description:
             - Password for the device
         required: true
+    plan_file:
+        description:
+            - Path to a plan file. The current configuration is read from the device, including the changes earlier tasks added to the plan, but the changes are added to the plan instead of being sent. They replace the ones this task added before. Use cisco_asa_apply_plan to execute the plan later.
+        required: false
+    purge:
+        description:
+            - List of network objects to delete in one run. References are checked once for the whole list, objects that are still referenced are reported as blocked instead of deleted.
+        required: false
+    running_config:
+        description:
+            - Path to a saved 'show running-config'. The device isn't contacted, the current configuration is read from the file and the changes the module would make are returned as plan.
+        required: false
     state:
         description:
             - State of the object
@@ -91,10 +112,22 @@ EXAMPLES = '''
     name=tsrv-web-2
     state=absent
     validate_certs=no
+
+# Remove old test servers that are no longer referenced
+- cisco_asa_network_object:
+    host: "{{ inventory_hostname }}"
+    username: api_user
+    password: APIpass123
+    state: absent
+    validate_certs: no
+    purge:
+      - tsrv-web-3
+      - tsrv-web-4
 '''
 
 import sys
 from ansible.module_utils.basic import *
+from ansible.module_utils.cisco_asa import build_reference_index, connect_device, connection_argument_spec, format_reference, load_plan, match_objects, network_object_data, OfflineASA, plan_task, PlanningDevice, safe_delete_order, save_plan
 from collections import defaultdict
 
 try:
@@ -103,22 +136,11 @@ try:
 except:
     has_rasa = False
 
-object_kind = {
-    'ipv4_address': 'IPv4Address',
-    'ipv6_address': 'IPv6Address',
-    'ipv4_subnet': 'IPv4Network',
-    'ipv6_subnet': 'IPv6Network',
-    'ipv4_range': 'IPv4Range',
-    'ipv6_range': 'IPv6Range',
-    'ipv4_fqdn': 'IPv4FQDN',
-    'ipv6_fqdn': 'IPv6FQDN'
-}
-
 def create_object(dev, module, desired_data):
     try:
         result = dev.create_networkobject(desired_data)
     except:
-        err = sys.exc_info()[0]
+        err = sys.exc_info()[1]
         module.fail_json(msg='Unable to connect to device: %s' % err)
 
     if result.status_code == 201:
@@ -132,7 +154,7 @@ def delete_object(dev, module, name):
     try:
         result = dev.delete_networkobject(name)
     except:
-        err = sys.exc_info()[0]
+        err = sys.exc_info()[1]
         module.fail_json(msg='Unable to connect to device: %s' % err)
 
     if result.status_code == 204:
@@ -142,67 +164,79 @@ def delete_object(dev, module, name):
 
     return return_status
 
+def check_references(dev, module, name):
+    index = build_reference_index(dev, module)
+    if index.get(name):
+        references = [format_reference(reference) for reference in index[name]]
+        module.fail_json(msg='Object is still referenced', references=references)
+
 def main():
     module = AnsibleModule(
-        argument_spec=dict(
+        argument_spec=connection_argument_spec(dict(
             host=dict(required=True),
             username=dict(required=True),
             password=dict(required=True),
-            name=dict(required=True),
+            name=dict(required=False),
+            purge=dict(required=False, type='list'),
+            check_references=dict(required=False, choices=['no', 'yes'], default='no'),
             description=dict(required=False),
             state=dict(required=True, choices=['absent', 'present']),
             category=dict(required=False, choices=[ 'ipv4_address', 'ipv6_address', 'ipv4_subnet', 'ipv6_subnet', 'ipv4_range', 'ipv6_range', 'ipv4_fqdn', 'ipv6_fqdn' ]),
+            running_config=dict(required=False),
+            plan_file=dict(required=False),
             validate_certs=dict(required=False, choices=['no', 'yes'], default='yes'),
-            value=dict(required=False)),
+            value=dict(required=False)), failover=True),
             required_together = ( ['category','value'],),
+        required_one_of=(['name', 'purge'],),
+        mutually_exclusive=(['name', 'purge'], ['plan_file', 'running_config']),
         supports_check_mode=False)
 
     m_args = module.params
 
-    if not has_rasa:
+    if not has_rasa and not m_args['running_config']:
         module.fail_json(msg='Missing required rasa module (check docs)')
 
     if m_args['state'] == "present":
         if m_args['category'] == False:
             module.fail_json(msg='Category not defined')
-    if m_args['validate_certs'] == 'yes':
-        validate_certs = True
+
+    if m_args['running_config']:
+        dev = OfflineASA(m_args['host'], m_args['running_config'])
+    elif m_args['plan_file']:
+        dev = connect_device(module, PlanningDevice)
     else:
-        validate_certs = False
-
-    dev = ASA(
-        device=m_args['host'],
-        username=m_args['username'],
-        password=m_args['password'],
-        verify_cert=validate_certs
-    )
-
-    desired_data = {}
-    desired_data['name'] = m_args['name']
-    desired_data['objectId'] = m_args['name']
-    desired_data['kind'] = 'object#NetworkObj'
-    if m_args['category']:
-        kind = object_kind[m_args['category']]
-        desired_data['host'] = {
-            'kind': kind,
-            'value': m_args['value']
-        }
-
-    if m_args['description']:
-        desired_data['description'] = m_args['description']
+        dev = connect_device(module)
+
+    if m_args['plan_file']:
+        load_plan(dev, module, m_args['plan_file'], plan_task('network_object', m_args, ['name', 'purge']))
+
+    if m_args['purge']:
+        if m_args['state'] != 'absent':
+            module.fail_json(msg='Purge requires state=absent')
+        deleted, blocked = purge_objects(dev, module, m_args['purge'])
+        return_msg = { 'changed': len(deleted) > 0, 'deleted': deleted, 'blocked': blocked }
+        if m_args['plan_file']:
+            save_plan(dev, module, m_args['plan_file'])
+        if m_args['running_config'] or m_args['plan_file']:
+            return_msg['plan'] = dev.plan
+        module.exit_json(**return_msg)
+
+    desired_data = network_object_data(m_args['name'], m_args['category'], m_args['value'], m_args['description'])
 
     try:
         data = dev.get_networkobject(m_args['name'])
     except:
-        err = sys.exc_info()[0]
+        err = sys.exc_info()[1]
         module.fail_json(msg='Unable to connect to device: %s' % err)
 
     if data.status_code == 200:
         if m_args['state'] == 'absent':
+            if m_args['check_references'] == 'yes':
+                check_references(dev, module, m_args['name'])
             changed_status = delete_object(dev, module, m_args['name'])
         elif m_args['state'] == 'present':
 
-            matched = match_objects(data.json(), desired_data, module)
+            matched = match_objects(data.json(), desired_data, ['host', 'description'])
             if matched:
                 changed_status = False
             else:
@@ -222,39 +256,40 @@ def main():
     return_msg = {}
     return_msg['changed'] = changed_status
 
+    if m_args['plan_file']:
+        save_plan(dev, module, m_args['plan_file'])
+    if m_args['running_config'] or m_args['plan_file']:
+        return_msg['plan'] = dev.plan
     module.exit_json(**return_msg)
     
-def match_objects(current_data, desired_data, module):
-    has_current_desc = False
-    has_desired_desc = False
-
-    if 'description' in current_data.keys():
-        has_current_desc = True
-        
-    if 'description' in desired_data.keys():
-        has_desired_desc = True
-
-    if has_current_desc == has_desired_desc:
-        if has_desired_desc == True:
-            if current_data['description'] != desired_data['description']:
-                return False
-    else:
-        return False
+def purge_objects(dev, module, names):
+    index = build_reference_index(dev, module)
+    order, blocked = safe_delete_order(names, index)
 
-    if current_data['host'] != desired_data['host']:
-        return False
-    return True
+    deleted = []
+    for name in order:
+        try:
+            result = dev.delete_networkobject(name)
+        except:
+            err = sys.exc_info()[1]
+            module.fail_json(msg='Unable to connect to device: %s' % err, deleted=deleted)
 
+        if result.status_code == 204:
+            deleted.append(name)
+        elif result.status_code != 404:
+            module.fail_json(msg='Unable to delete object %s - %s' % (name, result.status_code), deleted=deleted)
+
+    return deleted, blocked
 
 def update_object(dev, module, desired_data):
     try:
         result = dev.update_networkobject(desired_data['name'], desired_data)
     except:
-        err = sys.exc_info()[0]
+        err = sys.exc_info()[1]
         module.fail_json(msg='Unable to connect to device: %s' % err)
 
     if result.status_code == 204:
-        return_status = { 'changed': True }
+        return_status = True
     else:
         module.fail_json(msg='Unable to update object code: - %s' % result.status_code)
 
@@ -25,16 +25,35 @@ description:
     - Configures network object-groups
 requirements:
     - rasa
+extends_documentation_fragment:
+    - cisco_asa
+    - cisco_asa.failover
 options:
+    aggregate:
+        description:
+            - If yes, the present ipv4_ and ipv6_ address, subnet and range entries are merged into the smallest set of addresses and subnets covering the same addresses before the group is reconciled, as object-groups can't hold ranges. Members already in the group that are covered by the merged entries are removed. Only used with entries.
+        choices: [ 'no', 'yes']
+        default: 'no'
+        required: false
     category:
         description:
             - The type of object you are creating. Use slash notation for networks, i.e. 192.168.0.0/24. Use - for ranges, i.e. 192.168.0.1-192.168.0.10. 
         choices: [ 'ipv4_address', 'ipv6_address', 'ipv4_subnet', 'ipv6_subnet', 'ipv4_range', 'ipv6_range', 'ipv4_fqdn', 'ipv6_fqdn', 'object', 'object_group' ]
         required: false
+    check_references:
+        description:
+            - Before deleting, look for object-groups and access-lists referencing the object-group and report them instead of sending the delete. Purges always check.
+        choices: [ 'no', 'yes']
+        default: 'no'
+        required: false
     description:
         description:
             - Description of the object
         required: false
+    entries:
+        description:
+            - List of entries to reconcile in a single run, each a dict with category, value and optionally entry_state (defaults to present). The group is read once and all changes are sent in one update.
+        required: false
     entry_state:
         description:
             - State of the entire object-group
@@ -44,6 +63,19 @@ options:
         description:
             - Typically set to {{ inventory_hostname }}
         required: true
+    max_expansion:
+        description:
+            - Before members are added, estimate how many expanded ACEs the change adds to the access-lists using the group, directly or through parent groups, and fail instead of changing the group if it's more than max_expansion. ACEs are counted for every combination of the flattened source and destination members and service object-groups. The network and service object-groups and the access-lists are read once for the estimate.
+        required: false
+    members_file:
+        description:
+            - A CSV or JSON-lines file on the managed host with the entries to reconcile, used like entries for groups too large to pass as an argument. CSV lines are category,value and optionally entry_state, with an optional header line. JSON-lines files have one entry dict per line. The file is read one line at a time.
+        required: false
+    members_format:
+        description:
+            - Format of members_file, by default csv for files ending in .csv and jsonl otherwise
+        choices: [ 'csv', 'jsonl' ]
+        required: false
     members:
         description:
             - NOT YET IMPLEMENTED Variable containing all the objects within the network object-group
@@ -51,11 +83,23 @@ options:
     name:
         description:
             - Name of the network object
-        required: true
+        required: false
     password:
         description:
             - Password for the device
         required: true
+    plan_file:
+        description:
+            - Path to a plan file. The current configuration is read from the device, including the changes earlier tasks added to the plan, but the changes are added to the plan instead of being sent. They replace the ones this task added before. Use cisco_asa_apply_plan to execute the plan later.
+        required: false
+    purge:
+        description:
+            - List of network object-groups to delete in one run. References are checked once for the whole list and the deletes are ordered so that groups are removed before the objects they reference. Names that are still referenced are reported as blocked.
+        required: false
+    running_config:
+        description:
+            - Path to a saved 'show running-config'. The device isn't contacted, the current configuration is read from the file and the changes the module would make are returned as plan.
+        required: false
     state:
         description:
             - State of the entire object-group
@@ -100,10 +144,76 @@ EXAMPLES = '''
     name=tsrv-web-2
     state=absent
     validate_certs=no
+
+# Add several entries to a group with one read and one update
+- cisco_asa_network_objectgroup:
+    host: "{{ inventory_hostname }}"
+    username: api_user
+    password: APIpass123
+    name: OG-MONITORED-SERVERS
+    state: present
+    validate_certs: no
+    entries:
+      - { category: ipv4_address, value: 10.80.30.18 }
+      - { category: ipv4_address, value: 10.80.30.19 }
+      - { category: ipv4_address, value: 10.80.30.20, entry_state: absent }
+
+# Merge a long list of hosts into as few subnets and ranges as possible
+- cisco_asa_network_objectgroup:
+    host: "{{ inventory_hostname }}"
+    username: api_user
+    password: APIpass123
+    name: OG-SCANNERS
+    state: present
+    aggregate: yes
+    validate_certs: no
+    entries:
+      - { category: ipv4_address, value: 10.80.40.16 }
+      - { category: ipv4_address, value: 10.80.40.17 }
+      - { category: ipv4_address, value: 10.80.40.18 }
+      - { category: ipv4_address, value: 10.80.40.19 }
+      - { category: ipv4_subnet, value: 10.80.40.20/30 }
+
+# Reconcile a large group from a CSV file copied to the managed host
+- cisco_asa_network_objectgroup:
+    host={{ inventory_hostname }}
+    username=api_user
+    password=APIpass123
+    name=OG-BLOCKLIST
+    state=present
+    members_file=/var/lib/asa/og-blocklist.csv
+    validate_certs=no
+
+# Refuse the change if it grows the expanded access-lists by more than 5000 rules
+- cisco_asa_network_objectgroup:
+    host={{ inventory_hostname }}
+    username=api_user
+    password=APIpass123
+    name=OG-MONITORED-SERVERS
+    state=present
+    entry_state=present
+    category=object_group
+    value=OG-BRANCH-SERVERS
+    max_expansion=5000
+    validate_certs=no
+
+# Remove a group and the group it contains, the outer group is deleted first
+- cisco_asa_network_objectgroup:
+    host: "{{ inventory_hostname }}"
+    username: api_user
+    password: APIpass123
+    state: absent
+    validate_certs: no
+    purge:
+      - OG-OLD-SERVERS
+      - OG-OLD-SERVERS-DMZ
 '''
 
+import csv
+import json
 import sys
 from ansible.module_utils.basic import *
+from ansible.module_utils.cisco_asa import address_interval, aggregate_entries, build_reference_index, connect_device, connection_argument_spec, ExpansionEstimator, format_reference, get_stream, group_member_data, GROUP_MEMBER_KIND, interval_covers, iter_content, iter_object, load_plan, member_key, OfflineASA, plan_task, PlanningDevice, safe_delete_order, save_plan
 from collections import defaultdict
 
 try:
@@ -112,35 +222,11 @@ try:
 except:
     has_rasa = False
 
-object_kind = {
-    'ipv4_address': 'IPv4Address',
-    'ipv6_address': 'IPv6Address',
-    'ipv4_subnet': 'IPv4Network',
-    'ipv6_subnet': 'IPv6Network',
-    'ipv4_range': 'IPv4Range',
-    'ipv6_range': 'IPv6Range',
-    'ipv4_fqdn': 'IPv4FQDN',
-    'ipv6_fqdn': 'IPv6FQDN',
-    'object': 'objectRef#NetworkObj',
-    'object_group': 'objectRef#NetworkObjGroup'
-}
-
-object_kind_type = {
-    'ipv4_address': 'value',
-    'ipv6_address': 'value',
-    'ipv4_subnet': 'value',
-    'ipv6_subnet': 'value',
-    'ipv4_range': 'value',
-    'ipv6_range': 'value',
-    'object': 'objectId',
-    'object_group': 'objectId',
-}
-
 def add_object(dev, module, net_object, member_data):
     try:
         result = dev.add_member_networkobjectgroup(net_object,[member_data])
     except:
-        err = sys.exc_info()[0]
+        err = sys.exc_info()[1]
         module.fail_json(msg='Unable to connect to device: %s' % err)
 
     if result.status_code != 204:
@@ -149,11 +235,33 @@ def add_object(dev, module, net_object, member_data):
     return True
 
 
+def check_expansion(dev, module, name, members_add, members_remove, max_expansion):
+    """Estimates the expanded ACEs the member changes add to the access-lists
+    using the group and its parents and fails if it exceeds max_expansion
+    """
+    estimator = ExpansionEstimator.from_device(dev, module)
+    added, access_lists = estimator.estimate(name, members_add, members_remove)
+
+    expansion = {}
+    expansion['added'] = added
+    expansion['access_lists'] = access_lists
+    if added > max_expansion:
+        module.fail_json(msg='The change adds %s expanded ACEs, more than max_expansion (%s)' % (added, max_expansion),
+                         expansion=expansion)
+
+    return expansion
+
+def check_references(dev, module, name):
+    index = build_reference_index(dev, module)
+    if index.get(name):
+        references = [format_reference(reference) for reference in index[name]]
+        module.fail_json(msg='Object-group is still referenced', references=references)
+
 def create_object(dev, module, desired_data):
     try:
         result = dev.create_networkobjectgroup(desired_data)
     except:
-        err = sys.exc_info()[0]
+        err = sys.exc_info()[1]
         module.fail_json(msg='Unable to connect to device: %s' % err)
 
     if result.status_code == 201:
@@ -167,7 +275,7 @@ def delete_object(dev, module, name):
     try:
         result = dev.delete_networkobjectgroup(name)
     except:
-        err = sys.exc_info()[0]
+        err = sys.exc_info()[1]
         module.fail_json(msg='Unable to connect to device: %s' % err)
 
     if result.status_code == 204:
@@ -177,52 +285,96 @@ def delete_object(dev, module, name):
 
     return return_status
 
+def parse_entries(module, host, entries):
+    """Validates entries, a list or a generator of entry dicts, one at a time"""
+    parsed = []
+    for entry in entries:
+        if not isinstance(entry, dict):
+            module.fail_json(msg='Entries must be dicts with category and value: %s' % entry)
+        category = entry.get('category')
+        if category not in GROUP_MEMBER_KIND:
+            module.fail_json(msg='Invalid category in entry: %s' % entry)
+        if not entry.get('value'):
+            module.fail_json(msg='Missing value in entry: %s' % entry)
+        entry_state = entry.get('entry_state', 'present')
+        if entry_state not in ['absent', 'present']:
+            module.fail_json(msg='Invalid entry_state in entry: %s' % entry)
+
+        parsed.append({
+            'category': category,
+            'value': entry['value'],
+            'entry_state': entry_state,
+            'member': group_member_data(host, category, entry['value'])
+        })
+
+    return parsed
+
 def find_member(current_data, desired_data, module):
 
     member_exists = False
     for member in current_data['members']:
-        if member == desired_data:
+        if member_key(member) == member_key(desired_data):
             member_exists = True
 
     return member_exists
 
 def main():
     module = AnsibleModule(
-        argument_spec=dict(
+        argument_spec=connection_argument_spec(dict(
             host=dict(required=True),
             username=dict(required=True),
             password=dict(required=True),
             members=dict(required=False),
-            name=dict(required=True),
+            name=dict(required=False),
+            purge=dict(required=False, type='list'),
+            check_references=dict(required=False, choices=['no', 'yes'], default='no'),
+            entries=dict(required=False, type='list'),
+            members_file=dict(required=False),
+            members_format=dict(required=False, choices=['csv', 'jsonl']),
+            aggregate=dict(required=False, choices=['no', 'yes'], default='no'),
+            max_expansion=dict(required=False, type='int'),
             entry_state=dict(required=False, choices=['absent', 'present']),
             description=dict(required=False),
             state=dict(required=True, choices=['absent', 'present']),
             category=dict(required=False, choices=[ 'ipv4_address', 'ipv6_address', 'ipv4_subnet', 'ipv6_subnet', 'ipv4_range', 'ipv6_range', 'ipv4_fqdn', 'ipv6_fqdn', 'object', 'object_group' ]),
+            running_config=dict(required=False),
+            plan_file=dict(required=False),
             validate_certs=dict(required=False, choices=['no', 'yes'], default='yes'),
             value=dict(required=False)
-            ),
+            ), failover=True),
         required_together = (
                 ['category','entry_state','value'],
             ),
-        mutually_exclusive=(['category', 'members'],),
+        required_one_of=(['name', 'purge'],),
+        mutually_exclusive=(['category', 'members'], ['category', 'entries'], ['entries', 'members'], ['name', 'purge'],
+                            ['category', 'members_file'], ['entries', 'members_file'], ['members', 'members_file'], ['plan_file', 'running_config']),
         supports_check_mode=False)
 
     m_args = module.params
 
-    if not has_rasa:
+    if not has_rasa and not m_args['running_config']:
         module.fail_json(msg='Missing required rasa module (check docs)')
 
-    if m_args['validate_certs'] == 'yes':
-        validate_certs = True
+    if m_args['running_config']:
+        dev = OfflineASA(m_args['host'], m_args['running_config'])
+    elif m_args['plan_file']:
+        dev = connect_device(module, PlanningDevice)
     else:
-        validate_certs = False
-
-    dev = ASA(
-        device=m_args['host'],
-        username=m_args['username'],
-        password=m_args['password'],
-        verify_cert=validate_certs
-    )
+        dev = connect_device(module)
+
+    if m_args['plan_file']:
+        load_plan(dev, module, m_args['plan_file'], plan_task('network_objectgroup', m_args, ['name', 'purge', 'category', 'value']))
+
+    if m_args['purge']:
+        if m_args['state'] != 'absent':
+            module.fail_json(msg='Purge requires state=absent')
+        deleted, blocked = purge_objects(dev, module, m_args['purge'])
+        return_msg = { 'changed': len(deleted) > 0, 'deleted': deleted, 'blocked': blocked }
+        if m_args['plan_file']:
+            save_plan(dev, module, m_args['plan_file'])
+        if m_args['running_config'] or m_args['plan_file']:
+            return_msg['plan'] = dev.plan
+        module.exit_json(**return_msg)
 
     desired_data = {}
     desired_data['name'] = m_args['name']
@@ -231,36 +383,46 @@ def main():
 
     member_data = {}
     if m_args['entry_state']:
-        member_data['kind'] = object_kind[m_args['category']]
-        kind_type = object_kind_type[m_args['category']]
-        member_data[kind_type] = m_args['value']
-        if kind_type == 'objectId':
-            if m_args['category'] == 'object_group':
-                ref_link = 'https://%s/api/objects/networkobjectgroups/%s' % (m_args['host'], m_args['value'])
-            else:
-                ref_link = 'https://%s/api/objects/networkobjects/%s' % (m_args['host'], m_args['value'])
-            member_data['refLink'] = ref_link
-
+        member_data = group_member_data(m_args['host'], m_args['category'], m_args['value'])
         desired_data['members'] = [member_data]
 
+    entries = []
+    work_entries = []
+    aggregation = None
+    expansion = None
+    if m_args['entries']:
+        entries = parse_entries(module, m_args['host'], m_args['entries'])
+    elif m_args['members_file']:
+        entries = parse_entries(module, m_args['host'],
+                                read_members_file(module, m_args['members_file'], m_args['members_format']))
+        if not entries:
+            module.fail_json(msg='No entries in %s' % m_args['members_file'])
+    if entries:
+        work_entries = entries
+        if m_args['aggregate'] == 'yes':
+            work_entries, aggregation = aggregate_entries(module, m_args['host'], entries)
+        desired_data['members'] = [e['member'] for e in work_entries if e['entry_state'] == 'present']
+
     if m_args['members']:
         pass
 
     try:
-        data = dev.get_networkobjectgroup(m_args['name'])
+        data = get_stream(dev, 'objects/networkobjectgroups/%s' % m_args['name'])
     except:
-        err = sys.exc_info()[0]
+        err = sys.exc_info()[1]
         module.fail_json(msg='Unable to connect to device: %s' % err)
 
     if data.status_code == 200:
         if m_args['state'] == 'absent':
+            if m_args['check_references'] == 'yes':
+                check_references(dev, module, m_args['name'])
             changed_status = delete_object(dev, module, m_args['name'])
 
         elif m_args['state'] == 'present' and m_args['entry_state']:
 
+            current_data = read_group(module, data, [member_data])
             change_description = False
             if m_args['description']:
-                current_data = data.json()
                 try:
                     if m_args['description'] == current_data['description']:
 
@@ -270,7 +432,7 @@ def main():
                 except:
                     change_description = True
 
-            found = find_member(data.json(), member_data, module)
+            found = find_member(current_data, member_data, module)
 
             if found and m_args['entry_state'] == 'present':
                 changed_status = False
@@ -278,6 +440,8 @@ def main():
                 changed_status = remove_object(dev, module, m_args['name'], member_data)
 
             elif m_args['entry_state'] == 'present':
+                if m_args['max_expansion'] is not None:
+                    expansion = check_expansion(dev, module, m_args['name'], [member_data], [], m_args['max_expansion'])
                 changed_status = add_object(dev, module, m_args['name'], member_data)
 
             elif m_args['entry_state'] == 'absent':
@@ -286,6 +450,21 @@ def main():
             if change_description:
                 changed_status = modify_description(dev, module, m_args['name'],m_args['description'])
 
+        elif m_args['state'] == 'present' and entries:
+            covered = None
+            if aggregation:
+                covered = aggregation.pop('covered')
+            current_data = read_group(module, data, [e['member'] for e in work_entries], covered)
+            if aggregation:
+                redundant = redundant_entries(current_data, work_entries, covered)
+                aggregation['removed'] = len(redundant)
+                work_entries = work_entries + redundant
+            patch = entry_changes(current_data, work_entries, m_args['description'])
+            if m_args['max_expansion'] is not None and patch.get('members.add'):
+                expansion = check_expansion(dev, module, m_args['name'], patch.get('members.add', []),
+                                            patch.get('members.remove', []), m_args['max_expansion'])
+            changed_status = update_entries(dev, module, m_args['name'], patch)
+
         elif m_args['state'] == 'present' and m_args['members']:
             module.fail_json(msg='This feature is eagerly awaiting to be developed')
 
@@ -301,21 +480,67 @@ def main():
             changed_status = False
         elif m_args['state'] == 'present':
             changed_status = create_object(dev, module, desired_data)
+            for entry in work_entries:
+                entry['changed'] = entry['entry_state'] == 'present'
+            if aggregation:
+                aggregation.pop('covered')
+                aggregation['removed'] = 0
     else:
         module.fail_json(msg="Unsupported return code %s" % data.status_code)
 
     return_msg = {}
     return_msg['changed'] = changed_status
-
+    if aggregation:
+        return_msg['aggregation'] = aggregation
+    if expansion:
+        return_msg['expansion'] = expansion
+    for entry in entries:
+        if 'aggregates' in entry:
+            entry['changed'] = len([aggregate for aggregate in entry['aggregates'] if aggregate.get('changed')]) > 0
+    if entries and m_args['members_file']:
+        return_msg['members_file'] = {
+            'entries': len(entries),
+            'changed': len([entry for entry in entries if entry.get('changed')])
+        }
+    elif entries:
+        return_msg['entries'] = []
+        for entry in entries:
+            return_msg['entries'].append({
+                'category': entry['category'],
+                'value': entry['value'],
+                'entry_state': entry['entry_state'],
+                'changed': entry.get('changed', False)
+            })
+
+    if m_args['plan_file']:
+        save_plan(dev, module, m_args['plan_file'])
+    if m_args['running_config'] or m_args['plan_file']:
+        return_msg['plan'] = dev.plan
     module.exit_json(**return_msg)
 
+def member_covered(member, covered):
+    """Returns True if an address, subnet or range member lies within the
+    merged intervals in covered
+    """
+    if not covered or 'value' not in member:
+        return False
+    category = [c for c in GROUP_MEMBER_KIND if GROUP_MEMBER_KIND[c] == member.get('kind')]
+    if not category or category[0].split('_')[-1] not in ['address', 'subnet', 'range']:
+        return False
+    try:
+        start, end = address_interval(category[0], member['value'])
+    except ValueError:
+        return False
+    version = 6 if category[0].startswith('ipv6') else 4
+    return interval_covers(covered[version], start, end)
+
 def modify_description(dev, module, net_object, description):
     data = {}
     data['description'] = description
     try:
         result = dev.update_networkobjectgroup(net_object, data)
     except:
-        err = sys.exc_info()[0]
+        err = sys.exc_info()[1]
         module.fail_json(msg='Unable to connect to device: %s' % err)
 
     if result.status_code != 204:
@@ -323,11 +548,101 @@ def modify_description(dev, module, net_object, description):
 
     return True
     
+def purge_objects(dev, module, names):
+    index = build_reference_index(dev, module)
+    order, blocked = safe_delete_order(names, index)
+
+    deleted = []
+    for name in order:
+        try:
+            result = dev.delete_networkobjectgroup(name)
+        except:
+            err = sys.exc_info()[1]
+            module.fail_json(msg='Unable to connect to device: %s' % err, deleted=deleted)
+
+        if result.status_code == 204:
+            deleted.append(name)
+        elif result.status_code != 404:
+            module.fail_json(msg='Unable to delete object-group %s - %s' % (name, result.status_code), deleted=deleted)
+
+    return deleted, blocked
+
+def read_group(module, response, wanted_members, covered=None):
+    """Decodes an object-group response in a single pass. Members are
+    streamed and only those in wanted_members, or covered by the merged
+    address intervals in covered, are kept, so the memory used doesn't grow
+    with the size of the group.
+    """
+    wanted = set(member_key(member) for member in wanted_members)
+    current_data = {}
+    current_data['members'] = []
+    try:
+        for key, value in iter_object(iter_content(response), 'members'):
+            if key == 'members':
+                if member_key(value) in wanted or member_covered(value, covered):
+                    current_data['members'].append(value)
+            else:
+                current_data[key] = value
+    except ValueError:
+        err = sys.exc_info()[1]
+        module.fail_json(msg='Unable to decode object-group: %s' % err)
+
+    return current_data
+
+def redundant_entries(current_data, work_entries, covered):
+    """Returns absent entries for the current members that are covered by
+    the aggregated entries without being one of them
+    """
+    keep = set(member_key(entry['member']) for entry in work_entries)
+    redundant = []
+    for member in current_data['members']:
+        key = member_key(member)
+        if key not in keep and member_covered(member, covered):
+            keep.add(key)
+            redundant.append({ 'entry_state': 'absent', 'member': member })
+    return redundant
+
+def read_members_file(module, path, file_format):
+    """Yields the entries in a CSV or JSON-lines file one line at a time"""
+    if not file_format:
+        file_format = 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+    try:
+        f = open(path)
+    except IOError:
+        err = sys.exc_info()[1]
+        module.fail_json(msg='Unable to open %s: %s' % (path, err))
+
+    with f:
+        if file_format == 'csv':
+            reader = csv.reader(f)
+            for row in reader:
+                row = [field.strip() for field in row]
+                if not row or not row[0] or row[0].startswith('#') or row[0] == 'category':
+                    continue
+                entry = { 'category': row[0], 'line': reader.line_num }
+                if len(row) > 1:
+                    entry['value'] = row[1]
+                if len(row) > 2 and row[2]:
+                    entry['entry_state'] = row[2]
+                yield entry
+        else:
+            for line_num, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    module.fail_json(msg='Invalid JSON on line %s of %s' % (line_num, path))
+                if isinstance(entry, dict):
+                    entry['line'] = line_num
+                yield entry
+
 def remove_object(dev, module, net_object, member_data):
     try:
         result = dev.remove_member_networkobjectgroup(net_object,[member_data])
     except:
-        err = sys.exc_info()[0]
+        err = sys.exc_info()[1]
         module.fail_json(msg='Unable to connect to device: %s' % err)
 
     if result.status_code != 204:
@@ -335,11 +650,62 @@ def remove_object(dev, module, net_object, member_data):
 
     return True
 
+def entry_changes(current_data, entries, description):
+    """Returns the PATCH data making the group match entries, and marks
+    each entry as changed or not
+    """
+    # Members are removed in the form the device returned them
+    members = {}
+    for member in current_data.get('members', []):
+        members[member_key(member)] = member
+
+    members_add = []
+    members_remove = []
+    for entry in entries:
+        key = member_key(entry['member'])
+        entry['changed'] = False
+        if entry['entry_state'] == 'present' and key not in members:
+            members[key] = None
+            members_add.append(entry['member'])
+            entry['changed'] = True
+        elif entry['entry_state'] == 'absent' and key in members:
+            current = members.pop(key)
+            if current is None:
+                members_add = [member for member in members_add if member_key(member) != key]
+            else:
+                members_remove.append(current)
+            entry['changed'] = True
+
+    data = {}
+    if members_add:
+        data['members.add'] = members_add
+    if members_remove:
+        data['members.remove'] = members_remove
+    if description and description != current_data.get('description'):
+        data['description'] = description
+
+    return data
+
+def update_entries(dev, module, net_object, data):
+    if not data:
+        return False
+
+    try:
+        result = dev.update_networkobjectgroup(net_object, data)
+    except:
+        err = sys.exc_info()[1]
+        module.fail_json(msg='Unable to connect to device: %s' % err)
+
+    if result.status_code != 204:
+        module.fail_json(msg='Unable to update object-group entries - %s' % result.status_code)
+
+    return True
+
 def update_object(dev, module, desired_data):
     try:
         result = dev.update_networkobject(desired_data['name'], desired_data)
     except:
-        err = sys.exc_info()[0]
+        err = sys.exc_info()[1]
         module.fail_json(msg='Unable to connect to device: %s' % err)
 
     if result.status_code == 204:
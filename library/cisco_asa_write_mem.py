@@ -25,7 +25,14 @@ description:
     - Issues the write mem command on the unit
 requirements:
     - rasa
+extends_documentation_fragment:
+    - cisco_asa
+    - cisco_asa.failover
 options:
+    contexts:
+        description:
+            - On multi-context units, a list of contexts to save or 'all'. All listed contexts are saved in a single request, 'all' issues one 'write memory all' from the system context. A list is never turned into 'write memory all', which would also save contexts with changes made outside the play, so use 'all' when every context should be saved. A context is reported as not saved when its part of the output ends with [FAILED].
+        required: false
     host:
         description:
             - Typically set to {{ inventory_hostname }}
@@ -34,6 +41,11 @@ options:
         description:
             - Password for the device
         required: true
+    read_timeout:
+        description:
+            - Seconds to wait for the device to answer a request, saving a large configuration can take a while
+        default: 120
+        required: false
     username:
         description:
             - Username for device
@@ -44,6 +56,12 @@ options:
         choices: [ 'no', 'yes']
         default: 'yes'
         required: false
+    wait:
+        description:
+            - If no, the save is started in the background and a job_id is returned right away. Use cisco_asa_write_mem_status to wait for the result.
+        choices: [ 'no', 'yes']
+        default: 'yes'
+        required: false
 '''
 
 EXAMPLES = '''
@@ -55,10 +73,46 @@ EXAMPLES = '''
     password=APIpass123
     validate_certs=no
 
+# Save two contexts on a multi-context unit
+- cisco_asa_write_mem:
+    host: "{{ inventory_hostname }}"
+    username: api_user
+    password: APIpass123
+    validate_certs: no
+    contexts:
+      - admin
+      - customer-a
+
+# Save every context with write memory all
+- cisco_asa_write_mem:
+    host={{ inventory_hostname }}
+    username=api_user
+    password=APIpass123
+    contexts=all
+    validate_certs=no
+
+# Start the save in the background and wait for it later
+- cisco_asa_write_mem:
+    host={{ inventory_hostname }}
+    username=api_user
+    password=APIpass123
+    validate_certs=no
+    wait=no
+  register: save_job
+
+- cisco_asa_write_mem_status:
+    job_id={{ save_job.job_id }}
+    timeout=120
+
 '''
 
+import json
+import os
+import re
 import sys
+import time
 from ansible.module_utils.basic import *
+from ansible.module_utils.cisco_asa import connect_device, connection_argument_spec
 from collections import defaultdict
 
 try:
@@ -67,14 +121,144 @@ try:
 except:
     has_rasa = False
 
+JOB_DIR = os.path.expanduser('~/.ansible/cisco_asa/jobs')
+# Job files older than this are removed when a new job is started
+JOB_TTL = 86400
+
+SAVE_MARKER = re.compile(r'^\s*\[(OK|FAILED)\]\s*$', re.M)
+
+
+def context_commands(contexts):
+    if contexts == ['all']:
+        return ['changeto system', 'write memory all']
+
+    commands = []
+    for context in contexts:
+        commands.append('changeto context %s' % context)
+        commands.append('write memory')
+    return commands
+
+def context_results(contexts, output):
+    """Returns whether each context was saved from the CLI output. The
+    output of 'write memory all' has a section per context, a context is
+    saved unless its section ends with [FAILED]. The ASA may print a single
+    [OK] after the last context instead of one per section.
+    """
+    results = {}
+    if contexts == ['all']:
+        completed = SAVE_MARKER.findall(output[-1])[-1:] == ['OK']
+        sections = re.split(r'Saving context :', output[-1])[1:]
+        for section in sections:
+            context = section.split(':')[0].strip()
+            markers = SAVE_MARKER.findall(section)
+            if markers:
+                results[context] = { 'saved': markers[-1] == 'OK' }
+            else:
+                results[context] = { 'saved': completed }
+        if not results:
+            results['all'] = { 'saved': completed }
+    else:
+        for index, context in enumerate(contexts):
+            write_output = output[index * 2 + 1]
+            results[context] = { 'saved': '[OK]' in write_output }
+
+    return results
+
+def save_configuration(dev, contexts):
+    """Saves the configuration and returns a tuple of (saved, msg, results)
+    """
+    try:
+        if contexts:
+            data = dev._post('cli', { 'commands': context_commands(contexts) })
+        else:
+            data = dev.write_mem()
+    except:
+        err = sys.exc_info()[1]
+        return False, 'Unable to connect to device: %s' % err, {}
+
+    if data.status_code != 200:
+        return False, 'Unable to save configuration: - %s' % data.status_code, {}
+
+    if not contexts:
+        return True, 'Configuration saved', {}
+
+    results = context_results(contexts, data.json()['response'])
+    failed = [context for context in results if not results[context]['saved']]
+    if failed:
+        return False, 'Unable to save contexts: %s' % ', '.join(sorted(failed)), results
+
+    return True, 'Configuration saved', results
+
+def expire_jobs():
+    now = time.time()
+    for name in os.listdir(JOB_DIR):
+        path = os.path.join(JOB_DIR, name)
+        try:
+            if now - os.path.getmtime(path) > JOB_TTL:
+                os.remove(path)
+        except OSError:
+            pass
+
+def start_job(module, dev, contexts):
+    if not os.path.isdir(JOB_DIR):
+        os.makedirs(JOB_DIR, 0o700)
+    expire_jobs()
+
+    job_id = '%d.%d' % (time.time() * 1000, os.getpid())
+    job_file = os.path.join(JOB_DIR, job_id)
+    status = {
+        'job_id': job_id,
+        'host': module.params['host'],
+        'started': time.time(),
+        'finished': False
+    }
+    write_job(job_file, status)
+
+    pid = os.fork()
+    if pid == 0:
+        # Detach from the module process so Ansible can return right away
+        os.setsid()
+        if os.fork() != 0:
+            os._exit(0)
+        devnull = os.open(os.devnull, os.O_RDWR)
+        for fd in (0, 1, 2):
+            os.dup2(devnull, fd)
+
+        try:
+            try:
+                saved, msg, results = save_configuration(dev, contexts)
+            except:
+                saved, msg, results = False, 'Unable to save configuration: %s' % sys.exc_info()[1], None
+            status['finished'] = True
+            status['ended'] = time.time()
+            status['saved'] = saved
+            status['msg'] = msg
+            if results:
+                status['contexts'] = results
+            write_job(job_file, status)
+        finally:
+            os._exit(0)
+
+    os.waitpid(pid, 0)
+
+    return job_id
+
+def write_job(job_file, status):
+    tmp_file = '%s.tmp' % job_file
+    with open(tmp_file, 'w') as f:
+        json.dump(status, f)
+    os.rename(tmp_file, job_file)
 
 def main():
     module = AnsibleModule(
-        argument_spec=dict(
+        argument_spec=connection_argument_spec(dict(
+            contexts=dict(required=False, type='list'),
             host=dict(required=True),
             username=dict(required=True),
             password=dict(required=True),
-            validate_certs=dict(required=False, choices=['no', 'yes'], default='yes')),
+            wait=dict(required=False, choices=['no', 'yes'], default='yes'),
+            read_timeout=dict(required=False, type='int', default=120),
+            validate_certs=dict(required=False, choices=['no', 'yes'], default='yes')), failover=True),
         supports_check_mode=False)
 
     m_args = module.params
@@ -82,32 +266,25 @@ def main():
     if not has_rasa:
         module.fail_json(msg='Missing required rasa module (check docs)')
 
+    if m_args['contexts'] and 'all' in m_args['contexts'] and len(m_args['contexts']) > 1:
+        module.fail_json(msg="Use either 'all' or a list of contexts")
 
-    if m_args['validate_certs'] == 'yes':
-        validate_certs = True
-    else:
-        validate_certs = False
-
-    dev = ASA(
-        device=m_args['host'],
-        username=m_args['username'],
-        password=m_args['password'],
-        verify_cert=validate_certs
-    )
+    dev = connect_device(module)
 
-    try:
-        data = dev.write_mem()
-    except:
-        err = sys.exc_info()[0]
-        module.fail_json(msg='Unable to connect to device: %s' % err)
+    if m_args['wait'] == 'no':
+        job_id = start_job(module, dev, m_args['contexts'])
+        return_msg = { 'changed': True, 'job_id': job_id, 'finished': False }
+        module.exit_json(**return_msg)
 
-    if data.status_code == 200:
-        return_status = True
-    else:
-        module.fail_json(msg='Unable to save configuration: - %s' % data.status_code)
+    saved, msg, results = save_configuration(dev, m_args['contexts'])
+    if not saved:
+        if results:
+            module.fail_json(msg=msg, contexts=results)
+        module.fail_json(msg=msg)
 
-    return_msg = { 'changed': return_status } 
+    return_msg = { 'changed': True }
+    if results:
+        return_msg['contexts'] = results
     module.exit_json(**return_msg)
     
 main()
-
@@ -0,0 +1,95 @@
+#!/usr/bin/python
+
+# Copyright 2015 Patrick Ogenstad <patrick@ogenstad.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+DOCUMENTATION = '''
+---
+
+module: cisco_asa_write_mem_status
+author: Patrick Ogenstad (@networklore)
+version: 0.x
+short_description: Checks the status of a background save.
+description:
+    - Checks or waits for a save started by cisco_asa_write_mem with wait=no
+options:
+    job_id:
+        description:
+            - The job_id returned by cisco_asa_write_mem
+        required: true
+    timeout:
+        description:
+            - Seconds to wait for the save to finish. With 0 the status is checked once.
+        default: 0
+        required: false
+'''
+
+EXAMPLES = '''
+
+# Wait up to two minutes for a background save
+- cisco_asa_write_mem_status:
+    job_id={{ save_job.job_id }}
+    timeout=120
+
+'''
+
+import json
+import os
+import sys
+import time
+from ansible.module_utils.basic import *
+
+JOB_DIR = os.path.expanduser('~/.ansible/cisco_asa/jobs')
+POLL_INTERVAL = 1
+
+
+def read_job(module, job_file):
+    try:
+        with open(job_file) as f:
+            return json.load(f)
+    except:
+        err = sys.exc_info()[1]
+        module.fail_json(msg='Unable to read job status: %s' % err)
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            job_id=dict(required=True),
+            timeout=dict(required=False, type='int', default=0)),
+        supports_check_mode=False)
+
+    m_args = module.params
+
+    job_file = os.path.join(JOB_DIR, os.path.basename(m_args['job_id']))
+    if not os.path.isfile(job_file):
+        module.fail_json(msg='Unknown job_id %s' % m_args['job_id'])
+
+    deadline = time.time() + m_args['timeout']
+    status = read_job(module, job_file)
+    while not status['finished'] and time.time() < deadline:
+        time.sleep(POLL_INTERVAL)
+        status = read_job(module, job_file)
+
+    if not status['finished']:
+        if m_args['timeout']:
+            module.fail_json(msg='Timeout waiting for the save to finish', **status)
+        module.exit_json(changed=False, **status)
+
+    if not status['saved']:
+        module.fail_json(**status)
+
+    status['elapsed'] = round(status['ended'] - status['started'], 2)
+    module.exit_json(changed=True, **status)
+
+main()
@@ -0,0 +1,2636 @@
+# Copyright 2015 Patrick Ogenstad <patrick@ogenstad.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Shared helpers for the cisco_asa modules
+
+import binascii
+import bisect
+import codecs
+import errno
+import fcntl
+import hashlib
+import itertools
+import json
+import os
+import re
+import socket
+import sys
+import threading
+import time
+from collections import defaultdict
+
+try:
+    basestring
+except NameError:
+    basestring = str
+    long = int
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+    from requests.packages.urllib3.connection import HTTPSConnection
+    from requests.packages.urllib3.connectionpool import HTTPSConnectionPool
+    has_requests = True
+except:
+    has_requests = False
+
+try:
+    from rasa import ASA
+    has_rasa = True
+except:
+    ASA = object
+    has_rasa = False
+
+try:
+    from rasa.constants import tcp_services, udp_services
+except:
+    tcp_services = {}
+    udp_services = {}
+
+HEADERS = {
+    'Content-Type': 'application/json',
+    'Accept': 'application/json',
+    'User-Agent': 'RASA'
+}
+
+CHUNK_SIZE = 16384
+PAGE_LIMIT = 100
+VOLATILE_FIELDS = ['selfLink']
+UNMANAGED_FIELDS = ['selfLink', 'refLink']
+BULK_LIMIT = 50
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 30
+BREAKER_THRESHOLD = 3
+BREAKER_RESET = 60
+HEALTH_DIR = os.path.expanduser('~/.ansible/cisco_asa/health')
+CAPABILITIES_DIR = os.path.expanduser('~/.ansible/cisco_asa/capabilities')
+CAPABILITIES_TTL = 86400
+FAILOVER_DIR = os.path.expanduser('~/.ansible/cisco_asa/failover')
+FAILOVER_TTL = 300
+FACTS_DIR = os.path.expanduser('~/.ansible/cisco_asa/facts')
+QUEUE_DIR = os.path.expanduser('~/.ansible/cisco_asa/queue')
+QUEUE_RESULT_TTL = 3600
+HASH_DIR = os.path.expanduser('~/.ansible/cisco_asa/hashes')
+CASSETTE_ENV = 'CISCO_ASA_CASSETTE'
+
+
+######################################################################
+# Payloads
+######################################################################
+NETWORK_OBJECT_KIND = {
+    'ipv4_address': 'IPv4Address',
+    'ipv6_address': 'IPv6Address',
+    'ipv4_subnet': 'IPv4Network',
+    'ipv6_subnet': 'IPv6Network',
+    'ipv4_range': 'IPv4Range',
+    'ipv6_range': 'IPv6Range',
+    'ipv4_fqdn': 'IPv4FQDN',
+    'ipv6_fqdn': 'IPv6FQDN'
+}
+
+GROUP_MEMBER_KIND = dict(NETWORK_OBJECT_KIND)
+GROUP_MEMBER_KIND['object'] = 'objectRef#NetworkObj'
+GROUP_MEMBER_KIND['object_group'] = 'objectRef#NetworkObjGroup'
+
+
+def network_object_data(name, category=None, value=None, description=None):
+    """Returns the REST payload of a network object"""
+    data = {}
+    data['name'] = name
+    data['objectId'] = name
+    data['kind'] = 'object#NetworkObj'
+    if category:
+        data['host'] = {
+            'kind': NETWORK_OBJECT_KIND[category],
+            'value': value
+        }
+    if description:
+        data['description'] = description
+
+    return data
+
+
+def group_member_data(host, category, value):
+    """Returns the REST payload of an object-group member"""
+    data = {}
+    data['kind'] = GROUP_MEMBER_KIND[category]
+    if category == 'object_group':
+        data['objectId'] = value
+        data['refLink'] = 'https://%s/api/objects/networkobjectgroups/%s' % (host, value)
+    elif category == 'object':
+        data['objectId'] = value
+        data['refLink'] = 'https://%s/api/objects/networkobjects/%s' % (host, value)
+    else:
+        data['value'] = value
+
+    return data
+
+
+def service_object_data(name, protocol, dst_port=None, description=None):
+    """Returns the REST payload of a service object, a tcp or udp service
+    when dst_port is set and a protocol otherwise. Raises ValueError for
+    invalid ports.
+    """
+    data = {}
+    data['name'] = name
+    data['objectId'] = name
+    if dst_port:
+        data['kind'] = 'object#TcpUdpServiceObj'
+        data['value'] = service_value(protocol, *port_interval(protocol, str(dst_port)))
+    else:
+        data['kind'] = 'object#NetworkProtocolObj'
+        data['value'] = protocol
+    if description:
+        data['description'] = description
+
+    return data
+
+
+def ikev1_policy_data(host, priority, authentication, encryption, hash_algorithm, group, lifetime):
+    """Returns the REST payload of an ikev1 policy"""
+    data = {}
+    data['priority'] = int(priority)
+    data['objectId'] = str(priority)
+    data['lifetimeInSecs'] = int(lifetime)
+    data['authentication'] = authentication
+    data['encryption'] = encryption
+    data['hash'] = hash_algorithm
+    data['dhgroup'] = int(group)
+    data['kind'] = 'object#ikev1policy'
+    data['selfLink'] = 'https://%s/api/vpn/ikev1policy/%s' % (host, priority)
+
+    return data
+
+
+######################################################################
+# Comparing objects
+######################################################################
+def normalize_address(value):
+    """Returns the canonical form of an IPv4 or IPv6 address, or the value
+    unchanged if it isn't an address
+    """
+    value = value.strip()
+    family = socket.AF_INET6 if ':' in value else socket.AF_INET
+    try:
+        return socket.inet_ntop(family, socket.inet_pton(family, value))
+    except (socket.error, ValueError):
+        return value
+
+
+def normalize_network(value):
+    """Returns a network as address/prefix, the prefix can be given as a
+    length or as a netmask
+    """
+    if '/' not in value:
+        return normalize_address(value)
+    address, prefix = value.split('/', 1)
+    prefix = prefix.strip()
+    if '.' in prefix:
+        if normalize_address(prefix) != prefix:
+            return value
+        prefix = netmask_to_prefix(prefix)
+    try:
+        prefix = int(prefix)
+    except ValueError:
+        return value
+    return '%s/%s' % (normalize_address(address), prefix)
+
+
+def normalize_range(value):
+    if '-' not in value:
+        return normalize_address(value)
+    return '-'.join([normalize_address(address) for address in value.split('-', 1)])
+
+
+VALUE_NORMALIZERS = {
+    'ipv4address': normalize_address,
+    'ipv6address': normalize_address,
+    'ipv4network': normalize_network,
+    'ipv6network': normalize_network,
+    'ipv4range': normalize_range,
+    'ipv6range': normalize_range,
+    'ipv4fqdn': lambda value: value.strip().lower().rstrip('.'),
+    'ipv6fqdn': lambda value: value.strip().lower().rstrip('.'),
+    'networkprotocol': lambda value: value.strip().lower(),
+    'tcpudpservice': lambda value: normalize_service(value),
+    'icmpservice': lambda value: value.strip().lower(),
+    'icmp6service': lambda value: value.strip().lower(),
+    'object#networkprotocolobj': lambda value: value.strip().lower(),
+    'object#tcpudpserviceobj': lambda value: normalize_service(value)
+}
+
+
+def normalize(data):
+    """Returns data in a form where equal configurations compare equal.
+    Kinds are compared without case, address values in canonical form and
+    numbers the same as their string form. Fields the device adds, like
+    selfLink, are dropped.
+    """
+    if isinstance(data, dict):
+        kind = data.get('kind')
+        normalized = {}
+        for key, value in data.items():
+            if key in UNMANAGED_FIELDS:
+                continue
+            if key == 'kind' and isinstance(value, basestring):
+                value = value.lower()
+            elif key == 'value' and isinstance(kind, basestring) and isinstance(value, basestring):
+                value = VALUE_NORMALIZERS.get(kind.lower(), lambda value: value)(value)
+            else:
+                value = normalize(value)
+            normalized[key] = value
+        return normalized
+    if isinstance(data, list):
+        return [normalize(item) for item in data]
+    if isinstance(data, bool) or data is None:
+        return data
+    if isinstance(data, (int, long, float)):
+        return '%s' % data
+    if isinstance(data, basestring):
+        return data.strip()
+    return data
+
+
+def match_objects(current_data, desired_data, fields=None):
+    """Returns True if current_data already has the configuration in
+    desired_data. Only the managed fields are compared, by default the ones
+    in desired_data. Fields listed in fields are compared even when they are
+    missing from desired_data, i.e. a description that should be removed.
+    """
+    current_data = normalize(current_data)
+    desired_data = normalize(desired_data)
+    if fields is None:
+        fields = desired_data.keys()
+    for field in fields:
+        if current_data.get(field) != desired_data.get(field):
+            return False
+    return True
+
+
+def merge_intervals(intervals):
+    """Merges overlapping and adjacent (start, end) intervals of integers,
+    the result is sorted by start
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + 1:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def interval_covers(merged, start, end):
+    """Returns True if (start, end) lies within one of the merged intervals"""
+    index = bisect.bisect_right(merged, (start, float('inf'))) - 1
+    return index >= 0 and merged[index][1] >= end
+
+
+ADDRESS_BITS = { 4: 32, 6: 128 }
+
+
+def address_to_int(address):
+    family = socket.AF_INET6 if ':' in address else socket.AF_INET
+    return int(binascii.hexlify(socket.inet_pton(family, address.strip())), 16)
+
+
+def int_to_address(number, version):
+    if version == 4:
+        return socket.inet_ntop(socket.AF_INET, binascii.unhexlify('%08x' % number))
+    return socket.inet_ntop(socket.AF_INET6, binascii.unhexlify('%032x' % number))
+
+
+def address_interval(category, value):
+    """Returns the first and last address covered by an ipv4_ or ipv6_
+    address, subnet or range as integers. Raises ValueError for values that
+    can't be parsed.
+    """
+    version = 6 if category.startswith('ipv6') else 4
+    try:
+        if category.endswith('_subnet'):
+            address, prefix = normalize_network(value).split('/')
+            host_bits = ADDRESS_BITS[version] - int(prefix)
+            if host_bits < 0:
+                raise ValueError
+            start = address_to_int(address) >> host_bits << host_bits
+            return start, start + (1 << host_bits) - 1
+        if category.endswith('_range'):
+            first, last = [address_to_int(address) for address in value.split('-')]
+            if first > last:
+                raise ValueError
+            return first, last
+        number = address_to_int(value)
+        return number, number
+    except (socket.error, ValueError):
+        raise ValueError('Invalid %s: %s' % (category, value))
+
+
+def interval_blocks(version, start, end):
+    """Returns the (start, end, category, value) of the fewest address and
+    subnet members covering exactly the addresses from start to end. An
+    object-group can't hold ranges, so an interval that isn't a single
+    subnet is split into the largest aligned subnets it holds.
+    """
+    prefix = 'ipv%s' % version
+    bits = ADDRESS_BITS[version]
+    blocks = []
+    while start <= end:
+        size = start & -start if start else 1 << bits
+        while size > end - start + 1:
+            size >>= 1
+        if size == 1:
+            blocks.append((start, start, '%s_address' % prefix, int_to_address(start, version)))
+        else:
+            length = bits - (size.bit_length() - 1)
+            blocks.append((start, start + size - 1, '%s_subnet' % prefix, '%s/%s' % (int_to_address(start, version), length)))
+        start += size
+    return blocks
+
+
+def aggregate_entries(module, host, entries):
+    """Merges the present address entries into the fewest address and
+    subnet entries covering the same addresses. Returns the entries to
+    reconcile and the aggregation summary, which holds the merged intervals
+    per IP version as covered. Every merged entry points to the entries
+    replacing it as aggregates.
+    """
+    intervals = { 4: [], 6: [] }
+    merged_entries = []
+    work_entries = []
+    for entry in entries:
+        category = entry['category']
+        if entry['entry_state'] != 'present' or category.split('_')[-1] not in ['address', 'subnet', 'range']:
+            work_entries.append(entry)
+            continue
+        try:
+            start, end = address_interval(category, entry['value'])
+        except ValueError:
+            err = sys.exc_info()[1]
+            module.fail_json(msg='%s' % err)
+        version = 6 if category.startswith('ipv6') else 4
+        intervals[version].append((start, end))
+        entry['interval'] = (version, start, end)
+        merged_entries.append(entry)
+
+    covered = {}
+    aggregates = {}
+    block_starts = {}
+    for version in sorted(intervals):
+        covered[version] = merge_intervals(intervals[version])
+        aggregates[version] = []
+        block_starts[version] = []
+        for start, end in covered[version]:
+            for block_start, block_end, category, value in interval_blocks(version, start, end):
+                block_starts[version].append(block_start)
+                aggregates[version].append({
+                    'category': category,
+                    'value': value,
+                    'entry_state': 'present',
+                    'member': group_member_data(host, category, value)
+                })
+
+    for entry in merged_entries:
+        version, start, end = entry.pop('interval')
+        first = bisect.bisect_right(block_starts[version], start) - 1
+        last = bisect.bisect_right(block_starts[version], end)
+        entry['aggregates'] = aggregates[version][first:last]
+
+    aggregates = aggregates[4] + aggregates[6]
+
+    aggregation = {}
+    aggregation['entries'] = len(merged_entries)
+    aggregation['aggregated'] = len(aggregates)
+    if merged_entries:
+        aggregation['reduction'] = round(1 - float(len(aggregates)) / len(merged_entries), 4)
+    else:
+        aggregation['reduction'] = 0.0
+    aggregation['covered'] = covered
+
+    return work_entries + aggregates, aggregation
+
+
+PORT_PROTOCOLS = ['tcp', 'udp', 'tcp-udp']
+
+# Names the ASA shows that differ from the service tables
+PORT_ALIASES = { 'www': 80 }
+
+
+def port_names(protocol):
+    """Returns the port numbers of the service names of protocol"""
+    names = dict(PORT_ALIASES)
+    for services in ([tcp_services] if protocol == 'tcp' else [udp_services] if protocol == 'udp' else [tcp_services, udp_services]):
+        for number, name in services.items():
+            names.setdefault(name, int(number))
+    return names
+
+
+def port_number(protocol, port):
+    """Returns the number of a port given as a number or as the name the ASA
+    uses, i.e. www or https
+    """
+    port = port.strip().lower()
+    if port.isdigit():
+        number = int(port)
+    else:
+        names = port_names(protocol)
+        if port not in names:
+            raise ValueError('Unknown %s port %s' % (protocol, port))
+        number = names[port]
+    if not 0 <= number <= 65535:
+        raise ValueError('Invalid port %s' % port)
+    return number
+
+
+def port_interval(protocol, port):
+    """Returns the first and last port of a port given as 443, https,
+    1000-2000, eq 443, range 1000 2000, lt 1024 or gt 1023
+    """
+    words = port.replace(' - ', ' ').split()
+    # Names like netbios-ssn contain a hyphen, anything else with one is a
+    # range such as 1000-2000
+    if len(words) == 1 and '-' in words[0] and words[0].lower() not in port_names(protocol):
+        words = words[0].split('-')
+    if not words:
+        raise ValueError('Missing port')
+    operator = words[0].lower()
+    if operator == 'eq' and len(words) == 2:
+        words = words[1:]
+    elif operator == 'range' and len(words) == 3:
+        words = words[1:]
+    elif operator == 'lt' and len(words) == 2:
+        return 0, port_number(protocol, words[1]) - 1
+    elif operator == 'gt' and len(words) == 2:
+        return port_number(protocol, words[1]) + 1, 65535
+    if len(words) == 1:
+        number = port_number(protocol, words[0])
+        return number, number
+    if len(words) == 2:
+        start, end = port_number(protocol, words[0]), port_number(protocol, words[1])
+        if start > end:
+            raise ValueError('Invalid port range %s' % port)
+        return start, end
+    raise ValueError('Invalid port %s' % port)
+
+
+def split_service(value):
+    """Splits a service value such as tcp/443 in protocol and port"""
+    if '/' not in value:
+        raise ValueError('Invalid service %s, expected protocol/port' % value)
+    protocol, port = value.split('/', 1)
+    protocol = protocol.strip().lower()
+    if protocol not in PORT_PROTOCOLS:
+        raise ValueError('Invalid protocol %s, expected one of %s' % (protocol, ', '.join(PORT_PROTOCOLS)))
+    return protocol, port
+
+
+def service_value(protocol, start, end):
+    if start == end:
+        return '%s/%s' % (protocol, start)
+    return '%s/%s-%s' % (protocol, start, end)
+
+
+def normalize_service(value):
+    """Returns a tcp or udp service with numeric ports, so tcp/https and
+    tcp/443 compare equal
+    """
+    try:
+        protocol, port = split_service(value)
+        return service_value(protocol, *port_interval(protocol, port))
+    except ValueError:
+        return value.strip().lower()
+
+
+def coalesce_services(values):
+    """Merges services given as protocol/port into the fewest port ranges
+    per protocol. Returns a dict of the merged (start, end) ranges keyed on
+    protocol. Raises ValueError for invalid services.
+    """
+    intervals = defaultdict(list)
+    for value in values:
+        protocol, port = split_service(value)
+        intervals[protocol].append(port_interval(protocol, port))
+    return dict((protocol, merge_intervals(intervals[protocol])) for protocol in intervals)
+
+
+def member_key(member):
+    """Returns a key that is the same for equal object-group members"""
+    return json.dumps(normalize(member), sort_keys=True)
+
+
+def common_subsequence(a, b):
+    """Returns the (i, j) index pairs of a longest common subsequence of the
+    lists a and b, in order. Uses Myers' O((N+M)D) algorithm, so lists that
+    differ in D entries are cheap to compare however long they are.
+    """
+    n = len(a)
+    m = len(b)
+    v = {1: 0}
+    trace = []
+    for d in range(n + m + 1):
+        trace.append(dict(v))
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[k - 1] < v[k + 1]):
+                x = v[k + 1]
+            else:
+                x = v[k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[x] == b[y]:
+                x += 1
+                y += 1
+            v[k] = x
+            if x >= n and y >= m:
+                break
+        else:
+            continue
+        break
+
+    # Walk the furthest reaching paths back from the end, the diagonal
+    # moves are the common entries
+    pairs = []
+    x = n
+    y = m
+    for d in range(len(trace) - 1, -1, -1):
+        v = trace[d]
+        k = x - y
+        if k == -d or (k != d and v[k - 1] < v[k + 1]):
+            previous_k = k + 1
+        else:
+            previous_k = k - 1
+        previous_x = v[previous_k]
+        previous_y = previous_x - previous_k
+        while x > previous_x and y > previous_y:
+            x -= 1
+            y -= 1
+            pairs.append((x, y))
+        x = previous_x
+        y = previous_y
+
+    pairs.reverse()
+    return pairs
+
+
+def edit_script(current, desired, key):
+    """Returns the entries of current to delete and the (position, entry)
+    pairs of desired to insert to turn current into desired, keeping the
+    longest common subsequence in place. Positions count from 1 and are
+    valid when the deletes are sent first and the inserts from the top down.
+    """
+    pairs = common_subsequence([key(entry) for entry in current], [key(entry) for entry in desired])
+    kept_current = set([i for i, j in pairs])
+    kept_desired = set([j for i, j in pairs])
+
+    deletes = [entry for i, entry in enumerate(current) if i not in kept_current]
+    inserts = [(j + 1, entry) for j, entry in enumerate(desired) if j not in kept_desired]
+    return deletes, inserts
+
+
+######################################################################
+# Streaming JSON decoding
+######################################################################
+class JSONStreamReader(object):
+    """Reads JSON values from an iterator of byte chunks, keeping only the
+    part of the document that hasn't been decoded yet in memory.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.decoder = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        if self.eof:
+            return False
+        try:
+            chunk = next(self.chunks)
+        except StopIteration:
+            self.eof = True
+            self.buf += self.utf8.decode(b'', True)
+            return False
+        self.buf = self.buf[self.pos:] + self.utf8.decode(chunk)
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                raise ValueError('Unexpected end of JSON data')
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError('Expected %s at position %s' % (char, self.pos))
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except ValueError:
+                if not self._fill():
+                    raise
+                continue
+            # A number at the end of the buffer might continue in the next chunk
+            if end < len(self.buf) or not self._fill():
+                self.pos = end
+                return value
+
+
+def iter_object(chunks, array_key):
+    """Yields the (key, value) pairs of the JSON object read from chunks. The
+    elements of array_key are yielded one at a time as (array_key, element),
+    the array itself is never held in memory.
+    """
+    reader = JSONStreamReader(chunks)
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+
+    while True:
+        key = reader.value()
+        reader.expect(':')
+        if key == array_key and reader.peek() == '[':
+            reader.expect('[')
+            if reader.peek() == ']':
+                reader.pos += 1
+            else:
+                while True:
+                    yield key, reader.value()
+                    separator = reader.peek()
+                    reader.pos += 1
+                    if separator == ']':
+                        break
+                    if separator != ',':
+                        raise ValueError('Invalid array separator %s' % separator)
+        else:
+            yield key, reader.value()
+
+        separator = reader.peek()
+        reader.pos += 1
+        if separator == '}':
+            return
+        if separator != ',':
+            raise ValueError('Invalid object separator %s' % separator)
+
+
+def iter_content(response):
+    return response.iter_content(CHUNK_SIZE)
+
+
+######################################################################
+# Connections
+######################################################################
+if has_requests:
+    class CircuitOpenError(requests.exceptions.ConnectionError):
+        """Raised instead of connecting to a device that is known to be down"""
+else:
+    class CircuitOpenError(Exception):
+        """Raised instead of connecting to a device that is known to be down"""
+
+
+def device_address(device):
+    """Returns the (host, port) of a device given as host, host:port,
+    an IPv6 address or [address]:port
+    """
+    if device.startswith('['):
+        host, _, port = device[1:].partition(']')
+        if port.startswith(':'):
+            return host, int(port[1:])
+        return host, 443
+    if device.count(':') == 1:
+        host, port = device.split(':')
+        return host, int(port)
+    return device, 443
+
+
+LINK_FIELDS = ['refLink', 'selfLink']
+
+
+def relative_links(data):
+    """Returns data with the scheme and host dropped from refLink and
+    selfLink, so a recorded request matches whatever address it is replayed
+    against
+    """
+    if isinstance(data, dict):
+        links = {}
+        for key, value in data.items():
+            if key in LINK_FIELDS and isinstance(value, basestring):
+                links[key] = re.sub(r'^https?://[^/]*', '', value)
+            else:
+                links[key] = relative_links(value)
+        return links
+    if isinstance(data, list):
+        return [relative_links(item) for item in data]
+    return data
+
+
+def record_exchange(path, record):
+    """Appends a request and its response to a cassette file, one JSON
+    document per line. The file is locked as forks record at the same time.
+    """
+    with open(path, 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.write(json.dumps(record, sort_keys=True) + '\n')
+
+
+class CircuitBreaker(object):
+    """Counts consecutive connection failures to a device in a file shared
+    by every task and fork. After threshold failures the circuit opens and
+    requests fail at once. When reset seconds have passed one process gets
+    to probe the HTTPS port, if the probe connects the circuit closes again.
+    """
+
+    def __init__(self, device, threshold=BREAKER_THRESHOLD, reset=BREAKER_RESET, connect_timeout=CONNECT_TIMEOUT):
+        self.device = device
+        self.threshold = threshold
+        self.reset = reset
+        self.connect_timeout = connect_timeout
+        self.path = os.path.join(HEALTH_DIR, '%s.json' % device.replace('/', '_'))
+
+    def _update(self, change):
+        """Applies change to the state while holding a lock on the file and
+        returns the new state
+        """
+        if not os.path.isdir(HEALTH_DIR):
+            try:
+                os.makedirs(HEALTH_DIR)
+            except OSError:
+                if not os.path.isdir(HEALTH_DIR):
+                    raise
+        with open(self.path, 'a+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            try:
+                state = json.loads(f.read())
+            except ValueError:
+                state = {}
+            state.setdefault('failures', 0)
+            state.setdefault('opened', None)
+            state.setdefault('probe', None)
+            if change(state) is not False:
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(state))
+                f.flush()
+            return state
+
+    def state(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return { 'failures': 0, 'opened': None, 'probe': None }
+
+    def allow(self):
+        """Returns True if a request may be sent to the device"""
+        if not self.threshold:
+            return True
+        state = self.state()
+        if state.get('opened') is None:
+            return True
+
+        now = time.time()
+        def claim_probe(state):
+            if state['opened'] is None:
+                return False
+            if now - state['opened'] < self.reset:
+                return False
+            if state['probe'] and now - state['probe'] < self.reset:
+                return False
+            state['probe'] = now
+
+        state = self._update(claim_probe)
+        if state['opened'] is None:
+            return True
+        if state['probe'] != now:
+            return False
+
+        # Half open, this process probes the device on behalf of everyone
+        try:
+            sock = socket.create_connection(device_address(self.device), self.connect_timeout)
+            sock.close()
+        except (socket.error, socket.timeout):
+            self.failure()
+            return False
+
+        self.success()
+        return True
+
+    def failure(self):
+        def count(state):
+            state['failures'] += 1
+            state['probe'] = None
+            if state['failures'] >= self.threshold:
+                state['opened'] = time.time()
+        if self.threshold:
+            self._update(count)
+
+    def success(self):
+        def close(state):
+            if not state['failures'] and state['opened'] is None:
+                return False
+            state['failures'] = 0
+            state['opened'] = None
+            state['probe'] = None
+        if self.threshold:
+            self._update(close)
+
+
+def is_read_request(method, request, data):
+    """Returns True for requests that don't change the configuration: GETs,
+    show commands, the empty bulk request and the token of
+    probe_capabilities
+    """
+    if method.upper() == 'GET':
+        return True
+    if request == 'cli':
+        return all(command.startswith('show ') for command in data['commands'])
+    return (not request and data == []) or (request or '').startswith('tokenservices')
+
+
+# The DeviceMetrics of each host:port, for the connections to add their timing to
+CONNECTION_METRICS = {}
+
+
+def endpoint_name(method, request):
+    """Returns the method and path of a request with object names replaced,
+    i.e. GET objects/networkobjects/{id}, so timings can be grouped
+    """
+    parts = (request or '').split('?', 1)[0].strip('/').split('/')
+    if parts[0] in ['objects', 'vpn']:
+        parts = parts[:1] + ['{id}' if index % 2 else part for index, part in enumerate(parts[1:])]
+    return ('%s %s' % (method.upper(), '/'.join(parts))).strip()
+
+
+class DeviceMetrics(object):
+    """Request and connection timings of a Device. The modules return them
+    as asa_metrics.
+    """
+
+    def __init__(self, device):
+        self.lock = threading.Lock()
+        self.data = {}
+        self.data['device'] = device
+        self.data['calls'] = 0
+        self.data['time'] = 0.0
+        self.data['endpoints'] = {}
+        self.data['connections'] = 0
+        self.data['connect_time'] = 0.0
+        self.data['handshake_time'] = 0.0
+        self.data['queue_wait'] = 0.0
+        self.data['merged'] = 0
+
+    def connection(self, connect_time, handshake_time):
+        with self.lock:
+            self.data['connections'] += 1
+            self.data['connect_time'] += connect_time
+            self.data['handshake_time'] += handshake_time
+
+    def queued(self, wait, merged):
+        with self.lock:
+            self.data['queue_wait'] += wait
+            self.data['merged'] += merged
+
+    def request(self, method, request, elapsed):
+        with self.lock:
+            self.data['calls'] += 1
+            self.data['time'] += elapsed
+            self.data['endpoints'].setdefault(endpoint_name(method, request), []).append(round(elapsed, 4))
+
+
+if has_requests:
+    class TimedHTTPSConnection(HTTPSConnection):
+        """Adds the time spent on the TCP connection and on the TLS handshake
+        to the DeviceMetrics registered for the host
+        """
+
+        def _new_conn(self):
+            started = time.time()
+            conn = HTTPSConnection._new_conn(self)
+            self.connect_time = time.time() - started
+            return conn
+
+        def connect(self):
+            started = time.time()
+            self.connect_time = 0
+            HTTPSConnection.connect(self)
+            metrics = CONNECTION_METRICS.get('%s:%s' % (self.host, self.port))
+            if metrics is not None:
+                metrics.connection(self.connect_time, time.time() - started - self.connect_time)
+
+    class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = TimedHTTPSConnection
+
+    class TimedAdapter(HTTPAdapter):
+
+        def init_poolmanager(self, *args, **kwargs):
+            HTTPAdapter.init_poolmanager(self, *args, **kwargs)
+            self.poolmanager.pool_classes_by_scheme = dict(self.poolmanager.pool_classes_by_scheme)
+            self.poolmanager.pool_classes_by_scheme['https'] = TimedHTTPSConnectionPool
+
+
+MERGEABLE_COLLECTIONS = ['objects/networkobjectgroups/', 'objects/networkservicegroups/']
+
+
+def mergeable_request(method, request, data):
+    """Returns True for PATCH requests that only add or remove members of a
+    group, which can be merged with others for the same group
+    """
+    if method.upper() != 'PATCH' or not isinstance(data, dict) or not data:
+        return False
+    if not any((request or '').startswith(collection) for collection in MERGEABLE_COLLECTIONS):
+        return False
+    return set(data.keys()) <= set(['members.add', 'members.remove'])
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return sys.exc_info()[1].errno != errno.ESRCH
+    return True
+
+
+def queue_name(device):
+    """Returns the name of the write queue of a device. The address is
+    resolved, so tasks reaching the same firewall by name and by address,
+    i.e. redirected from the standby unit, share the queue.
+    """
+    host, port = device_address(device)
+    try:
+        host = socket.getaddrinfo(host, port)[0][4][0]
+    except socket.error:
+        pass
+    return ('%s_%s' % (host, port)).replace('/', '_').replace(':', '_')
+
+
+class WriteQueue(object):
+    """Serializes the requests changing the configuration of a device across
+    the forks of a play with a lock file per device the requests are sent
+    to. Member changes to a group are spooled before waiting for the lock,
+    the fork getting the lock sends all compatible member changes spooled
+    for the same group in a single request and leaves the result for the
+    other forks. Results no fork picked up are removed once their fork has
+    exited or after QUEUE_RESULT_TTL seconds.
+    """
+
+    def __init__(self, device, metrics=None):
+        self.device = device
+        self.path = None
+        self.metrics = metrics
+        self.counter = 0
+
+    def _write(self, name, data):
+        tmp_path = os.path.join(self.path, '%s.tmp' % name)
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.rename(tmp_path, os.path.join(self.path, name))
+
+    def _read(self, name):
+        try:
+            with open(os.path.join(self.path, name)) as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return None
+
+    def _remove(self, name):
+        try:
+            os.remove(os.path.join(self.path, name))
+        except OSError:
+            pass
+
+    def _expire(self):
+        now = time.time()
+        for spool in os.listdir(self.path):
+            if not spool.endswith('.result') and not spool.endswith('.tmp'):
+                continue
+            path = os.path.join(self.path, spool)
+            try:
+                pid = int(spool.split('-', 1)[0])
+            except ValueError:
+                pid = None
+            try:
+                if (pid is not None and not process_alive(pid)) or now - os.path.getmtime(path) > QUEUE_RESULT_TTL:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def send(self, send, method, request, data):
+        """Sends a request with send(method, request, data) while holding
+        the lock of the device
+        """
+        if self.path is None:
+            self.path = os.path.join(QUEUE_DIR, queue_name(self.device))
+        if not os.path.isdir(self.path):
+            try:
+                os.makedirs(self.path)
+            except OSError:
+                pass
+
+        name = None
+        if mergeable_request(method, request, data):
+            self.counter += 1
+            name = '%s-%s-%s' % (os.getpid(), threading.current_thread().ident, self.counter)
+            self._write('%s.op' % name, { 'request': request, 'data': data })
+
+        started = time.time()
+        with open(os.path.join(self.path, 'lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            waited = time.time() - started
+            try:
+                self._expire()
+                if name is None:
+                    if self.metrics:
+                        self.metrics.queued(waited, 0)
+                    return send(method, request, data)
+
+                # Sent by another fork while this one was waiting
+                result = self._read('%s.result' % name)
+                if result is not None:
+                    self._remove('%s.result' % name)
+                    if self.metrics:
+                        self.metrics.queued(waited, 0)
+                    return OfflineResponse(result['status_code'], result['data'])
+
+                return self._send_merged(send, name, request, data, waited)
+            finally:
+                if name is not None:
+                    self._remove('%s.op' % name)
+
+    def _send_merged(self, send, name, request, data, waited):
+        spooled = [(name, data)]
+        for spool in sorted(os.listdir(self.path)):
+            if not spool.endswith('.op') or spool == '%s.op' % name:
+                continue
+            if not process_alive(int(spool.split('-', 1)[0])):
+                self._remove(spool)
+                continue
+            operation = self._read(spool)
+            if operation and operation['request'] == request:
+                spooled.append((spool[:-len('.op')], operation['data']))
+
+        # Changes adding what another one removes stay queued for their fork
+        members_add = {}
+        members_remove = {}
+        batch = []
+        for spool_name, spool_data in spooled:
+            add = dict((member_key(member), member) for member in spool_data.get('members.add', []))
+            remove = dict((member_key(member), member) for member in spool_data.get('members.remove', []))
+            if set(add) & set(members_remove) or set(remove) & set(members_add):
+                continue
+            members_add.update(add)
+            members_remove.update(remove)
+            batch.append((spool_name, spool_data))
+
+        merged = {}
+        if members_add:
+            merged['members.add'] = [members_add[key] for key in sorted(members_add)]
+        if members_remove:
+            merged['members.remove'] = [members_remove[key] for key in sorted(members_remove)]
+
+        result = send('PATCH', request, merged)
+        results = dict((spool_name, result) for spool_name, spool_data in batch)
+        if result.status_code >= 300 and len(batch) > 1:
+            # One of the changes was refused, find out which
+            for spool_name, spool_data in batch:
+                results[spool_name] = send('PATCH', request, spool_data)
+
+        for spool_name, spool_data in batch[1:]:
+            try:
+                response_data = results[spool_name].json()
+            except ValueError:
+                response_data = None
+            self._write('%s.result' % spool_name, { 'status_code': results[spool_name].status_code, 'data': response_data })
+            self._remove('%s.op' % spool_name)
+
+        if self.metrics:
+            self.metrics.queued(waited, len(batch) - 1)
+        return results[name]
+
+
+def attach_metrics(module, dev):
+    """Makes the module return the metrics of dev as asa_metrics when it
+    exits or fails
+    """
+    def wrap(method):
+        def report(**kwargs):
+            kwargs['asa_metrics'] = dev.metrics.data
+            method(**kwargs)
+        return report
+
+    if isinstance(getattr(dev, 'metrics', None), DeviceMetrics):
+        module.exit_json = wrap(module.exit_json)
+        module.fail_json = wrap(module.fail_json)
+
+
+class Device(ASA):
+    """rasa.ASA with separate connect and read timeouts, where every request
+    goes through a CircuitBreaker for the device. Requests share one
+    keep-alive session, so a module pays for the TLS handshake once instead
+    of on every request.
+    """
+
+    def __init__(self, device=None, username=None, password=None, verify_cert=True,
+                 connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT,
+                 breaker_threshold=BREAKER_THRESHOLD, breaker_reset=BREAKER_RESET):
+        ASA.__init__(self, device=device, username=username, password=password,
+                     verify_cert=verify_cert, timeout=(connect_timeout, read_timeout))
+        self.breaker = CircuitBreaker(device, breaker_threshold, breaker_reset, connect_timeout)
+        self.cassette = os.environ.get(CASSETTE_ENV)
+        self.capabilities = None
+        self.metrics = DeviceMetrics(device)
+        CONNECTION_METRICS['%s:%s' % device_address(device)] = self.metrics
+        self.session = requests.Session()
+        self.session.mount('https://', TimedAdapter())
+        self.write_device = None
+        self.queue = WriteQueue(device, self.metrics)
+
+    def _send(self, method, request, data=False, stream=False):
+        if is_read_request(method, request, data):
+            return self._request(method, request, data, stream)
+        try:
+            return self.queue.send(self._request, method, request, data)
+        finally:
+            # Even a refused or timed out change may have been applied in part
+            forget_facts(self.device)
+            if self.write_device:
+                forget_facts(self.write_device)
+
+    def _request(self, method, request, data=False, stream=False):
+        if not self.breaker.allow():
+            raise CircuitOpenError('Circuit open for %s after repeated connection failures' % self.device)
+
+        device = self.device
+        if self.write_device and not is_read_request(method, request, data):
+            device = self.write_device
+        url = 'https://%s/api' % device
+        if request:
+            url = '%s/%s' % (url, request)
+        kwargs = {}
+        if data is not False:
+            kwargs['data'] = json.dumps(data)
+        started = time.time()
+        try:
+            result = self.session.request(method, url, headers=HEADERS, auth=self.cred, verify=self.verify_cert,
+                                          timeout=self.timeout, stream=stream, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            if device != self.device:
+                # The active unit may have changed, detect it again next time
+                forget_failover_state(self.device)
+            self.breaker.failure()
+            self.metrics.request(method, request, time.time() - started)
+            raise
+
+        self.breaker.success()
+        self.metrics.request(method, request, time.time() - started)
+        if device != self.device and result.status_code >= 300:
+            # After a failover the old active unit still answers, as the
+            # standby it refuses the change
+            forget_failover_state(self.device)
+        if self.cassette:
+            self._record_exchange(started, method, request, data, result)
+        return result
+
+    def redirect_writes(self, device):
+        """Sends the requests changing the configuration to device, i.e. the
+        active unit of a failover pair
+        """
+        self.write_device = device
+        self.queue = WriteQueue(device, self.metrics)
+        CONNECTION_METRICS['%s:%s' % device_address(device)] = self.metrics
+
+    def _record_exchange(self, started, method, request, data, result):
+        # Reading the content here keeps it available to iter_content
+        body = result.content
+        record = {}
+        record['time'] = started
+        record['device'] = self.device
+        record['method'] = method
+        record['request'] = request or ''
+        if data is not False:
+            record['data'] = relative_links(data)
+        record['status_code'] = result.status_code
+        record['content_type'] = result.headers.get('Content-Type')
+        record['body'] = body.decode('utf-8', 'replace')
+        record['headers_time'] = result.elapsed.total_seconds()
+        record['total_time'] = time.time() - started
+        record_exchange(self.cassette, record)
+
+    def _delete(self, request):
+        return self._send('DELETE', request)
+
+    def _get(self, request, stream=False):
+        return self._send('GET', request, stream=stream)
+
+    def _patch(self, request, data):
+        return self._send('PATCH', request, data)
+
+    def _post(self, request, data=False):
+        return self._send('POST', request, data)
+
+    def _put(self, request, data):
+        return self._send('PUT', request, data)
+
+
+def connection_argument_spec(argument_spec, failover=False):
+    """Returns argument_spec with the connection options every module that
+    talks to a device takes, documented in the cisco_asa doc fragment. With
+    failover the failover option of modules that make changes is added.
+    Options in argument_spec replace the shared ones, i.e. another default.
+    """
+    spec = dict(
+        connect_timeout=dict(required=False, type='int', default=CONNECT_TIMEOUT),
+        read_timeout=dict(required=False, type='int', default=READ_TIMEOUT),
+        breaker_threshold=dict(required=False, type='int', default=BREAKER_THRESHOLD),
+        breaker_reset=dict(required=False, type='int', default=BREAKER_RESET))
+    if failover:
+        spec['failover'] = dict(required=False, choices=['ignore', 'redirect', 'skip'], default='redirect')
+    spec.update(argument_spec)
+    return spec
+
+
+def connection_options(module):
+    """Returns the Device keyword arguments from the options of module"""
+    params = module.params
+    options = {}
+    options['verify_cert'] = params['validate_certs'] == 'yes'
+    options['connect_timeout'] = params['connect_timeout']
+    options['read_timeout'] = params['read_timeout']
+    options['breaker_threshold'] = params['breaker_threshold']
+    options['breaker_reset'] = params['breaker_reset']
+    return options
+
+
+def connect_device(module, device_class=None):
+    """Returns a device_class, by default Device, for the host of module.
+    The module returns the metrics of the device as asa_metrics, and modules
+    with the failover option handle a standby unit before anything is sent.
+    """
+    params = module.params
+    if device_class is None:
+        device_class = Device
+    dev = device_class(device=params['host'], username=params['username'], password=params['password'],
+                       **connection_options(module))
+    attach_metrics(module, dev)
+    if 'failover' in params:
+        check_failover(dev, module, params['failover'])
+    return dev
+
+
+######################################################################
+# Requests
+######################################################################
+def get_stream(dev, request):
+    """Sends a GET request without reading the body, use iter_object to
+    decode it.
+    """
+    if isinstance(dev, (Device, OfflineASA)):
+        return dev._get(request, stream=True)
+    url = 'https://%s/api/%s' % (dev.device, request)
+    return requests.get(url, headers=HEADERS, auth=dev.cred, verify=dev.verify_cert, timeout=dev.timeout, stream=True)
+
+
+def bulk_request(dev, module, operations, batch_size=BULK_LIMIT):
+    """Sends operations, a list of (method, request, data) tuples, through
+    the bulk API in batches of batch_size. The operations are executed in
+    order.
+    """
+    if isinstance(dev, (OfflineASA, PlanningDevice)):
+        for method, request, data in operations:
+            dev._record(method, request, data, 200)
+        return
+
+    if isinstance(dev, Device) and not device_capabilities(dev, module, ['bulk'])['bulk']:
+        send_operations(dev, module, operations)
+        return
+
+    url = 'https://%s/api' % dev.device
+    for start in range(0, len(operations), batch_size):
+        batch = []
+        for method, request, data in operations[start:start + batch_size]:
+            operation = {}
+            operation['resourceUri'] = '/api/%s' % request
+            operation['method'] = method
+            if data is not None:
+                operation['data'] = data
+            batch.append(operation)
+
+        try:
+            if isinstance(dev, Device):
+                result = dev._send('POST', None, batch)
+            else:
+                result = requests.post(url, data=json.dumps(batch), headers=HEADERS, auth=dev.cred, verify=dev.verify_cert, timeout=dev.timeout)
+        except requests.exceptions.RequestException:
+            err = sys.exc_info()[1]
+            module.fail_json(msg='Unable to connect to device: %s' % err)
+
+        if result.status_code == 401:
+            module.fail_json(msg='Authentication error')
+        elif result.status_code >= 300:
+            module.fail_json(msg='Bulk request failed - %s' % result.status_code, response=result.text, completed=start)
+
+
+def iter_collection(dev, module, request, limit=None, optional=False):
+    """Yields every item of a paginated collection, i.e. objects/networkobjects.
+    With optional a collection that doesn't exist on the device is treated as
+    empty. Without a limit pages are as large as the device allows.
+    """
+    if limit is None:
+        limit = PAGE_LIMIT
+        if isinstance(dev, Device):
+            limit = max(device_capabilities(dev, module, ['page_limit'])['page_limit'] or PAGE_LIMIT, PAGE_LIMIT)
+
+    offset = 0
+    while True:
+        page = '%s?offset=%d&limit=%d' % (request, offset, limit)
+        try:
+            response = get_stream(dev, page)
+        except requests.exceptions.RequestException:
+            err = sys.exc_info()[1]
+            module.fail_json(msg='Unable to connect to device: %s' % err)
+
+        if response.status_code == 401:
+            module.fail_json(msg='Authentication error')
+        elif response.status_code == 404 and optional:
+            return
+        elif response.status_code != 200:
+            module.fail_json(msg='Unable to read %s - %s' % (request, response.status_code))
+
+        count = 0
+        total = None
+        try:
+            for key, value in iter_object(iter_content(response), 'items'):
+                if key == 'items':
+                    count += 1
+                    yield value
+                elif key == 'rangeInfo':
+                    total = value.get('total')
+        except ValueError:
+            err = sys.exc_info()[1]
+            module.fail_json(msg='Unable to decode %s: %s' % (request, err))
+        except requests.exceptions.RequestException:
+            err = sys.exc_info()[1]
+            module.fail_json(msg='Unable to connect to device: %s' % err)
+
+        offset += count
+        if count == 0:
+            return
+        if total is None and count < limit:
+            return
+        if total is not None and offset >= total:
+            return
+
+
+def send_operations(dev, module, operations):
+    """Sends (method, request, data) operations one request at a time, for
+    devices without the bulk API
+    """
+    for completed, (method, request, data) in enumerate(operations):
+        try:
+            result = dev._send(method.upper(), request, data if data is not None else False)
+        except requests.exceptions.RequestException:
+            err = sys.exc_info()[1]
+            module.fail_json(msg='Unable to connect to device: %s' % err, completed=completed)
+
+        if result.status_code == 401:
+            module.fail_json(msg='Authentication error')
+        elif result.status_code >= 300:
+            module.fail_json(msg='Request failed %s %s - %s' % (method, request, result.status_code), response=result.text, completed=completed)
+
+
+def get_checksum(dev, module):
+    """Returns the checksum of the running configuration, a cheap way to
+    tell if anything has changed since it was last read
+    """
+    try:
+        result = dev._post('cli', { 'commands': ['show checksum'] })
+    except:
+        err = sys.exc_info()[1]
+        module.fail_json(msg='Unable to connect to device: %s' % err)
+
+    if result.status_code == 401:
+        module.fail_json(msg='Authentication error')
+    elif result.status_code != 200:
+        module.fail_json(msg='Unable to read checksum - %s' % result.status_code)
+
+    output = result.json()['response'][0]
+    return output.split(':', 1)[-1].replace(' ', '').strip()
+
+
+def hash_object(events):
+    """Returns a hash of an object from the (key, value) pairs of
+    iter_object, fields that don't describe the configuration are skipped
+    """
+    digest = hashlib.sha1()
+    for key, value in events:
+        if key in VOLATILE_FIELDS:
+            continue
+        digest.update(json.dumps([key, value], sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def response_hash(module, request, response):
+    """Returns the hash of the object in a streamed response to a GET of
+    request, or None if the object doesn't exist
+    """
+    if response.status_code == 200:
+        try:
+            return hash_object(iter_object(iter_content(response), 'members'))
+        except ValueError:
+            err = sys.exc_info()[1]
+            module.fail_json(msg='Unable to decode %s: %s' % (request, err))
+    elif response.status_code == 404:
+        return None
+    elif response.status_code == 401:
+        module.fail_json(msg='Authentication error')
+    else:
+        module.fail_json(msg='Unable to read %s - %s' % (request, response.status_code))
+
+
+######################################################################
+# Device capabilities
+######################################################################
+def probe_version(dev, module):
+    """The ASA version, the CLI endpoint and the REST agent version, which
+    is in show version
+    """
+    capabilities = {}
+
+    try:
+        result = dev._get('monitoring/device/components/version')
+    except:
+        err = sys.exc_info()[1]
+        module.fail_json(msg='Unable to connect to device: %s' % err)
+    if result.status_code == 401:
+        module.fail_json(msg='Authentication error')
+    version = {}
+    if result.status_code == 200:
+        version = result.json()
+    capabilities['asa_version'] = version.get('asaVersion')
+
+    capabilities['cli'] = False
+    capabilities['rest_agent_version'] = None
+    try:
+        result = dev._post('cli', { 'commands': ['show version'] })
+    except:
+        err = sys.exc_info()[1]
+        module.fail_json(msg='Unable to connect to device: %s' % err)
+    if result.status_code == 200:
+        capabilities['cli'] = True
+        output = (result.json().get('response') or [''])[0]
+        match = re.search(r'REST API Agent[^\n\d]*(\d[\w.()-]*)', output, re.I)
+        if match:
+            capabilities['rest_agent_version'] = match.group(1)
+
+    return capabilities
+
+
+def probe_page_limit(dev, module):
+    """Asks for a large page and sees how many items the device allows"""
+    capabilities = {}
+    capabilities['pagination'] = False
+    capabilities['page_limit'] = None
+    try:
+        result = dev._get('objects/networkobjects?offset=0&limit=1000')
+    except:
+        err = sys.exc_info()[1]
+        module.fail_json(msg='Unable to connect to device: %s' % err)
+    if result.status_code == 200:
+        range_info = result.json().get('rangeInfo')
+        if range_info:
+            capabilities['pagination'] = True
+            capabilities['page_limit'] = range_info.get('limit')
+
+    return capabilities
+
+
+def probe_bulk(dev, module):
+    """Sends an empty bulk request"""
+    try:
+        result = dev._post('', [])
+    except:
+        err = sys.exc_info()[1]
+        module.fail_json(msg='Unable to connect to device: %s' % err)
+    return { 'bulk': result.status_code not in [404, 405] }
+
+
+def probe_token_auth(dev, module):
+    """Asks for a token and releases it again"""
+    capabilities = {}
+    capabilities['token_auth'] = False
+    try:
+        result = dev._post('tokenservices')
+        token = result.headers.get('X-Auth-Token')
+        if result.status_code in [200, 204] and token:
+            capabilities['token_auth'] = True
+            dev._delete('tokenservices/%s' % token)
+    except:
+        err = sys.exc_info()[1]
+        module.fail_json(msg='Unable to connect to device: %s' % err)
+
+    return capabilities
+
+
+# The probe for each capability. Only the ones a module needs are probed,
+# so modules that only read never send the bulk and token requests.
+CAPABILITY_PROBES = {
+    'asa_version': probe_version,
+    'cli': probe_version,
+    'rest_agent_version': probe_version,
+    'pagination': probe_page_limit,
+    'page_limit': probe_page_limit,
+    'bulk': probe_bulk,
+    'token_auth': probe_token_auth
+}
+
+
+def probe_capabilities(dev, module, names=None):
+    """Asks the device which of the API features in names, by default all
+    of them, it supports. Only read-only requests are sent, an empty bulk
+    request and a token that is released again.
+    """
+    if names is None:
+        names = sorted(CAPABILITY_PROBES)
+    capabilities = {}
+    for name in names:
+        if name not in capabilities:
+            capabilities.update(CAPABILITY_PROBES[name](dev, module))
+    return capabilities
+
+
+capabilities_lock = threading.Lock()
+
+
+def device_capabilities(dev, module, names=None, refresh=False):
+    """Returns the capabilities of the device, at least the ones in names,
+    by default all of them. Capabilities are probed when first needed and
+    cached per device for CAPABILITIES_TTL seconds, refresh probes again.
+    """
+    if names is None:
+        names = sorted(CAPABILITY_PROBES)
+
+    with capabilities_lock:
+        if dev.capabilities is not None and not refresh and not [name for name in names if name not in dev.capabilities]:
+            return dev.capabilities
+
+        path = os.path.join(CAPABILITIES_DIR, '%s.json' % dev.device.replace('/', '_'))
+        cached = None
+        if not refresh:
+            try:
+                with open(path) as f:
+                    cached = json.load(f)
+            except (IOError, ValueError):
+                pass
+
+        if not cached or time.time() - cached['time'] >= CAPABILITIES_TTL:
+            cached = { 'time': time.time(), 'capabilities': {} }
+
+        capabilities = cached['capabilities']
+        missing = [name for name in names if name not in capabilities]
+        if missing:
+            capabilities.update(probe_capabilities(dev, module, missing))
+            if not os.path.isdir(CAPABILITIES_DIR):
+                os.makedirs(CAPABILITIES_DIR)
+            tmp_path = '%s.%s.tmp' % (path, os.getpid())
+            with open(tmp_path, 'w') as f:
+                json.dump(cached, f)
+            os.rename(tmp_path, path)
+
+        dev.capabilities = capabilities
+        return capabilities
+
+
+######################################################################
+# Failover
+######################################################################
+def parse_failover(output, address):
+    """Returns the failover role of the unit from the output of show
+    failover, and the address of the active unit on the interface the unit
+    was reached on when it is known
+    """
+    if not re.search(r'^\s*Failover On', output, re.M):
+        return { 'role': 'standalone', 'active': None }
+
+    units = {}
+    unit = None
+    for line in output.splitlines():
+        match = re.match(r'\s*(This|Other) host:\s*\S+\s*-\s*(.+?)\s*$', line)
+        if match:
+            unit = match.group(1).lower()
+            units[unit] = { 'state': match.group(2).lower(), 'interfaces': {} }
+            continue
+        match = re.match(r'\s*Interface (\S+) \(([0-9a-fA-F.:]+)\)', line)
+        if match and unit:
+            units[unit]['interfaces'][match.group(1)] = match.group(2)
+
+    this = units.get('this', { 'state': 'unknown', 'interfaces': {} })
+    other = units.get('other', { 'state': 'unknown', 'interfaces': {} })
+    if 'standby' in this['state']:
+        role = 'standby'
+    elif 'active' in this['state']:
+        role = 'active'
+    else:
+        role = this['state']
+
+    active = None
+    if role != 'active' and 'active' in other['state'] and 'standby' not in other['state']:
+        interfaces = [name for name in this['interfaces'] if this['interfaces'][name] == address]
+        for name in interfaces + ['management']:
+            if name in other['interfaces']:
+                active = other['interfaces'][name]
+                break
+
+    return { 'role': role, 'active': active }
+
+
+def failover_path(device):
+    return os.path.join(FAILOVER_DIR, '%s.json' % device.replace('/', '_'))
+
+
+def forget_failover_state(device):
+    try:
+        os.remove(failover_path(device))
+    except OSError:
+        pass
+
+
+def failover_state(dev, module):
+    """Returns the failover role of the device and the address of the active
+    unit, read with show failover once and cached for FAILOVER_TTL seconds
+    """
+    path = failover_path(dev.device)
+    try:
+        with open(path) as f:
+            cached = json.load(f)
+        if time.time() - cached['time'] < FAILOVER_TTL:
+            return cached['failover']
+    except (IOError, ValueError, KeyError):
+        pass
+
+    try:
+        result = dev._post('cli', { 'commands': ['show failover'] })
+    except:
+        err = sys.exc_info()[1]
+        module.fail_json(msg='Unable to connect to device: %s' % err)
+
+    if result.status_code == 401:
+        module.fail_json(msg='Authentication error')
+    elif result.status_code != 200:
+        return { 'role': 'unknown', 'active': None }
+
+    host, port = device_address(dev.device)
+    try:
+        address = socket.getaddrinfo(host, port)[0][4][0]
+    except socket.error:
+        address = host
+    state = parse_failover((result.json().get('response') or [''])[0], address)
+    if state['active'] and ':' in state['active']:
+        state['active'] = '[%s]' % state['active']
+    if state['active'] and port != 443:
+        state['active'] = '%s:%s' % (state['active'], port)
+
+    if not os.path.isdir(FAILOVER_DIR):
+        os.makedirs(FAILOVER_DIR)
+    tmp_path = '%s.%s.tmp' % (path, os.getpid())
+    with open(tmp_path, 'w') as f:
+        json.dump({ 'time': time.time(), 'failover': state }, f)
+    os.rename(tmp_path, path)
+
+    return state
+
+
+def check_failover(dev, module, mode):
+    """Handles a device that is the standby unit of a failover pair. With
+    redirect the changes are sent to the active unit instead, with skip the
+    module exits without changing anything.
+    """
+    if mode == 'ignore' or not isinstance(dev, Device):
+        return
+
+    state = failover_state(dev, module)
+    if state['role'] != 'standby':
+        return
+
+    if mode == 'skip':
+        module.exit_json(changed=False, skipped=True, failover=state,
+                         msg='%s is the standby unit of a failover pair, skipped' % dev.device)
+    if not state['active']:
+        module.fail_json(msg='%s is the standby unit of a failover pair and the address of the active unit is unknown' % dev.device,
+                         failover=state)
+    dev.redirect_writes(state['active'])
+
+
+######################################################################
+# Cached facts
+######################################################################
+def facts_path(device, extension='json'):
+    return os.path.join(FACTS_DIR, '%s.%s' % (device.replace('/', '_'), extension))
+
+
+def forget_facts(device):
+    """Marks the facts cisco_asa_facts cached for device as outdated, called
+    when the configuration of the device is changed. A mark is kept instead
+    of removing the cache, so facts still being gathered while the change is
+    made aren't cached as current either.
+    """
+    try:
+        if not os.path.isdir(FACTS_DIR):
+            os.makedirs(FACTS_DIR)
+        with open(facts_path(device, 'changed'), 'w') as f:
+            f.write('%f' % time.time())
+    except (IOError, OSError):
+        pass
+
+
+def facts_changed(device):
+    """Returns when the configuration of device was last changed by one of
+    the modules, 0 if it's unknown
+    """
+    try:
+        with open(facts_path(device, 'changed')) as f:
+            return float(f.read())
+    except (IOError, ValueError):
+        return 0
+
+
+######################################################################
+# References between objects
+######################################################################
+REFERENCE_KINDS = [
+    'objectRef#NetworkObj',
+    'objectRef#NetworkObjGroup',
+    'objectRef#TcpUdpServiceObj',
+    'objectRef#NetworkServiceGroup'
+]
+
+ACE_REFERENCE_FIELDS = [
+    'sourceAddress',
+    'destinationAddress',
+    'sourceService',
+    'destinationService'
+]
+
+
+def build_reference_index(dev, module, acls=True):
+    """Walks the network and service object-groups, and the access-lists if
+    acls is set, once and returns a dict mapping each referenced object name
+    to a list of (type, name, detail) tuples describing what references it.
+    """
+    index = defaultdict(list)
+    groups = itertools.chain(
+        iter_collection(dev, module, 'objects/networkobjectgroups'),
+        iter_collection(dev, module, 'objects/networkservicegroups', optional=True))
+    for group in groups:
+        for member in group.get('members', []):
+            if member.get('kind') in REFERENCE_KINDS:
+                index[member['objectId']].append(('object-group', group['name'], None))
+
+    if acls:
+        acl_names = [acl['name'] for acl in iter_collection(dev, module, 'objects/extendedacls', optional=True)]
+        for acl_name in acl_names:
+            for ace in iter_collection(dev, module, 'objects/extendedacls/%s/aces' % acl_name, optional=True):
+                for field in ACE_REFERENCE_FIELDS:
+                    ref = ace.get(field) or {}
+                    if ref.get('kind') in REFERENCE_KINDS:
+                        line = ace.get('position', ace.get('objectId'))
+                        index[ref['objectId']].append(('access-list', acl_name, line))
+
+    return index
+
+
+GROUP_REFERENCE_KINDS = [
+    'objectRef#NetworkObjGroup',
+    'objectRef#NetworkServiceGroup'
+]
+
+
+class ExpansionEstimator(object):
+    """Predicts how many expanded ACEs an object-group edit adds. An ACE that
+    references object-groups is expanded by the ASA into one rule for every
+    combination of the flattened source and destination members and the
+    flattened members of its service groups. The flattened size of each
+    group is memoized, so an estimate walks every group and ACE at most once.
+    """
+
+    def __init__(self):
+        self.children = defaultdict(list)
+        self.leaves = defaultdict(int)
+        self.parents = defaultdict(set)
+        self.aces = []
+
+    @classmethod
+    def from_device(cls, dev, module):
+        estimator = cls()
+        groups = itertools.chain(
+            iter_collection(dev, module, 'objects/networkobjectgroups'),
+            iter_collection(dev, module, 'objects/networkservicegroups', optional=True))
+        for group in groups:
+            estimator.add_group(group['name'], group.get('members', []))
+
+        acl_names = [acl['name'] for acl in iter_collection(dev, module, 'objects/extendedacls', optional=True)]
+        for acl_name in acl_names:
+            for ace in iter_collection(dev, module, 'objects/extendedacls/%s/aces' % acl_name, optional=True):
+                estimator.add_ace(acl_name, ace)
+
+        return estimator
+
+    def add_group(self, name, members):
+        self.leaves[name] = 0
+        for member in members:
+            if member.get('kind') in GROUP_REFERENCE_KINDS:
+                self.children[name].append(member['objectId'])
+                self.parents[member['objectId']].add(name)
+            else:
+                self.leaves[name] += 1
+
+    def add_ace(self, acl_name, ace):
+        groups = []
+        for field in ACE_REFERENCE_FIELDS:
+            ref = ace.get(field) or {}
+            if ref.get('kind') in GROUP_REFERENCE_KINDS:
+                groups.append(ref['objectId'])
+        if groups:
+            self.aces.append((acl_name, groups))
+
+    def size(self, name, memo, edit=None):
+        """Returns the number of members of a group once nested groups are
+        flattened, with edit, a (group, leaf delta, added children, removed
+        children) tuple, applied. A group nested in itself is counted once.
+        """
+        return self._size(name, memo, edit, set())[0]
+
+    def _size(self, name, memo, edit, visiting):
+        if name in memo:
+            return memo[name], set()
+        if name in visiting:
+            return 0, set([name])
+        visiting.add(name)
+
+        leaves = self.leaves[name]
+        children = list(self.children[name])
+        if edit and edit[0] == name:
+            leaves += edit[1]
+            children += edit[2]
+            for child in edit[3]:
+                if child in children:
+                    children.remove(child)
+
+        total = max(leaves, 0)
+        cut = set()
+        for child in children:
+            child_size, child_cut = self._size(child, memo, edit, visiting)
+            total += child_size
+            cut |= child_cut
+        visiting.discard(name)
+
+        # Inside a cycle the size depends on where the walk entered it, so
+        # groups on a cycle aren't memoized. Their parents are, the cycle is
+        # complete once the walk returns to the group it entered it through.
+        if not cut:
+            memo[name] = total
+        cut.discard(name)
+        return total, cut
+
+    def expansion(self, groups, memo, edit=None):
+        total = 1
+        for name in groups:
+            total *= self.size(name, memo, edit)
+        return total
+
+    def ancestors(self, name):
+        found = set([name])
+        pending = [name]
+        while pending:
+            for parent in self.parents[pending.pop()]:
+                if parent not in found:
+                    found.add(parent)
+                    pending.append(parent)
+        return found
+
+    def estimate(self, group, members_add, members_remove):
+        """Returns the number of expanded ACEs the edit adds in total and per
+        access-list, negative when the edit shrinks the expansion
+        """
+        leaf_delta = 0
+        added = []
+        removed = []
+        for member in members_add:
+            if member.get('kind') in GROUP_REFERENCE_KINDS:
+                added.append(member['objectId'])
+            else:
+                leaf_delta += 1
+        for member in members_remove:
+            if member.get('kind') in GROUP_REFERENCE_KINDS:
+                removed.append(member['objectId'])
+            else:
+                leaf_delta -= 1
+        edit = (group, leaf_delta, added, removed)
+
+        affected = self.ancestors(group)
+        before = {}
+        after = {}
+        total = 0
+        access_lists = defaultdict(int)
+        for acl_name, groups in self.aces:
+            if affected.isdisjoint(groups):
+                continue
+            delta = self.expansion(groups, after, edit) - self.expansion(groups, before)
+            total += delta
+            access_lists[acl_name] += delta
+
+        return total, dict(access_lists)
+
+
+def format_reference(reference):
+    ref_type, name, detail = reference
+    if detail is None:
+        return '%s %s' % (ref_type, name)
+    return '%s %s line %s' % (ref_type, name, detail)
+
+
+def safe_delete_order(names, index):
+    """Returns the names that can be deleted, ordered so that an object-group
+    is always removed before the objects it references, and a dict of the
+    names that are blocked with the references blocking them.
+    """
+    deleting = set(names)
+    blocked = {}
+
+    # A name is blocked by references from anything that stays on the
+    # device, which includes the groups that are blocked themselves.
+    changed = True
+    while changed:
+        changed = False
+        for name in names:
+            if name in blocked:
+                continue
+            blocking = []
+            for reference in index.get(name, []):
+                ref_type, ref_name, detail = reference
+                if ref_type != 'object-group' or ref_name not in deleting or ref_name in blocked:
+                    blocking.append(format_reference(reference))
+            if blocking:
+                blocked[name] = blocking
+                changed = True
+
+    order = []
+    done = set()
+    remaining = [name for name in names if name not in blocked]
+    while remaining:
+        ready = []
+        for name in remaining:
+            referrers = [ref_name for ref_type, ref_name, detail in index.get(name, [])]
+            if all(ref_name in done for ref_name in referrers):
+                ready.append(name)
+        if not ready:
+            # Circular references, can't be resolved by ordering
+            for name in remaining:
+                blocked[name] = ['object-group %s' % ref_name for ref_type, ref_name, detail in index.get(name, []) if ref_name not in done]
+            break
+        for name in ready:
+            order.append(name)
+            done.add(name)
+        remaining = [name for name in remaining if name not in done]
+
+    return order, blocked
+
+
+######################################################################
+# Offline planning from a saved running-config
+######################################################################
+COLLECTIONS = {
+    'objects/networkobjects': 'object#NetworkObj',
+    'objects/networkobjectgroups': 'object#NetworkObjGroup',
+    'objects/networkservices': 'object#NetworkServiceObj',
+    'vpn/ikev1policy': 'object#ikev1policy'
+}
+
+IKEV1_DEFAULTS = {
+    'authentication': 'rsa-sig',
+    'encryption': '3des',
+    'hash': 'sha',
+    'dhgroup': 2,
+    'lifetimeInSecs': 86400
+}
+
+
+def netmask_to_prefix(netmask):
+    return sum([bin(int(octet)).count('1') for octet in netmask.split('.')])
+
+
+def address_value(words):
+    """Converts the address part of a config line to a (kind, value) tuple"""
+    if words[0] == 'host':
+        if ':' in words[1]:
+            return 'IPv6Address', words[1]
+        return 'IPv4Address', words[1]
+    if '/' in words[0]:
+        return 'IPv6Network', words[0]
+    return 'IPv4Network', '%s/%s' % (words[0], netmask_to_prefix(words[1]))
+
+
+def parse_network_object(host, obj, words):
+    if words[0] in ['host', 'subnet']:
+        if words[0] == 'subnet':
+            words = words[1:]
+        kind, value = address_value(words)
+        obj['host'] = { 'kind': kind, 'value': value }
+    elif words[0] == 'range':
+        kind = 'IPv6Range' if ':' in words[1] else 'IPv4Range'
+        obj['host'] = { 'kind': kind, 'value': '%s-%s' % (words[1], words[2]) }
+    elif words[0] == 'fqdn':
+        kind = 'IPv6FQDN' if words[1] == 'v6' else 'IPv4FQDN'
+        obj['host'] = { 'kind': kind, 'value': words[-1] }
+
+
+def parse_network_group(host, obj, words):
+    if words[0] == 'network-object':
+        if words[1] == 'object':
+            member = {
+                'kind': 'objectRef#NetworkObj',
+                'objectId': words[2],
+                'refLink': 'https://%s/api/objects/networkobjects/%s' % (host, words[2])
+            }
+        else:
+            kind, value = address_value(words[1:])
+            member = { 'kind': kind, 'value': value }
+        obj['members'].append(member)
+    elif words[0] == 'group-object':
+        obj['members'].append({
+            'kind': 'objectRef#NetworkObjGroup',
+            'objectId': words[1],
+            'refLink': 'https://%s/api/objects/networkobjectgroups/%s' % (host, words[1])
+        })
+
+
+def parse_service_object(host, obj, words):
+    """Parses the service line of a service object. The REST value of a tcp
+    or udp service only holds destination ports, so lt and gt are turned
+    into port ranges and services with source ports or neq raise ValueError.
+    """
+    if words[0] != 'service':
+        return
+    protocol = words[1]
+    if 'source' in words:
+        raise ValueError('Source ports of service objects are not supported: %s' % ' '.join(words))
+    if 'destination' in words:
+        position = words.index('destination')
+        operator = words[position + 1]
+        if operator == 'eq':
+            port = words[position + 2]
+        elif operator == 'range':
+            port = '%s-%s' % (words[position + 2], words[position + 3])
+        elif operator in ['lt', 'gt']:
+            start, end = port_interval(protocol, '%s %s' % (operator, words[position + 2]))
+            port = '%s-%s' % (start, end)
+        else:
+            raise ValueError('Port operator %s is not supported: %s' % (operator, ' '.join(words)))
+        obj['kind'] = 'object#TcpUdpServiceObj'
+        obj['value'] = '%s/%s' % (protocol, port)
+    elif protocol in ['icmp', 'icmp6']:
+        obj['kind'] = 'object#ICMPServiceObj' if protocol == 'icmp' else 'object#ICMP6ServiceObj'
+        obj['value'] = '/'.join(words[1:])
+    else:
+        obj['kind'] = 'object#NetworkProtocolObj'
+        obj['value'] = protocol
+
+
+def parse_ikev1_policy(host, obj, words):
+    if words[0] in ['authentication', 'encryption', 'hash']:
+        obj[words[0]] = words[1]
+    elif words[0] == 'group':
+        obj['dhgroup'] = int(words[1])
+    elif words[0] == 'lifetime':
+        obj['lifetimeInSecs'] = int(words[1])
+
+
+def start_object(host, words):
+    """Returns (collection, object, line parser) for a config line starting
+    an object, or None if the line isn't one
+    """
+    if words[:2] == ['object', 'network'] and len(words) == 3:
+        obj = { 'kind': 'object#NetworkObj', 'name': words[2], 'objectId': words[2] }
+        return 'objects/networkobjects', obj, parse_network_object
+    if words[:2] == ['object', 'service'] and len(words) == 3:
+        obj = { 'name': words[2], 'objectId': words[2] }
+        return 'objects/networkservices', obj, parse_service_object
+    if words[:2] == ['object-group', 'network'] and len(words) == 3:
+        obj = { 'kind': 'object#NetworkObjGroup', 'name': words[2], 'objectId': words[2], 'members': [] }
+        return 'objects/networkobjectgroups', obj, parse_network_group
+    if words[:3] == ['crypto', 'ikev1', 'policy'] and len(words) == 4:
+        obj = dict(IKEV1_DEFAULTS)
+        obj['kind'] = 'object#ikev1policy'
+        obj['priority'] = int(words[3])
+        obj['objectId'] = words[3]
+        obj['selfLink'] = 'https://%s/api/vpn/ikev1policy/%s' % (host, words[3])
+        return 'vpn/ikev1policy', obj, parse_ikev1_policy
+    return None
+
+
+def parse_running_config(lines, host):
+    """Reads the output of 'show running-config' line by line and yields
+    (collection, object) tuples, with the objects in the same format as the
+    REST API returns them. Objects that appear more than once, like network
+    objects with a nat statement, are yielded once for every block. Raises
+    ValueError for lines that can't be represented as the REST API would.
+    """
+    current = None
+    for line_num, line in enumerate(lines, 1):
+        line = line.rstrip('\r\n')
+        if not line or line.startswith('!') or line.startswith(':'):
+            continue
+        if line.startswith(' '):
+            if current is None:
+                continue
+            words = line.split()
+            if words[0] == 'description':
+                current[1]['description'] = line.strip()[len('description '):]
+            else:
+                try:
+                    current[2](host, current[1], words)
+                except ValueError:
+                    raise ValueError('Line %s of the running-config, %s: %s' % (line_num, current[1]['objectId'], sys.exc_info()[1]))
+            continue
+
+        if current is not None:
+            yield current[0], current[1]
+        current = start_object(host, line.split())
+
+    if current is not None:
+        yield current[0], current[1]
+
+
+class OfflineResponse(object):
+
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self.data = data
+        self.text = json.dumps(data) if data is not None else ''
+
+    def json(self):
+        return self.data
+
+    def iter_content(self, chunk_size):
+        raw = self.text.encode('utf-8')
+        for start in range(0, len(raw), chunk_size):
+            yield raw[start:start + chunk_size]
+
+
+class OfflineASA(object):
+    """Stands in for rasa.ASA and answers from a saved running-config. Reads
+    are served from the parsed config and writes are recorded in plan instead
+    of being sent, so the modules can decide what to change without a device.
+    It doesn't need rasa, the object calls the modules use are below.
+    """
+
+    def __init__(self, device, running_config):
+        self.device = device
+        self.running_config = running_config
+        self.plan = []
+        self.objects = None
+
+    def _load(self):
+        self.objects = dict((collection, {}) for collection in COLLECTIONS)
+        with open(self.running_config) as f:
+            for collection, obj in parse_running_config(f, self.device):
+                existing = self.objects[collection].get(obj['objectId'])
+                if existing is None:
+                    self.objects[collection][obj['objectId']] = obj
+                elif obj.get('members'):
+                    existing['members'].extend(obj['members'])
+                else:
+                    for key in obj:
+                        existing.setdefault(key, obj[key])
+
+    def _get(self, request, stream=False):
+        if self.objects is None:
+            self._load()
+
+        path, query = (request.split('?', 1) + [''])[:2]
+        if path in self.objects:
+            params = dict(param.split('=', 1) for param in query.split('&') if '=' in param)
+            offset = int(params.get('offset', 0))
+            limit = int(params.get('limit', PAGE_LIMIT))
+            names = sorted(self.objects[path])
+            data = {}
+            data['kind'] = 'collection#%s' % COLLECTIONS[path].split('#')[1]
+            data['rangeInfo'] = { 'offset': offset, 'limit': limit, 'total': len(names) }
+            data['items'] = [self.objects[path][name] for name in names[offset:offset + limit]]
+            return OfflineResponse(200, data)
+
+        collection, name = path.rsplit('/', 1)
+        if name in self.objects.get(collection, {}):
+            return OfflineResponse(200, self.objects[collection][name])
+
+        return OfflineResponse(404)
+
+    def _record(self, method, request, data, status_code):
+        operation = {}
+        operation['method'] = method
+        operation['request'] = request
+        if data is not None:
+            operation['data'] = data
+        self.plan.append(operation)
+        return OfflineResponse(status_code)
+
+    def _checksum(self):
+        digest = hashlib.md5()
+        with open(self.running_config, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _delete(self, request):
+        return self._record('Delete', request, None, 204)
+
+    def _patch(self, request, data):
+        return self._record('Patch', request, data, 204)
+
+    def _post(self, request, data=False):
+        if request == 'cli' and data['commands'] == ['show checksum']:
+            return OfflineResponse(200, { 'response': ['Cryptochecksum: %s\n' % self._checksum()] })
+        if request in ['cli', 'commands/writemem']:
+            self._record('Post', request, data or None, 200)
+            return OfflineResponse(200, { 'response': [] })
+        return self._record('Post', request, data or None, 201)
+
+    def _put(self, request, data):
+        return self._record('Put', request, data, 204)
+
+    def create_networkobject(self, data):
+        return self._post('objects/networkobjects', data)
+
+    def delete_networkobject(self, net_object):
+        return self._delete('objects/networkobjects/' + net_object)
+
+    def get_networkobject(self, net_object):
+        return self._get('objects/networkobjects/' + net_object)
+
+    def update_networkobject(self, name, data):
+        return self._put('objects/networkobjects/' + name, data)
+
+    def add_member_networkobjectgroup(self, net_object, member_data):
+        return self._patch('objects/networkobjectgroups/' + net_object, { 'members.add': member_data })
+
+    def create_networkobjectgroup(self, data):
+        return self._post('objects/networkobjectgroups', data)
+
+    def delete_networkobjectgroup(self, net_object):
+        return self._delete('objects/networkobjectgroups/' + net_object)
+
+    def get_networkobjectgroup(self, net_object):
+        return self._get('objects/networkobjectgroups/' + net_object)
+
+    def remove_member_networkobjectgroup(self, net_object, member_data):
+        return self._patch('objects/networkobjectgroups/' + net_object, { 'members.remove': member_data })
+
+    def update_networkobjectgroup(self, net_object, data):
+        return self._patch('objects/networkobjectgroups/' + net_object, data)
+
+    def create_serviceobject(self, data):
+        return self._post('objects/networkservices', data)
+
+    def delete_serviceobject(self, svc_object):
+        return self._delete('objects/networkservices/' + svc_object)
+
+    def get_serviceobject(self, svc_object):
+        return self._get('objects/networkservices/' + svc_object)
+
+    def update_serviceobject(self, name, data):
+        return self._patch('objects/networkservices/' + name, data)
+
+    def create_ikev1_policy(self, data):
+        return self._post('vpn/ikev1policy', data)
+
+    def delete_ikev1_policy(self, policy):
+        return self._delete('vpn/ikev1policy/' + policy)
+
+    def get_ikev1_policy(self, policy):
+        return self._get('vpn/ikev1policy/' + policy)
+
+    def update_ikev1_policy(self, policy, data):
+        return self._patch('vpn/ikev1policy/' + policy, data)
+
+    def write_mem(self):
+        return self._post('commands/writemem')
+
+
+######################################################################
+# Stored change plans
+######################################################################
+class PlanningDevice(Device):
+    """Device that reads from the device but records writes in plan like
+    OfflineASA, save_plan stores them to be executed later by
+    cisco_asa_apply_plan. Call load_plan before reading, so the plan can
+    tell if the configuration changed since and so reads of single objects
+    see the changes already planned by other tasks.
+    """
+
+    def __init__(self, *args, **kwargs):
+        Device.__init__(self, *args, **kwargs)
+        self.plan = []
+        self.pending = []
+        self.checksum = None
+        self.task = None
+
+    def _send(self, method, request, data=False, stream=False):
+        if method == 'GET':
+            return self._get_planned(request, stream)
+        if is_read_request(method, request, data):
+            return Device._send(self, method, request, data, stream)
+        if request in ['cli', 'commands/writemem']:
+            return self._record(method.capitalize(), request, data, 200)
+        if method == 'POST':
+            return self._record('Post', request, data, 201)
+        return self._record(method.capitalize(), request, data, 204)
+
+    def _get_planned(self, request, stream):
+        """Reads an object as it will be once the planned operations are
+        applied. Collections are read from the device as they are.
+        """
+        operations = [operation for operation in self.pending + self.plan if operation_object(operation) == request]
+        if not operations:
+            return Device._send(self, 'GET', request, False, stream)
+
+        response = Device._send(self, 'GET', request)
+        if response.status_code == 200:
+            data = response.json()
+        elif response.status_code == 404:
+            data = None
+        else:
+            return response
+
+        for operation in operations:
+            data = apply_operation(data, operation)
+        if data is None:
+            return OfflineResponse(404)
+        return OfflineResponse(200, data)
+
+    def _record(self, method, request, data, status_code):
+        operation = {}
+        operation['method'] = method
+        operation['request'] = request
+        if data is not None and data is not False:
+            operation['data'] = data
+        self.plan.append(operation)
+        return OfflineResponse(status_code)
+
+
+def operation_object(operation):
+    """Returns the request of the object a planned operation changes, or None
+    for commands
+    """
+    request = operation['request']
+    if request in ['cli', 'commands/writemem']:
+        return None
+    if operation['method'] == 'Post':
+        data = operation.get('data') or {}
+        name = data.get('objectId', data.get('name'))
+        if name is None:
+            return None
+        return '%s/%s' % (request, name)
+    return request
+
+
+def apply_operation(data, operation):
+    """Returns an object as it is after a planned operation, None when it
+    doesn't exist
+    """
+    method = operation['method']
+    if method == 'Delete':
+        return None
+    if method in ['Post', 'Put']:
+        return dict(operation['data'])
+    if data is None:
+        return None
+
+    data = dict(data)
+    for key, value in operation['data'].items():
+        if key == 'members.add':
+            data['members'] = list(data.get('members', [])) + value
+        elif key == 'members.remove':
+            removed = set(member_key(member) for member in value)
+            data['members'] = [member for member in data.get('members', []) if member_key(member) not in removed]
+        else:
+            data[key] = value
+    return data
+
+
+def plan_task(name, params, keys):
+    """Returns the key under which a task stores its operations in a plan,
+    from the module name and the parameters naming what the task manages
+    """
+    return json.dumps([name] + [params.get(key) for key in keys])
+
+
+def read_plan(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return None
+
+
+def current_plan(plan, dev):
+    """Returns True if plan can be added to by dev: made for the same device,
+    against the same configuration and not applied yet
+    """
+    return bool(plan) and not plan.get('applied') and plan.get('device') == dev.device and plan.get('checksum') == dev.checksum
+
+
+def load_plan(dev, module, path, task):
+    """Prepares a PlanningDevice for task. Reads the configuration checksum
+    and the operations other tasks have planned against it, which reads of
+    single objects then see.
+    """
+    dev.checksum = get_checksum(dev, module)
+    dev.task = task
+    plan = read_plan(path)
+    if current_plan(plan, dev):
+        dev.pending = [operation for operation in plan['operations'] if operation.get('task') != task]
+
+
+def save_plan(dev, module, path):
+    """Stores the operations recorded by a PlanningDevice in the plan file.
+    A plan made for another device, against another configuration or that
+    has already been applied is replaced. The operations of a task replace
+    the ones it stored before, so planning again gives the same plan. The
+    hash of every object the plan changes is stored with it, for
+    cisco_asa_apply_plan to check that the objects are still as planned.
+    """
+    try:
+        f = open(path, 'a+')
+    except IOError:
+        module.fail_json(msg='Unable to write plan %s - %s' % (path, sys.exc_info()[1]))
+
+    with f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.seek(0)
+        try:
+            plan = json.loads(f.read())
+        except ValueError:
+            plan = None
+
+        if not current_plan(plan, dev):
+            plan = {}
+            plan['device'] = dev.device
+            plan['checksum'] = dev.checksum
+            plan['created'] = time.time()
+            plan['operations'] = []
+
+        # The task's operations go where its earlier ones were, so the order
+        # between tasks is kept
+        operations = []
+        position = None
+        for operation in plan['operations']:
+            if operation.get('task') == dev.task:
+                if position is None:
+                    position = len(operations)
+            else:
+                operations.append(operation)
+        if position is None:
+            position = len(operations)
+
+        planned = []
+        for operation in dev.plan:
+            operation = dict(operation)
+            operation['task'] = dev.task
+            planned.append(operation)
+        plan['operations'] = operations[:position] + planned + operations[position:]
+
+        hashes = plan.get('objects', {})
+        plan['objects'] = {}
+        for operation in plan['operations']:
+            request = operation_object(operation)
+            if request is None or request in plan['objects']:
+                continue
+            if request not in hashes:
+                try:
+                    response = Device._send(dev, 'GET', request, False, True)
+                except:
+                    err = sys.exc_info()[1]
+                    module.fail_json(msg='Unable to connect to device: %s' % err)
+                hashes[request] = response_hash(module, request, response)
+            plan['objects'][request] = hashes[request]
+
+        f.seek(0)
+        f.truncate()
+        json.dump(plan, f, indent=2, sort_keys=True)
+
+    return plan
+
+
+######################################################################
+# Hashes of object tables
+######################################################################
+def object_name(obj):
+    """Returns the name identifying an object in its collection, ikev1
+    policies have a priority instead of a name
+    """
+    for key in ['name', 'priority', 'objectId']:
+        if obj.get(key) is not None:
+            return '%s' % obj[key]
+    return None
+
+
+def canonical_object(obj):
+    """Returns obj as canonical JSON, in the form of normalize without the
+    objectId the device picks and with members in a fixed order
+    """
+    data = normalize(obj)
+    data.pop('objectId', None)
+    if isinstance(data.get('members'), list):
+        data['members'] = sorted(data['members'], key=lambda member: json.dumps(member, sort_keys=True))
+    return json.dumps(data, sort_keys=True)
+
+
+def object_hashes(objects):
+    """Returns the hash of every object of a collection keyed on its name,
+    and the objectId of the objects where it isn't the name
+    """
+    hashes = {}
+    ids = {}
+    for obj in objects:
+        name = object_name(obj)
+        hashes[name] = hashlib.sha1(canonical_object(obj).encode('utf-8')).hexdigest()
+        if obj.get('objectId') not in [None, name]:
+            ids[name] = obj['objectId']
+    return { 'hashes': hashes, 'ids': ids }
+
+
+def hash_diff(table, reference):
+    """Compares the object hashes of two tables. Returns the names that are
+    only in table (extra), only in reference (missing) or in both with other
+    content (different).
+    """
+    hashes = table['hashes']
+    reference_hashes = reference['hashes']
+    diff = { 'extra': [], 'missing': [], 'different': [] }
+    for name in sorted(set(hashes) | set(reference_hashes)):
+        if name not in reference_hashes:
+            diff['extra'].append(name)
+        elif name not in hashes:
+            diff['missing'].append(name)
+        elif hashes[name] != reference_hashes[name]:
+            diff['different'].append(name)
+    return diff
+
+
+def device_hashes(dev, module, collections, use_cache=False):
+    """Returns a dict with the object hashes of each collection on the device
+    and the list of collections whose hashes came from the cache. The ASA
+    can't hash its configuration per object, so every object is read. The
+    hashes are stored per device in HASH_DIR together with the configuration
+    checksum. The checksum isn't certain to change when the running
+    configuration is edited without saving it, so stored hashes are only
+    reused with use_cache, while the checksum is unchanged.
+    """
+    checksum = get_checksum(dev, module)
+    path = os.path.join(HASH_DIR, '%s.json' % dev.device.replace('/', '_'))
+    cached = None
+    if use_cache:
+        try:
+            with open(path) as f:
+                cached = json.load(f)
+        except (IOError, ValueError):
+            pass
+
+    if not cached or cached.get('checksum') != checksum:
+        cached = { 'checksum': checksum, 'tables': {} }
+
+    tables = {}
+    from_cache = []
+    for collection in collections:
+        if collection in cached['tables']:
+            from_cache.append(collection)
+        else:
+            cached['tables'][collection] = object_hashes(iter_collection(dev, module, collection, optional=True))
+        tables[collection] = cached['tables'][collection]
+
+    if len(from_cache) < len(collections):
+        if not os.path.isdir(HASH_DIR):
+            os.makedirs(HASH_DIR)
+        tmp_path = '%s.%s.tmp' % (path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            json.dump(cached, f)
+        os.rename(tmp_path, path)
+
+    return { 'checksum': checksum, 'tables': tables, 'cached': from_cache }
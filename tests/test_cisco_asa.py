@@ -0,0 +1,805 @@
+import fcntl
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'module_utils'))
+
+import cisco_asa
+
+SERVICES = {
+    'tcp': { '80': 'http', '139': 'netbios-ssn', '443': 'https', '1494': 'citrix-ica' },
+    'udp': { '137': 'netbios-ns', '53': 'domain' }
+}
+
+
+class ServiceTableTestCase(unittest.TestCase):
+    """Fills the rasa service tables, which are empty without rasa"""
+
+    def setUp(self):
+        self.saved = (dict(cisco_asa.tcp_services), dict(cisco_asa.udp_services))
+        cisco_asa.tcp_services.clear()
+        cisco_asa.tcp_services.update(SERVICES['tcp'])
+        cisco_asa.udp_services.clear()
+        cisco_asa.udp_services.update(SERVICES['udp'])
+
+    def tearDown(self):
+        for table, saved in zip([cisco_asa.tcp_services, cisco_asa.udp_services], self.saved):
+            table.clear()
+            table.update(saved)
+
+
+class PortIntervalTest(ServiceTableTestCase):
+
+    def test_numbers_and_ranges(self):
+        self.assertEqual(cisco_asa.port_interval('tcp', '443'), (443, 443))
+        self.assertEqual(cisco_asa.port_interval('tcp', '1000-2000'), (1000, 2000))
+        self.assertEqual(cisco_asa.port_interval('tcp', 'range 1000 2000'), (1000, 2000))
+        self.assertEqual(cisco_asa.port_interval('tcp', 'lt 1024'), (0, 1023))
+        self.assertEqual(cisco_asa.port_interval('tcp', 'gt 1023'), (1024, 65535))
+
+    def test_names(self):
+        self.assertEqual(cisco_asa.port_interval('tcp', 'www'), (80, 80))
+        self.assertEqual(cisco_asa.port_interval('tcp', 'eq https'), (443, 443))
+        self.assertEqual(cisco_asa.port_interval('tcp', 'https-1494'), (443, 1494))
+
+    def test_hyphenated_names(self):
+        self.assertEqual(cisco_asa.port_interval('tcp', 'netbios-ssn'), (139, 139))
+        self.assertEqual(cisco_asa.port_interval('tcp', 'citrix-ica'), (1494, 1494))
+        self.assertEqual(cisco_asa.port_interval('tcp', 'eq netbios-ssn'), (139, 139))
+        self.assertEqual(cisco_asa.port_interval('udp', 'netbios-ns'), (137, 137))
+        self.assertEqual(cisco_asa.port_interval('tcp-udp', 'netbios-ssn'), (139, 139))
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, cisco_asa.port_interval, 'tcp', 'netbios-foo')
+        self.assertRaises(ValueError, cisco_asa.port_interval, 'udp', 'netbios-ssn')
+        self.assertRaises(ValueError, cisco_asa.port_interval, 'tcp', '2000-1000')
+        self.assertRaises(ValueError, cisco_asa.port_interval, 'tcp', '')
+
+
+class NormalizeServiceTest(ServiceTableTestCase):
+
+    def test_names_and_numbers_compare_equal(self):
+        self.assertEqual(cisco_asa.normalize_service('tcp/https'), 'tcp/443')
+        self.assertEqual(cisco_asa.normalize_service('TCP/www'), 'tcp/80')
+        self.assertEqual(cisco_asa.normalize_service('tcp/range 1000 2000'), 'tcp/1000-2000')
+
+    def test_hyphenated_names(self):
+        self.assertEqual(cisco_asa.normalize_service('tcp/netbios-ssn'), cisco_asa.normalize_service('tcp/139'))
+        self.assertEqual(cisco_asa.normalize_service('tcp/citrix-ica'), 'tcp/1494')
+        self.assertEqual(cisco_asa.normalize_service('udp/netbios-ns'), 'udp/137')
+
+    def test_unknown_is_kept(self):
+        self.assertEqual(cisco_asa.normalize_service('tcp/Unknown-Name'), 'tcp/unknown-name')
+
+
+def lcs_length(a, b):
+    """Textbook O(NM) longest common subsequence length"""
+    lengths = [[0] * (len(b) + 1) for i in range(len(a) + 1)]
+    for i in range(len(a)):
+        for j in range(len(b)):
+            if a[i] == b[j]:
+                lengths[i + 1][j + 1] = lengths[i][j] + 1
+            else:
+                lengths[i + 1][j + 1] = max(lengths[i][j + 1], lengths[i + 1][j])
+    return lengths[len(a)][len(b)]
+
+
+class ServiceObjectDataTest(ServiceTableTestCase):
+
+    def test_port(self):
+        data = cisco_asa.service_object_data('svc-web', 'tcp', 'https', 'Web')
+        self.assertEqual(data, { 'name': 'svc-web', 'objectId': 'svc-web', 'kind': 'object#TcpUdpServiceObj', 'value': 'tcp/443', 'description': 'Web' })
+        self.assertEqual(cisco_asa.service_object_data('svc-alt', 'udp', 'range 1000 2000')['value'], 'udp/1000-2000')
+
+    def test_protocol(self):
+        data = cisco_asa.service_object_data('svc-gre', 'gre')
+        self.assertEqual(data, { 'name': 'svc-gre', 'objectId': 'svc-gre', 'kind': 'object#NetworkProtocolObj', 'value': 'gre' })
+
+    def test_invalid_port(self):
+        self.assertRaises(ValueError, cisco_asa.service_object_data, 'svc', 'tcp', 'nosuch')
+
+
+class EditScriptTest(unittest.TestCase):
+
+    def apply(self, current, desired):
+        """Applies the edit script the way cisco_asa_access_list sends it"""
+        # Entries are numbered so equal ones can be told apart, like the
+        # objectId of an ACE
+        numbered = list(enumerate(current))
+        deletes, inserts = cisco_asa.edit_script(numbered, list(desired), lambda entry: entry[1] if isinstance(entry, tuple) else entry)
+        result = [entry for entry in numbered if entry not in deletes]
+        for position, entry in inserts:
+            result.insert(position - 1, (None, entry))
+        self.assertEqual([entry[1] for entry in result], list(desired))
+        return [entry[1] for entry in deletes], inserts
+
+    def test_unchanged(self):
+        self.assertEqual(self.apply('abc', 'abc'), ([], []))
+        self.assertEqual(self.apply('', ''), ([], []))
+
+    def test_insert_in_middle(self):
+        self.assertEqual(self.apply('abde', 'abcde'), ([], [(3, 'c')]))
+
+    def test_reorder(self):
+        deletes, inserts = self.apply('abcd', 'bcda')
+        self.assertEqual(deletes, ['a'])
+        self.assertEqual(inserts, [(4, 'a')])
+
+    def test_keeps_longest_common_subsequence(self):
+        # Longest contiguous blocks keep 3 entries here, the LCS is 4
+        deletes, inserts = self.apply('ababacab', 'aaabc')
+        self.assertEqual(len(deletes), 4)
+        self.assertEqual(len(inserts), 1)
+
+    def test_random_lists_are_minimal(self):
+        rand = random.Random(4)
+        for attempt in range(200):
+            current = [rand.choice('abcd') for i in range(rand.randint(0, 12))]
+            desired = [rand.choice('abcd') for i in range(rand.randint(0, 12))]
+            pairs = cisco_asa.common_subsequence(current, desired)
+            self.assertEqual(len(pairs), lcs_length(current, desired))
+            for i, j in pairs:
+                self.assertEqual(current[i], desired[j])
+            self.assertEqual(pairs, sorted(pairs))
+            self.apply(current, desired)
+
+
+class PlannedOperationTest(unittest.TestCase):
+
+    def test_operation_object(self):
+        create = { 'method': 'Post', 'request': 'objects/networkobjectgroups', 'data': { 'name': 'G' } }
+        self.assertEqual(cisco_asa.operation_object(create), 'objects/networkobjectgroups/G')
+        patch = { 'method': 'Patch', 'request': 'objects/networkobjectgroups/G', 'data': {} }
+        self.assertEqual(cisco_asa.operation_object(patch), 'objects/networkobjectgroups/G')
+        save = { 'method': 'Post', 'request': 'commands/writemem' }
+        self.assertEqual(cisco_asa.operation_object(save), None)
+
+    def test_apply_operations(self):
+        member_a = { 'kind': 'IPv4Address', 'value': '10.0.0.1' }
+        member_b = { 'kind': 'IPv4Address', 'value': '10.0.0.2' }
+        data = cisco_asa.apply_operation(None, { 'method': 'Post', 'request': 'objects/networkobjectgroups', 'data': { 'name': 'G', 'members': [member_a] } })
+        data = cisco_asa.apply_operation(data, { 'method': 'Patch', 'request': 'objects/networkobjectgroups/G', 'data': { 'members.add': [member_b] } })
+        self.assertEqual(data['members'], [member_a, member_b])
+        data = cisco_asa.apply_operation(data, { 'method': 'Patch', 'request': 'objects/networkobjectgroups/G', 'data': { 'members.remove': [{ 'kind': 'ipv4address', 'value': '10.0.0.1' }] } })
+        self.assertEqual(data['members'], [member_b])
+        self.assertEqual(cisco_asa.apply_operation(data, { 'method': 'Delete', 'request': 'objects/networkobjectgroups/G' }), None)
+        self.assertEqual(cisco_asa.apply_operation(None, { 'method': 'Patch', 'request': 'objects/networkobjectgroups/G', 'data': { 'description': 'x' } }), None)
+
+
+class FailModule(object):
+    """Stands in for AnsibleModule, fail_json raises"""
+
+    def fail_json(self, **kwargs):
+        raise AssertionError(kwargs['msg'])
+
+
+class MergeIntervalsTest(unittest.TestCase):
+
+    def test_overlapping_and_adjacent(self):
+        self.assertEqual(cisco_asa.merge_intervals([(5, 9), (1, 3), (4, 4), (20, 30), (25, 26)]), [(1, 9), (20, 30)])
+        self.assertEqual(cisco_asa.merge_intervals([(1, 2), (4, 5)]), [(1, 2), (4, 5)])
+        self.assertEqual(cisco_asa.merge_intervals([]), [])
+
+
+class IntervalBlocksTest(unittest.TestCase):
+
+    def values(self, version, first, last):
+        start = cisco_asa.address_to_int(first)
+        end = cisco_asa.address_to_int(last)
+        return [(category, value) for block_start, block_end, category, value in cisco_asa.interval_blocks(version, start, end)]
+
+    def test_single_blocks(self):
+        self.assertEqual(self.values(4, '10.0.0.1', '10.0.0.1'), [('ipv4_address', '10.0.0.1')])
+        self.assertEqual(self.values(4, '10.0.0.0', '10.0.0.255'), [('ipv4_subnet', '10.0.0.0/24')])
+        self.assertEqual(self.values(4, '0.0.0.0', '255.255.255.255'), [('ipv4_subnet', '0.0.0.0/0')])
+        self.assertEqual(self.values(6, '2001:db8::', '2001:db8::ffff'), [('ipv6_subnet', '2001:db8::/112')])
+
+    def test_unaligned_intervals_are_split(self):
+        self.assertEqual(self.values(4, '10.0.0.1', '10.0.0.3'), [('ipv4_address', '10.0.0.1'), ('ipv4_subnet', '10.0.0.2/31')])
+        self.assertEqual(self.values(4, '10.0.0.1', '10.0.0.6'),
+                         [('ipv4_address', '10.0.0.1'), ('ipv4_subnet', '10.0.0.2/31'), ('ipv4_subnet', '10.0.0.4/31'), ('ipv4_address', '10.0.0.6')])
+
+    def test_blocks_cover_exactly(self):
+        rand = random.Random(38)
+        for attempt in range(200):
+            start = rand.randint(0, 1 << 32)
+            end = min(start + rand.randint(0, 1 << rand.randint(0, 20)), (1 << 32) - 1)
+            start = min(start, end)
+            blocks = cisco_asa.interval_blocks(4, start, end)
+            position = start
+            for block_start, block_end, category, value in blocks:
+                self.assertEqual(block_start, position)
+                self.assertEqual(cisco_asa.address_interval(category, value), (block_start, block_end))
+                position = block_end + 1
+            self.assertEqual(position, end + 1)
+            # An interval needs at most two blocks of each size
+            self.assertTrue(len(blocks) <= 2 * 32)
+
+
+class AggregateEntriesTest(unittest.TestCase):
+
+    def entry(self, category, value, entry_state='present'):
+        return { 'category': category, 'value': value, 'entry_state': entry_state }
+
+    def test_merges_into_addresses_and_subnets(self):
+        entries = [
+            self.entry('ipv4_address', '10.0.0.1'),
+            self.entry('ipv4_address', '10.0.0.2'),
+            self.entry('ipv4_address', '10.0.0.3'),
+            self.entry('ipv4_subnet', '10.0.1.0/25'),
+            self.entry('ipv4_subnet', '10.0.1.128/25'),
+            self.entry('object', 'tsrv-web-1'),
+            self.entry('ipv4_address', '10.0.0.9', 'absent')
+        ]
+        work_entries, aggregation = cisco_asa.aggregate_entries(FailModule(), 'asa1', entries)
+        values = [(entry['category'], entry['value'], entry['entry_state']) for entry in work_entries]
+        self.assertEqual(values, [
+            ('object', 'tsrv-web-1', 'present'),
+            ('ipv4_address', '10.0.0.9', 'absent'),
+            ('ipv4_address', '10.0.0.1', 'present'),
+            ('ipv4_subnet', '10.0.0.2/31', 'present'),
+            ('ipv4_subnet', '10.0.1.0/24', 'present')
+        ])
+        self.assertEqual([entry['category'] for entry in work_entries if entry['category'].endswith('_range')], [])
+        self.assertEqual(aggregation['entries'], 5)
+        self.assertEqual(aggregation['aggregated'], 3)
+        self.assertEqual(aggregation['covered'][4], [(167772161, 167772163), (167772416, 167772671)])
+
+    def test_entries_point_to_their_aggregates(self):
+        entries = [self.entry('ipv4_range', '10.0.0.1-10.0.0.3'), self.entry('ipv4_address', '10.0.0.2')]
+        work_entries, aggregation = cisco_asa.aggregate_entries(FailModule(), 'asa1', entries)
+        self.assertEqual([aggregate['value'] for aggregate in entries[0]['aggregates']], ['10.0.0.1', '10.0.0.2/31'])
+        self.assertEqual([aggregate['value'] for aggregate in entries[1]['aggregates']], ['10.0.0.2/31'])
+
+    def test_invalid_value(self):
+        self.assertRaises(AssertionError, cisco_asa.aggregate_entries, FailModule(), 'asa1', [self.entry('ipv4_address', '10.0.0.300')])
+
+
+RUNNING_CONFIG = """: Saved
+:
+ASA Version 9.4(1)
+!
+hostname asa1
+object network tsrv-web-1
+ host 10.12.30.10
+ description Test web server
+object network NET-SALES-4
+ subnet 10.12.30.0 255.255.255.0
+object network R1
+ range 10.0.0.1 10.0.0.10
+object network F
+ fqdn v4 www.example.com
+object service svc-web
+ service tcp destination eq www
+object service svc-low
+ service tcp destination lt 1024
+object service svc-high
+ service udp destination gt 1023
+object service svc-range
+ service tcp destination range 8000 8080
+object service svc-gre
+ service gre
+object-group network OG-SERVERS
+ description Managed by Ansible
+ network-object host 10.80.30.18
+ network-object 172.16.10.0 255.255.255.0
+ network-object object tsrv-web-1
+ group-object NET-A
+crypto ikev1 policy 100
+ authentication pre-share
+ encryption aes-256
+!
+object network tsrv-web-1
+ nat (inside,outside) static 192.0.2.10
+"""
+
+
+class ParseRunningConfigTest(ServiceTableTestCase):
+
+    def parse(self, config):
+        objects = {}
+        for collection, obj in cisco_asa.parse_running_config(config.splitlines(True), 'asa1'):
+            objects.setdefault(collection, {}).setdefault(obj['objectId'], obj)
+        return objects
+
+    def test_network_objects(self):
+        objects = self.parse(RUNNING_CONFIG)['objects/networkobjects']
+        self.assertEqual(objects['tsrv-web-1']['host'], { 'kind': 'IPv4Address', 'value': '10.12.30.10' })
+        self.assertEqual(objects['tsrv-web-1']['description'], 'Test web server')
+        self.assertEqual(objects['NET-SALES-4']['host'], { 'kind': 'IPv4Network', 'value': '10.12.30.0/24' })
+        self.assertEqual(objects['R1']['host'], { 'kind': 'IPv4Range', 'value': '10.0.0.1-10.0.0.10' })
+        self.assertEqual(objects['F']['host'], { 'kind': 'IPv4FQDN', 'value': 'www.example.com' })
+
+    def test_service_objects(self):
+        objects = self.parse(RUNNING_CONFIG)['objects/networkservices']
+        values = dict((name, (objects[name]['kind'], objects[name]['value'])) for name in objects)
+        self.assertEqual(values, {
+            'svc-web': ('object#TcpUdpServiceObj', 'tcp/www'),
+            'svc-low': ('object#TcpUdpServiceObj', 'tcp/0-1023'),
+            'svc-high': ('object#TcpUdpServiceObj', 'udp/1024-65535'),
+            'svc-range': ('object#TcpUdpServiceObj', 'tcp/8000-8080'),
+            'svc-gre': ('object#NetworkProtocolObj', 'gre')
+        })
+
+    def test_unsupported_services(self):
+        for service in ['service tcp destination neq 80', 'service tcp source eq 22', 'service tcp source eq 22 destination eq 80']:
+            config = 'object service svc\n %s\n' % service
+            self.assertRaises(ValueError, self.parse, config)
+
+    def test_groups_and_policies(self):
+        objects = self.parse(RUNNING_CONFIG)
+        group = objects['objects/networkobjectgroups']['OG-SERVERS']
+        self.assertEqual(group['description'], 'Managed by Ansible')
+        self.assertEqual([member.get('value', member.get('objectId')) for member in group['members']],
+                         ['10.80.30.18', '172.16.10.0/24', 'tsrv-web-1', 'NET-A'])
+        policy = objects['vpn/ikev1policy']['100']
+        self.assertEqual((policy['authentication'], policy['encryption'], policy['hash'], policy['priority']), ('pre-share', 'aes-256', 'sha', 100))
+
+    def test_repeated_blocks(self):
+        blocks = [obj for collection, obj in cisco_asa.parse_running_config(RUNNING_CONFIG.splitlines(True), 'asa1') if obj['objectId'] == 'tsrv-web-1']
+        self.assertEqual(len(blocks), 2)
+
+
+class HashDiffTest(unittest.TestCase):
+
+    def test_equal_tables(self):
+        table = [
+            { 'name': 'G', 'objectId': 'G', 'members': [{ 'kind': 'IPv4Address', 'value': '10.0.0.1' }, { 'kind': 'IPv4Address', 'value': '10.0.0.2' }] },
+            { 'priority': 10, 'objectId': '10', 'hash': 'sha' }
+        ]
+        reference = [
+            { 'name': 'G', 'members': [{ 'kind': 'ipv4address', 'value': '10.0.0.2' }, { 'kind': 'IPv4Address', 'value': '10.0.0.1' }] },
+            { 'priority': '10', 'hash': 'sha' }
+        ]
+        diff = cisco_asa.hash_diff(cisco_asa.object_hashes(table), cisco_asa.object_hashes(reference))
+        self.assertEqual(diff, { 'extra': [], 'missing': [], 'different': [] })
+
+    def test_differences(self):
+        table = cisco_asa.object_hashes([
+            { 'name': 'a', 'host': { 'kind': 'IPv4Address', 'value': '10.0.0.1' } },
+            { 'name': 'b', 'host': { 'kind': 'IPv4Address', 'value': '10.0.0.2' } },
+            { 'name': 'c', 'host': { 'kind': 'IPv4Address', 'value': '10.0.0.3' } }
+        ])
+        reference = cisco_asa.object_hashes([
+            { 'name': 'b', 'host': { 'kind': 'IPv4Address', 'value': '10.0.0.2' } },
+            { 'name': 'c', 'host': { 'kind': 'IPv4Address', 'value': '10.0.0.30' } },
+            { 'name': 'd', 'host': { 'kind': 'IPv4Address', 'value': '10.0.0.4' } }
+        ])
+        self.assertEqual(cisco_asa.hash_diff(table, reference), { 'extra': ['a'], 'missing': ['d'], 'different': ['c'] })
+
+    def test_ids(self):
+        table = cisco_asa.object_hashes([{ 'name': 'a', 'objectId': 'a' }, { 'priority': 10, 'objectId': '10' }, { 'name': 'x', 'objectId': '1234' }])
+        self.assertEqual(table['ids'], { 'x': '1234' })
+
+
+class WriteQueueTest(unittest.TestCase):
+    """Runs two writers as threads against one queue directory while the
+    test holds the lock, so both changes are spooled before either is sent
+    """
+
+    REQUEST = 'objects/networkobjectgroups/OG-WEB'
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def send(self, method, request, data):
+        with self.lock:
+            self.sent.append((method, request, data))
+        if 'refused' in [member.get('value') for member in data.get('members.add', [])]:
+            return cisco_asa.OfflineResponse(400, { 'messages': ['refused'] })
+        return cisco_asa.OfflineResponse(204)
+
+    def queue(self):
+        queue = cisco_asa.WriteQueue('asa1')
+        queue.path = self.path
+        return queue
+
+    def spools(self, suffix):
+        return [name for name in os.listdir(self.path) if name.endswith(suffix)]
+
+    def run_writers(self, changes):
+        results = [None] * len(changes)
+
+        def writer(index, data):
+            results[index] = self.queue().send(self.send, 'PATCH', self.REQUEST, data)
+
+        with open(os.path.join(self.path, 'lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            threads = [threading.Thread(target=writer, args=(index, data)) for index, data in enumerate(changes)]
+            for thread in threads:
+                thread.start()
+            deadline = time.time() + 5
+            while len(self.spools('.op')) < len(changes) and time.time() < deadline:
+                time.sleep(0.01)
+            fcntl.flock(lock, fcntl.LOCK_UN)
+        for thread in threads:
+            thread.join(5)
+        return results
+
+    def member(self, value):
+        return { 'kind': 'IPv4Address', 'value': value }
+
+    def test_merged(self):
+        results = self.run_writers([
+            { 'members.add': [self.member('10.0.0.1')] },
+            { 'members.add': [self.member('10.0.0.2')] }
+        ])
+        self.assertEqual(len(self.sent), 1)
+        self.assertEqual(self.sent[0][2], { 'members.add': [self.member('10.0.0.1'), self.member('10.0.0.2')] })
+        self.assertEqual([result.status_code for result in results], [204, 204])
+        self.assertEqual(self.spools('.op') + self.spools('.result'), [])
+
+    def test_conflicting(self):
+        self.run_writers([
+            { 'members.add': [self.member('10.0.0.1')] },
+            { 'members.remove': [self.member('10.0.0.1')] }
+        ])
+        self.assertEqual(len(self.sent), 2)
+
+    def test_refused(self):
+        results = self.run_writers([
+            { 'members.add': [self.member('10.0.0.1')] },
+            { 'members.add': [self.member('refused')] }
+        ])
+        # The merged request and each change on its own
+        self.assertEqual(len(self.sent), 3)
+        self.assertEqual(sorted(result.status_code for result in results), [204, 400])
+
+    def test_expired_results(self):
+        child = subprocess.Popen([sys.executable, '-c', 'pass'])
+        child.wait()
+        stale = '%s-1-1.result' % child.pid
+        old = '%s-1-2.result' % os.getpid()
+        current = '%s-1-3.result' % os.getpid()
+        for name in [stale, old, current]:
+            with open(os.path.join(self.path, name), 'w') as f:
+                f.write('{}')
+        expired = time.time() - cisco_asa.QUEUE_RESULT_TTL - 1
+        os.utime(os.path.join(self.path, old), (expired, expired))
+
+        self.queue().send(self.send, 'POST', 'objects/networkobjects', { 'name': 'web-1' })
+        self.assertEqual(self.spools('.result'), [current])
+
+
+class IterObjectTest(unittest.TestCase):
+
+    DOCUMENT = u'{"kind": "collection", "selfLink": "https://asa1/api/objects/networkobjects?q=\\"a\\"", ' \
+        u'"rangeInfo": {"offset": 0, "limit": 2, "total": 2}, ' \
+        u'"items": [{"name": "caf\u00e9 ,]}", "members": [{"value": "10.0.0.1"}, {"value": "\\u00e9\\\\"}]}, ' \
+        u'{"name": "web-2", "priority": 12345}], "count": 67890}'
+
+    def pairs(self, chunks):
+        return list(cisco_asa.iter_object(chunks, 'items'))
+
+    def chunks(self, text, size):
+        raw = text.encode('utf-8')
+        return [raw[start:start + size] for start in range(0, len(raw), size)]
+
+    def test_chunk_boundaries(self):
+        data = json.loads(self.DOCUMENT)
+        expected = [
+            ('kind', data['kind']),
+            ('selfLink', data['selfLink']),
+            ('rangeInfo', data['rangeInfo']),
+            ('items', data['items'][0]),
+            ('items', data['items'][1]),
+            ('count', data['count'])
+        ]
+        # Every split of strings, escapes, multi-byte characters and numbers
+        for size in range(1, len(self.DOCUMENT.encode('utf-8')) + 1):
+            self.assertEqual(self.pairs(self.chunks(self.DOCUMENT, size)), expected)
+
+    def test_nested_array_key(self):
+        document = '{"rangeInfo": {"items": [1, 2]}, "items": [[1, 2], {"items": []}]}'
+        self.assertEqual(self.pairs(self.chunks(document, 3)), [
+            ('rangeInfo', { 'items': [1, 2] }),
+            ('items', [1, 2]),
+            ('items', { 'items': [] })
+        ])
+
+    def test_empty(self):
+        self.assertEqual(self.pairs([b'{}']), [])
+        self.assertEqual(self.pairs([b'{"items": [', b' ]}']), [])
+
+    def test_malformed(self):
+        for document in ['', '[1]', '{"items": [1 2]}', '{"a" 1}', '{"a": 1 "b": 2}',
+                         '{"items": [1,', '{"a": "unterminated', '{"a": tru}']:
+            for size in [1, 4, 64]:
+                self.assertRaises(ValueError, self.pairs, self.chunks(document, size))
+
+
+class CircuitBreakerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.saved = cisco_asa.HEALTH_DIR
+        cisco_asa.HEALTH_DIR = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(cisco_asa.HEALTH_DIR)
+        cisco_asa.HEALTH_DIR = self.saved
+
+    def closed_port(self):
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        return port
+
+    def test_opens_after_threshold(self):
+        breaker = cisco_asa.CircuitBreaker('asa1', threshold=2, reset=60)
+        breaker.failure()
+        self.assertTrue(breaker.allow())
+        breaker.failure()
+        self.assertFalse(breaker.allow())
+        # Shared with other tasks through the file
+        self.assertFalse(cisco_asa.CircuitBreaker('asa1', threshold=2, reset=60).allow())
+        self.assertTrue(cisco_asa.CircuitBreaker('asa2', threshold=2, reset=60).allow())
+
+    def test_success_resets(self):
+        breaker = cisco_asa.CircuitBreaker('asa1', threshold=2, reset=60)
+        breaker.failure()
+        breaker.success()
+        breaker.failure()
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state()['failures'], 1)
+
+    def test_disabled(self):
+        breaker = cisco_asa.CircuitBreaker('asa1', threshold=0)
+        for attempt in range(5):
+            breaker.failure()
+        self.assertTrue(breaker.allow())
+        self.assertEqual(os.listdir(cisco_asa.HEALTH_DIR), [])
+
+    def test_probe_closes(self):
+        server = socket.socket()
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+        try:
+            breaker = cisco_asa.CircuitBreaker('127.0.0.1:%s' % server.getsockname()[1], threshold=1, reset=0)
+            breaker.failure()
+            self.assertTrue(breaker.allow())
+            self.assertEqual(breaker.state(), { 'failures': 0, 'opened': None, 'probe': None })
+        finally:
+            server.close()
+
+    def test_probe_fails(self):
+        breaker = cisco_asa.CircuitBreaker('127.0.0.1:%s' % self.closed_port(), threshold=1, reset=0, connect_timeout=1)
+        breaker.failure()
+        self.assertFalse(breaker.allow())
+        state = breaker.state()
+        self.assertEqual(state['failures'], 2)
+        self.assertEqual(state['probe'], None)
+        self.assertNotEqual(state['opened'], None)
+
+    def test_single_probe(self):
+        breaker = cisco_asa.CircuitBreaker('127.0.0.1:%s' % self.closed_port(), threshold=1, reset=60)
+        with open(breaker.path, 'w') as f:
+            json.dump({ 'failures': 1, 'opened': time.time() - 120, 'probe': time.time() - 1 }, f)
+        # Another process is probing the device
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.state()['failures'], 1)
+
+
+SHOW_FAILOVER = """Failover On
+Failover unit Primary
+Failover LAN Interface: folink GigabitEthernet0/3 (up)
+Last Failover at: 10:15:01 UTC Oct 1 2026
+        This host: Primary - %s
+                Active time: 0 (sec)
+                  Interface outside (203.0.113.2): Normal (Monitored)
+                  Interface inside (10.0.0.2): Normal (Monitored)
+                  Interface management (192.168.1.2): Normal (Waiting)
+        Other host: Secondary - %s
+                Active time: 86400 (sec)
+                  Interface outside (203.0.113.1): Normal (Monitored)
+                  Interface inside (10.0.0.1): Normal (Monitored)
+                  Interface management (192.168.1.1): Normal (Waiting)
+"""
+
+
+class ParseFailoverTest(unittest.TestCase):
+
+    def test_standalone(self):
+        self.assertEqual(cisco_asa.parse_failover('Failover Off\nFailover unit Primary\n', '10.0.0.2'),
+                         { 'role': 'standalone', 'active': None })
+
+    def test_active(self):
+        output = SHOW_FAILOVER % ('Active', 'Standby Ready')
+        self.assertEqual(cisco_asa.parse_failover(output, '10.0.0.1'), { 'role': 'active', 'active': None })
+
+    def test_standby(self):
+        output = SHOW_FAILOVER % ('Standby Ready', 'Active')
+        self.assertEqual(cisco_asa.parse_failover(output, '10.0.0.2'), { 'role': 'standby', 'active': '10.0.0.1' })
+        self.assertEqual(cisco_asa.parse_failover(output, '203.0.113.2'), { 'role': 'standby', 'active': '203.0.113.1' })
+        # Reached on an address the output doesn't list
+        self.assertEqual(cisco_asa.parse_failover(output, 'asa1.example.com'), { 'role': 'standby', 'active': '192.168.1.1' })
+
+    def test_no_active_unit(self):
+        output = SHOW_FAILOVER % ('Standby Ready', 'Failed')
+        self.assertEqual(cisco_asa.parse_failover(output, '10.0.0.2'), { 'role': 'standby', 'active': None })
+
+
+class ForgetFactsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.saved = cisco_asa.FACTS_DIR
+        cisco_asa.FACTS_DIR = os.path.join(tempfile.mkdtemp(), 'facts')
+
+    def tearDown(self):
+        shutil.rmtree(os.path.dirname(cisco_asa.FACTS_DIR))
+        cisco_asa.FACTS_DIR = self.saved
+
+    def test_marks_change(self):
+        self.assertEqual(cisco_asa.facts_changed('asa1'), 0)
+        started = time.time()
+        cisco_asa.forget_facts('asa1')
+        self.assertTrue(cisco_asa.facts_changed('asa1') >= started - 1)
+        self.assertEqual(cisco_asa.facts_changed('asa2'), 0)
+
+
+class SafeDeleteOrderTest(unittest.TestCase):
+
+    def test_groups_first(self):
+        index = {
+            'web-1': [('object-group', 'OG-WEB', None)],
+            'OG-WEB': [('object-group', 'OG-ALL', None)]
+        }
+        self.assertEqual(cisco_asa.safe_delete_order(['web-1', 'OG-WEB', 'OG-ALL'], index),
+                         (['OG-ALL', 'OG-WEB', 'web-1'], {}))
+
+    def test_blocked(self):
+        index = {
+            'web-1': [('object-group', 'OG-WEB', None)],
+            'web-2': [('object-group', 'OG-KEEP', None)],
+            'OG-WEB': [('access-list', 'outside', 3)]
+        }
+        order, blocked = cisco_asa.safe_delete_order(['web-1', 'web-2', 'web-3', 'OG-WEB'], index)
+        self.assertEqual(order, ['web-3'])
+        # web-1 stays referenced by OG-WEB, which is kept for the access-list
+        self.assertEqual(blocked, {
+            'OG-WEB': ['access-list outside line 3'],
+            'web-1': ['object-group OG-WEB'],
+            'web-2': ['object-group OG-KEEP']
+        })
+
+    def test_cycle(self):
+        index = {
+            'OG-A': [('object-group', 'OG-B', None)],
+            'OG-B': [('object-group', 'OG-A', None)]
+        }
+        order, blocked = cisco_asa.safe_delete_order(['OG-A', 'OG-B'], index)
+        self.assertEqual(order, [])
+        self.assertEqual(blocked, { 'OG-A': ['object-group OG-B'], 'OG-B': ['object-group OG-A'] })
+
+
+class FakeDevice(cisco_asa.OfflineASA):
+    """Answers _get from a dict of collections, missing ones return 404"""
+
+    def __init__(self, collections):
+        cisco_asa.OfflineASA.__init__(self, 'asa1', None)
+        self.collections = collections
+
+    def _get(self, request, stream=False):
+        path = request.split('?', 1)[0]
+        if path not in self.collections:
+            return cisco_asa.OfflineResponse(404)
+        items = self.collections[path]
+        return cisco_asa.OfflineResponse(200, { 'items': items, 'rangeInfo': { 'offset': 0, 'limit': len(items), 'total': len(items) } })
+
+
+class ExpansionEstimatorTest(unittest.TestCase):
+
+    def host(self, value):
+        return { 'kind': 'IPv4Address', 'value': value }
+
+    def ref(self, kind, name):
+        return { 'kind': 'objectRef#' + kind, 'objectId': name }
+
+    def estimator(self):
+        dev = FakeDevice({
+            'objects/networkobjectgroups': [
+                { 'name': 'OG-SRC', 'members': [self.host('10.0.0.1'), self.host('10.0.0.2'), self.ref('NetworkObjGroup', 'OG-NESTED')] },
+                { 'name': 'OG-NESTED', 'members': [self.host('10.0.1.1'), self.host('10.0.1.2'), self.host('10.0.1.3')] },
+                { 'name': 'OG-DST', 'members': [self.host('192.168.0.1'), self.host('192.168.0.2')] }
+            ],
+            'objects/networkservicegroups': [
+                { 'name': 'SG-WEB', 'members': [
+                    { 'kind': 'TcpUdpService', 'value': 'tcp/80' },
+                    self.ref('TcpUdpServiceObj', 'svc-https'),
+                    self.ref('NetworkServiceGroup', 'SG-ALT')
+                ] },
+                { 'name': 'SG-ALT', 'members': [{ 'kind': 'TcpUdpService', 'value': 'tcp/8080' }, { 'kind': 'TcpUdpService', 'value': 'tcp/8443' }] }
+            ],
+            'objects/extendedacls': [{ 'name': 'outside' }, { 'name': 'inside' }],
+            'objects/extendedacls/outside/aces': [{
+                'sourceAddress': self.ref('NetworkObjGroup', 'OG-SRC'),
+                'destinationAddress': self.ref('NetworkObjGroup', 'OG-DST'),
+                'sourceService': { 'kind': 'NetworkProtocol', 'value': 'tcp' },
+                'destinationService': self.ref('NetworkServiceGroup', 'SG-WEB')
+            }],
+            'objects/extendedacls/inside/aces': [{
+                'sourceAddress': self.ref('NetworkObjGroup', 'OG-NESTED'),
+                'destinationAddress': self.host('192.168.1.1'),
+                'sourceService': { 'kind': 'NetworkProtocol', 'value': 'ip' },
+                'destinationService': { 'kind': 'NetworkProtocol', 'value': 'ip' }
+            }]
+        })
+        return cisco_asa.ExpansionEstimator.from_device(dev, None)
+
+    def test_nested_sizes(self):
+        estimator = self.estimator()
+        memo = {}
+        self.assertEqual(estimator.size('OG-SRC', memo), 5)
+        self.assertEqual(estimator.size('SG-WEB', memo), 4)
+        self.assertEqual(estimator.expansion(['OG-SRC', 'OG-DST', 'SG-WEB'], memo), 40)
+
+    def test_services_multiply(self):
+        total, access_lists = self.estimator().estimate('OG-DST', [self.host('192.168.0.3')], [])
+        self.assertEqual(total, 20)
+        self.assertEqual(access_lists, { 'outside': 20 })
+
+    def test_nested_edit(self):
+        total, access_lists = self.estimator().estimate('OG-NESTED', [self.host('10.0.1.4')], [])
+        self.assertEqual(access_lists, { 'outside': 8, 'inside': 1 })
+        self.assertEqual(total, 9)
+
+    def test_added_group(self):
+        total, access_lists = self.estimator().estimate('OG-DST', [self.ref('NetworkObjGroup', 'OG-NESTED')], [])
+        self.assertEqual(access_lists, { 'outside': 60 })
+
+    def test_cycles(self):
+        estimator = cisco_asa.ExpansionEstimator()
+        estimator.add_group('A', [self.host('10.0.0.1'), self.ref('NetworkObjGroup', 'B')])
+        estimator.add_group('B', [self.host('10.0.0.2'), self.host('10.0.0.3'), self.ref('NetworkObjGroup', 'A')])
+        estimator.add_group('C', [self.ref('NetworkObjGroup', 'C')])
+        memo = {}
+        self.assertEqual(estimator.size('A', memo), 3)
+        self.assertEqual(estimator.size('B', memo), 3)
+        self.assertEqual(estimator.size('C', memo), 0)
+
+        estimator.add_ace('outside', { 'sourceAddress': self.ref('NetworkObjGroup', 'B'), 'destinationAddress': self.host('10.1.1.1') })
+        self.assertEqual(estimator.estimate('A', [self.host('10.0.0.4')], []), (1, { 'outside': 1 }))
+
+
+class BuildReferenceIndexTest(unittest.TestCase):
+
+    def test_service_groups(self):
+        dev = FakeDevice({
+            'objects/networkobjectgroups': [
+                { 'name': 'OG-WEB', 'members': [{ 'kind': 'objectRef#NetworkObj', 'objectId': 'web-1' }] }
+            ],
+            'objects/networkservicegroups': [
+                { 'name': 'SG-WEB', 'members': [
+                    { 'kind': 'objectRef#TcpUdpServiceObj', 'objectId': 'svc-http' },
+                    { 'kind': 'objectRef#NetworkServiceGroup', 'objectId': 'SG-TLS' },
+                    { 'kind': 'TcpUdpService', 'value': 'tcp/443' }
+                ] }
+            ]
+        })
+        index = cisco_asa.build_reference_index(dev, None, acls=False)
+        self.assertEqual(index['web-1'], [('object-group', 'OG-WEB', None)])
+        self.assertEqual(index['svc-http'], [('object-group', 'SG-WEB', None)])
+        self.assertEqual(index['SG-TLS'], [('object-group', 'SG-WEB', None)])
+        self.assertEqual(len(index), 3)
+
+    def test_missing_service_groups(self):
+        dev = FakeDevice({ 'objects/networkobjectgroups': [] })
+        self.assertEqual(cisco_asa.build_reference_index(dev, None, acls=False), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+
+# Copyright 2015 Patrick Ogenstad <patrick@ogenstad.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Serves ASA REST API traffic recorded in a cassette.
+
+Run the modules with CISCO_ASA_CASSETTE=<file> set to record every request
+and response they exchange with a device. This server answers the same
+requests from the cassette, waiting as long as the device took or a scaled
+amount of time, so benchmarks can be repeated without a firewall. Point the
+modules to host=localhost:<port> with validate_certs=no.
+
+Requests are matched on method, path, query and body. The address of the
+device in refLink and selfLink is ignored. When a request was
+recorded several times the responses are returned in the recorded order and
+the last one is repeated once they run out.
+
+    openssl req -x509 -newkey rsa:2048 -nodes -days 365 -subj /CN=localhost \\
+        -keyout replay.key -out replay.crt
+    tools/asa_replay.py asa-1.cassette --cert replay.crt --key replay.key --speed 0.5
+"""
+
+import argparse
+import json
+import re
+import ssl
+import sys
+import threading
+import time
+
+try:
+    basestring
+except NameError:
+    basestring = str
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+
+LINK_FIELDS = ['refLink', 'selfLink']
+
+
+def relative_links(data):
+    """Drops the scheme and host from refLink and selfLink, the modules put
+    the address of the device in them
+    """
+    if isinstance(data, dict):
+        links = {}
+        for key, value in data.items():
+            if key in LINK_FIELDS and isinstance(value, basestring):
+                links[key] = re.sub(r'^https?://[^/]*', '', value)
+            else:
+                links[key] = relative_links(value)
+        return links
+    if isinstance(data, list):
+        return [relative_links(item) for item in data]
+    return data
+
+
+def request_key(method, request, data):
+    if data is None or data is False:
+        body = None
+    else:
+        body = json.dumps(relative_links(data), sort_keys=True)
+    return method.upper(), request.lstrip('/'), body
+
+
+class Cassette(object):
+
+    def __init__(self, path, device=None):
+        self.exchanges = {}
+        self.position = {}
+        self.lock = threading.Lock()
+        self.count = 0
+        with open(path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if device and record['device'] != device:
+                    continue
+                key = request_key(record['method'], record['request'], record.get('data'))
+                self.exchanges.setdefault(key, []).append(record)
+                self.count += 1
+
+    def next(self, key):
+        with self.lock:
+            records = self.exchanges.get(key)
+            if not records:
+                return None
+            position = self.position.get(key, 0)
+            self.position[key] = position + 1
+            return records[min(position, len(records) - 1)]
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+
+    cassette = None
+    speed = 1.0
+    quiet = False
+
+    def _replay(self):
+        path = self.path
+        if path.startswith('/api/'):
+            path = path[len('/api/'):]
+        elif path.rstrip('/') == '/api':
+            path = ''
+
+        data = None
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            data = json.loads(self.rfile.read(length).decode('utf-8'))
+
+        record = self.cassette.next(request_key(self.command, path, data))
+        if record is None:
+            body = json.dumps({ 'messages': [{ 'level': 'Error', 'details': 'Not in cassette: %s %s' % (self.command, path) }] })
+            self._respond(404, 'application/json', body, 0, 0)
+            return
+
+        headers_time = record.get('headers_time', 0) * self.speed
+        body_time = max(record.get('total_time', 0) * self.speed - headers_time, 0)
+        self._respond(record['status_code'], record.get('content_type'), record['body'], headers_time, body_time)
+
+    def _respond(self, status_code, content_type, body, headers_time, body_time):
+        body = body.encode('utf-8')
+        if headers_time:
+            time.sleep(headers_time)
+        self.send_response(status_code)
+        if content_type:
+            self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body_time:
+            self.wfile.flush()
+            time.sleep(body_time)
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+    do_DELETE = _replay
+    do_GET = _replay
+    do_PATCH = _replay
+    do_POST = _replay
+    do_PUT = _replay
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replays ASA REST API traffic recorded in a cassette')
+    parser.add_argument('cassette', help='cassette file recorded with CISCO_ASA_CASSETTE')
+    parser.add_argument('--device', help='only replay the exchanges recorded for this device')
+    parser.add_argument('--cert', required=True, help='certificate file for TLS')
+    parser.add_argument('--key', help='private key file, if it is not in the certificate file')
+    parser.add_argument('--address', default='127.0.0.1', help='address to listen on (default 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8443, help='port to listen on (default 8443)')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='multiplies the recorded response times, 0 answers at once (default 1.0)')
+    parser.add_argument('--quiet', action='store_true', help='do not log requests')
+    args = parser.parse_args()
+
+    ReplayHandler.cassette = Cassette(args.cassette, args.device)
+    ReplayHandler.speed = args.speed
+    ReplayHandler.quiet = args.quiet
+
+    server = ThreadingHTTPServer((args.address, args.port), ReplayHandler)
+    context = ssl.SSLContext(getattr(ssl, 'PROTOCOL_TLS_SERVER', ssl.PROTOCOL_SSLv23))
+    context.load_cert_chain(args.cert, args.key)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+
+    sys.stderr.write('Replaying %s exchanges on https://%s:%s/api\n' % (ReplayHandler.cassette.count, args.address, args.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()